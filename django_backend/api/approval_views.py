@@ -0,0 +1,370 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from core.models import Leaves, WorkFromHome, Employees, LeaveOverrideRequest, Attendance, AttendanceLogs, Regularization
+from .serializers import LeavesSerializer, WorkFromHomeSerializer
+from .utils import ADMIN_ROLES
+from .outbox import queue_email
+from .emails import render_email
+from .leave_ledger import credit_leaves
+from .unavailability import release, notify_changed
+from django.db import transaction, IntegrityError
+from django.db.models import Q, Count, Prefetch
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Admin-equivalent roles are auto-approved, so their requests never need approval
+ADMIN_ROLE_VARIANTS = [r for role in ADMIN_ROLES for r in [role, role.title(), role.upper()]]
+
+
+def pending_leaves_queryset():
+    """
+    Pending leaves plus approved ones from the last 30 days (or with overrides),
+    with the employee and each override's employee fetched up front.
+    """
+    thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    return Leaves.objects.filter(
+        Q(status='Pending') | Q(status='Approved', from_date__gte=thirty_days_ago) | Q(status='Approved', is_overridden=True)
+    ).exclude(
+        employee__role__in=ADMIN_ROLE_VARIANTS
+    ).select_related('employee').prefetch_related(
+        Prefetch('overrides', queryset=LeaveOverrideRequest.objects.select_related('employee'))
+    )
+
+
+def pending_wfh_queryset():
+    return WorkFromHome.objects.filter(status='Pending').select_related('employee')
+
+
+def _apply_filters(qs, params):
+    """Filters shared by both approval lists: ?team=<id>&from=YYYY-MM-DD&to=YYYY-MM-DD"""
+    team_id = params.get('team')
+    if team_id:
+        qs = qs.filter(employee_id__in=Employees.objects.filter(teams__id=team_id).values('employee_id'))
+
+    # Requests overlapping the [from, to] window (dates are stored as YYYY-MM-DD strings)
+    date_from = params.get('from')
+    date_to = params.get('to')
+    if date_from:
+        qs = qs.filter(to_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(from_date__lte=date_to)
+    return qs
+
+
+def _page_bounds(params):
+    try:
+        page = max(1, int(params.get('page', 1)))
+        page_size = min(MAX_PAGE_SIZE, max(1, int(params.get('page_size', DEFAULT_PAGE_SIZE))))
+    except (TypeError, ValueError):
+        raise ValueError('page and page_size must be integers')
+    return page, page_size
+
+
+@api_view(['GET'])
+def approval_list(request, kind):
+    """
+    Paginated approvals queue for 'leaves' or 'wfh'.
+    Query params: team, from, to, page, page_size and (leaves only) type and status.
+    """
+    params = request.query_params
+    try:
+        page, page_size = _page_bounds(params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if kind == 'leaves':
+        qs = _apply_filters(pending_leaves_queryset(), params)
+        leave_type = params.get('type')
+        if leave_type:
+            qs = qs.filter(type__iexact=leave_type)
+        # Status counts for the filtered queue in a single aggregate query
+        counts = qs.aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='Pending')),
+            approved=Count('id', filter=Q(status='Approved')),
+            overridden=Count('id', filter=Q(is_overridden=True)),
+        )
+        status_filter = params.get('status')
+        if status_filter:
+            if status_filter not in ('Pending', 'Approved'):
+                return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(status=status_filter)
+            total = counts[status_filter.lower()]
+        else:
+            total = counts['total']
+        serializer_class = LeavesSerializer
+    elif kind == 'wfh':
+        qs = _apply_filters(pending_wfh_queryset(), params)
+        counts = qs.aggregate(total=Count('id'))
+        total = counts['total']
+        serializer_class = WorkFromHomeSerializer
+    else:
+        return Response({'error': 'Invalid approval type'}, status=status.HTTP_400_BAD_REQUEST)
+
+    offset = (page - 1) * page_size
+    rows = qs.order_by('-created_at', '-id')[offset:offset + page_size]
+
+    return Response({
+        'results': serializer_class(rows, many=True).data,
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'total_pages': (total + page_size - 1) // page_size,
+        'counts': counts,
+    })
+
+
+# Actions accepted by bulk_action for each kind of request
+BULK_ACTIONS = {
+    'leaves': ['Approve', 'Reject', 'ApproveOverride', 'RejectOverride'],
+    'wfh': ['Approve', 'Reject'],
+    'regularizations': ['Approve', 'Reject'],
+}
+
+
+def _parse_time(date_s, time_s):
+    """Convert 'YYYY-MM-DD' + '09:30 AM' → naive datetime (IST)."""
+    try:
+        return datetime.strptime(f"{date_s} {time_s}", "%Y-%m-%d %I:%M %p")
+    except Exception:
+        return None
+
+
+def _format_minutes(total_mins):
+    total_mins = max(0, total_mins)
+    return f"{int(total_mins // 60)}h {int(total_mins % 60)}m"
+
+
+def _bulk_leaves(ids, action, digests):
+    if action in ('ApproveOverride', 'RejectOverride'):
+        return _bulk_leave_overrides(ids, action, digests)
+
+    leaves = list(
+        Leaves.objects.select_for_update(of=('self',))
+        .filter(id__in=ids, status='Pending').select_related('employee')
+    )
+    new_status = 'Approved' if action == 'Approve' else 'Rejected'
+    leave_ids = [l.id for l in leaves]
+    Leaves.objects.filter(id__in=leave_ids).update(status=new_status)
+    if action == 'Reject':
+        credit_leaves(leaves, note='Leave rejected')
+        release(leave_ids=leave_ids)
+    else:
+        notify_changed(l.employee.pk for l in leaves)
+
+    for leave in leaves:
+        digests[leave.employee].append(
+            (f"{str(leave.type).upper()} leave", f"{leave.from_date} to {leave.to_date}", new_status)
+        )
+    return leave_ids
+
+
+def _bulk_leave_overrides(ids, action, digests):
+    """
+    Override handling for many leaves at once: attendance logs are bulk-inserted,
+    attendance summaries bulk-updated, then each approved date is cut out of its leave.
+    """
+    from api.attendance_views import cancel_leave_for_dates
+
+    leaves = {
+        l.id: l for l in Leaves.objects.select_for_update(of=('self',))
+        .filter(id__in=ids).select_related('employee')
+    }
+    overrides = list(
+        LeaveOverrideRequest.objects.filter(leave_id__in=list(leaves), status='Pending').order_by('leave_id', 'date')
+    )
+    employee_ids = {o.employee_id for o in overrides}
+    dates = {o.date for o in overrides}
+    attendance = {
+        (a.employee_id, a.date): a
+        for a in Attendance.objects.filter(employee_id__in=employee_ids, date__in=dates)
+    }
+
+    new_attendance, changed = [], {}
+    if action == 'ApproveOverride':
+        logged = set(
+            AttendanceLogs.objects.filter(employee_id__in=employee_ids, date__in=dates, type__in=['IN', 'OUT'])
+            .values_list('employee_id', 'date', 'type')
+        )
+        new_logs = []
+        for ovr in overrides:
+            # --- Backfill AttendanceLogs entries from override times ---
+            for log_type, time_s, location in (('IN', ovr.check_in, ovr.location_in), ('OUT', ovr.check_out, ovr.location_out)):
+                timestamp = _parse_time(ovr.date, time_s) if time_s else None
+                if timestamp and (ovr.employee_id, ovr.date, log_type) not in logged:
+                    logged.add((ovr.employee_id, ovr.date, log_type))
+                    new_logs.append(AttendanceLogs(
+                        employee_id=ovr.employee_id, timestamp=timestamp, type=log_type,
+                        location=location or '', date=ovr.date
+                    ))
+
+            # --- Update Attendance summary with real check-in/check-out times ---
+            att = attendance.get((ovr.employee_id, ovr.date))
+            if att is None:
+                att = Attendance(employee_id=ovr.employee_id, date=ovr.date, break_minutes=0)
+                attendance[(ovr.employee_id, ovr.date)] = att
+                new_attendance.append(att)
+            elif att.pk:
+                changed[att.pk] = att
+            att.status = 'Present'
+            if ovr.check_in:
+                att.check_in = ovr.check_in
+            if ovr.check_out:
+                att.check_out = ovr.check_out
+                check_in_dt = _parse_time(ovr.date, ovr.check_in) if ovr.check_in else None
+                check_out_dt = _parse_time(ovr.date, ovr.check_out)
+                if check_in_dt and check_out_dt:
+                    att.worked_hours = _format_minutes((check_out_dt - check_in_dt).total_seconds() / 60)
+
+        AttendanceLogs.objects.bulk_create(new_logs, batch_size=500)
+        Attendance.objects.bulk_create(new_attendance, batch_size=500)
+        Attendance.objects.bulk_update(changed.values(), ['status', 'check_in', 'check_out', 'worked_hours'], batch_size=500)
+
+        # --- Cancel/Split each leave once for all of its override dates so balance is restored ---
+        dates_by_leave = defaultdict(list)
+        for ovr in overrides:
+            dates_by_leave[ovr.leave_id].append(ovr.date)
+        for leave_id, dates in dates_by_leave.items():
+            leave = leaves[leave_id]
+            cancel_leave_for_dates(leave, dates, notify=False)
+            for date_str in dates:
+                digests[leave.employee].append(("Leave override", date_str, 'Approved'))
+        new_status = 'Approved'
+    else:
+        # Check-in/out is ignored, leave stays approved as-is
+        for ovr in overrides:
+            att = attendance.get((ovr.employee_id, ovr.date))
+            if att:
+                att.status = 'On Leave'
+                att.check_in = None
+                att.check_out = None
+                changed[att.pk] = att
+        Attendance.objects.bulk_update(changed.values(), ['status', 'check_in', 'check_out'], batch_size=500)
+        new_status = 'Rejected'
+
+    LeaveOverrideRequest.objects.filter(id__in=[o.id for o in overrides]).update(status=new_status)
+    return sorted({o.leave_id for o in overrides})
+
+
+def _bulk_wfh(ids, action, digests):
+    requests = list(
+        WorkFromHome.objects.select_for_update(of=('self',))
+        .filter(id__in=ids, status='Pending').select_related('employee')
+    )
+    new_status = 'Approved' if action == 'Approve' else 'Rejected'
+    wfh_ids = [r.id for r in requests]
+    WorkFromHome.objects.filter(id__in=wfh_ids).update(status=new_status)
+    if action == 'Reject':
+        release(wfh_ids=wfh_ids)
+    else:
+        notify_changed(r.employee.pk for r in requests)
+
+    for wfh in requests:
+        digests[wfh.employee].append(("Work From Home", f"{wfh.from_date} to {wfh.to_date}", new_status))
+    return wfh_ids
+
+
+def _bulk_regularizations(ids, action, digests):
+    regs = list(
+        Regularization.objects.select_for_update(of=('self',))
+        .filter(id__in=ids, status='Pending').select_related('employee', 'attendance')
+    )
+    new_status = 'Approved' if action == 'Approve' else 'Rejected'
+
+    if action == 'Approve':
+        fmt = '%I:%M %p'
+        for reg in regs:
+            att = reg.attendance
+            att.check_out = reg.requested_checkout
+            # Recalculate working hours if check_in exists (same-day times, cross-midnight wraps)
+            if att.check_in and att.check_in != '-':
+                try:
+                    total_mins = (datetime.strptime(att.check_out, fmt) - datetime.strptime(att.check_in, fmt)).total_seconds() / 60
+                    if total_mins < 0:
+                        total_mins += 1440
+                    att.worked_hours = _format_minutes(total_mins - (att.break_minutes or 0))
+                except Exception as e:
+                    print(f"Error calculating hours: {e}")
+            att.status = 'Present'
+        Attendance.objects.bulk_update([r.attendance for r in regs], ['check_out', 'worked_hours', 'status'], batch_size=500)
+
+    reg_ids = [r.id for r in regs]
+    Regularization.objects.filter(id__in=reg_ids).update(status=new_status)
+    for reg in regs:
+        digests[reg.employee].append(("Regularization", reg.attendance.date, new_status))
+    return reg_ids
+
+
+BULK_HANDLERS = {
+    'leaves': _bulk_leaves,
+    'wfh': _bulk_wfh,
+    'regularizations': _bulk_regularizations,
+}
+
+
+def send_approval_digests(digests):
+    """One email per employee summarising every request actioned in a bulk call."""
+    for employee, items in digests.items():
+        if not employee.email:
+            continue
+        try:
+            body = render_email(
+                'emails/approval_digest.html',
+                title='Your requests have been reviewed',
+                employee=employee,
+                items=items,
+            )
+            queue_email(employee.email, f"Request Update - {len(items)} request(s) reviewed", body)
+        except Exception as e:
+            print(f"Error queueing approval digest to {employee.email}: {e}")
+
+
+@api_view(['POST'])
+def bulk_action(request):
+    """
+    Approve or reject many requests in one transaction.
+    Body: {"action": "Approve", "leaves": [ids], "wfh": [ids], "regularizations": [ids]}
+    Only Pending requests are actioned; anything else is reported back as skipped.
+    """
+    action = request.data.get('action')
+    try:
+        requested = {kind: [int(i) for i in (request.data.get(kind) or [])] for kind in BULK_ACTIONS}
+    except (TypeError, ValueError):
+        return Response({'error': 'Request ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not any(requested.values()):
+        return Response({'error': 'No request ids provided'}, status=status.HTTP_400_BAD_REQUEST)
+    for kind, ids in requested.items():
+        if ids and action not in BULK_ACTIONS[kind]:
+            return Response({'error': f'Invalid action for {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    digests = defaultdict(list)
+    try:
+        with transaction.atomic():
+            processed = {
+                kind: BULK_HANDLERS[kind](ids, action, digests) if ids else []
+                for kind, ids in requested.items()
+            }
+            # One digest per employee, queued in the outbox with the changes it reports
+            send_approval_digests(digests)
+    except IntegrityError:
+        # A split leave part or re-activated request collides with another active range
+        return Response(
+            {'error': 'A selected request overlaps another active leave or WFH request. Nothing was changed.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ValueError as e:
+        # Stored dates/times that do not parse
+        return Response({'error': f'A selected request has invalid data: {e}. Nothing was changed.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    skipped = {kind: sorted(set(ids) - set(processed[kind])) for kind, ids in requested.items()}
+    count = sum(len(ids) for ids in processed.values())
+    return Response({
+        'message': f'{action} applied to {count} request(s)',
+        'processed': processed,
+        'skipped': skipped,
+    })
@@ -1,38 +1,27 @@
-import requests
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from core.models import Employees, Attendance, AttendanceLogs, Leaves, Regularization, Teams, Holidays, LeaveOverrideRequest
+from core.models import Employees, Attendance, AttendanceLogs, Leaves, Regularization, Teams, Holidays, LeaveOverrideRequest, WorkFromHome
 from datetime import datetime, timedelta
 from django.db.models import Q
 import pytz
-import threading
-from .utils import send_email_via_api
+from .outbox import queue_email
+from .emails import render_email
+from . import http_gateways
+from .leave_splits import remove_leave_dates
+from .session_tokens import resolve_employee
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK, SESSION_1, SESSION_2, normalize_session
+from .recurring_wfh import expand, on_recurring_wfh
 from django.core.cache import cache
+from django.utils.html import format_html
 
-def process_regularization_email(target_email, subject, title, message, color="#48327d", icon="📅"):
+def process_regularization_email(target_emails, subject, title, message, color="#48327d", icon="📅"):
+    """Queues one notification email to an address or a list of addresses. 'message' may hold markup built with format_html."""
     try:
-        html_response = f"""
-        <!DOCTYPE html>
-        <html>
-            <head>
-                <meta charset="UTF-8">
-            </head>
-            <body style="font-family: 'Inter', sans-serif; background-color: #f8fafc; padding: 20px; margin: 0;">
-                <div style="background: white; padding: 40px; border-radius: 12px; max-width: 500px; margin: 0 auto; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1); text-align: center;">
-                    <div style="font-size: 40px; margin-bottom: 20px;">{icon}</div>
-                    <h1 style="color: {color}; font-size: 20px; font-weight: 700; margin-bottom: 16px; margin-top: 0;">{title}</h1>
-                    <p style="color: #475569; font-size: 15px; line-height: 1.5; margin-bottom: 24px;">{message}</p>
-                    <div style="margin-top: 32px; padding-top: 24px; border-top: 1px solid #e2e8f0; font-size: 12px; color: #94a3b8;">
-                        MarkwaveHR Automated Notification
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        send_email_via_api(target_email, subject, html_response)
+        html_response = render_email('emails/alert.html', title=title, message=message, color=color, icon=icon)
+        queue_email(target_emails, subject, html_response)
     except Exception as e:
-        print(f"Error sending regularization email: {e}")
+        print(f"Error queueing regularization email: {e}")
 
 
 
@@ -41,13 +30,13 @@ def notify_leave_override(employee, leave_obj, date_str):
     try:
         subject = f"Leave Override Alert - {employee.first_name} {employee.last_name}"
         title = "Employee Checked In During Leave"
-        message = f"""
-        <b>{employee.first_name} {employee.last_name} ({employee.employee_id})</b> has checked in on <b>{date_str}</b>.<br><br>
-        This date falls under an <b>Approved Leave</b> ({leave_obj.type}).<br>
-        A <b>Leave Override Request</b> has been created and is pending your approval.<br><br>
-        Please review the request in the Admin Leave Management panel to Approve, Reject, or Cancel the leave.
-
-        """
+        message = format_html(
+            "<b>{} {} ({})</b> has checked in on <b>{}</b>.<br><br>"
+            "This date falls under an <b>Approved Leave</b> ({}).<br>"
+            "A <b>Leave Override Request</b> has been created and is pending your approval.<br><br>"
+            "Please review the request in the Admin Leave Management panel to Approve, Reject, or Cancel the leave.",
+            employee.first_name, employee.last_name, employee.employee_id, date_str, leave_obj.type,
+        )
         
         # Notify Managers
         recipients = set()
@@ -60,116 +49,42 @@ def notify_leave_override(employee, leave_obj, date_str):
         # for admin in admins:
         #     if admin.email: recipients.add(admin.email)
 
-        for email in recipients:
-            process_regularization_email(email, subject, title, message, color="#f59e0b", icon="⚠️")
+        if recipients:
+            process_regularization_email(sorted(recipients), subject, title, message, color="#f59e0b", icon="⚠️")
             
     except Exception as e:
         print(f"Error sending leave override notification: {e}")
 
 
-def cancel_leave_for_date(leave_obj, target_date_str):
+def cancel_leave_for_date(leave_obj, target_date_str, notify=True):
     """
     Cancels or splits a leave request because the user clocked in on 'target_date_str'.
     When a day is removed from the leave, the leave balance is also restored accordingly.
+    Pass notify=False when the caller sends its own (digest) notification.
     """
-    try:
-        from api.leave_views import notify_employee_status_update
-    except ImportError as e:
-        print(f"DEBUG: Failed to import notify_employee_status_update: {e}")
-        notify_employee_status_update = None
+    cancel_leave_for_dates(leave_obj, [target_date_str], notify=notify)
 
-    try:
-        target_date = datetime.strptime(target_date_str, '%Y-%m-%d').date()
-        from_date = datetime.strptime(leave_obj.from_date, '%Y-%m-%d').date()
-        to_date = datetime.strptime(leave_obj.to_date, '%Y-%m-%d').date()
-        
-        print(f"DEBUG: Process Leave Override | Leave ID: {leave_obj.id} [{from_date} to {to_date}] | Target: {target_date}")
 
-        # Helper: restore 1 day of leave balance
-        def restore_balance(emp, leave_type_code, days=1):
-            try:
-                from core.models import EmployeeLeaveBalance, LeaveType
-                from datetime import datetime as dt_cls
-                current_year = dt_cls.now().year
-                leave_type = LeaveType.objects.filter(code=leave_type_code.upper()).first()
-                if leave_type:
-                    bal = EmployeeLeaveBalance.objects.filter(
-                        employee=emp, leave_type=leave_type, year=current_year
-                    ).first()
-                    if bal:
-                        bal.allocated_days = bal.allocated_days + days
-                        bal.save()
-                        print(f"DEBUG: Restored {days} day(s) of {leave_type_code} for {emp.employee_id}")
-            except Exception as be:
-                print(f"DEBUG: Could not restore balance: {be}")
-
-        # CASE 1: Single Day Leave
-        if from_date == to_date:
-            if from_date == target_date:
-                print("DEBUG: Cancelling single day leave.")
-                leave_obj.status = 'Cancelled'
-                leave_obj.save()
-                restore_balance(leave_obj.employee, leave_obj.type, days=1)
-                if notify_employee_status_update:
-                    threading.Thread(target=notify_employee_status_update, args=(leave_obj.id,)).start()
-                return
-
-        # CASE 2: Multi-day Leave - SPLIT
-
-        # Subcase A: Target is the START date
-        if target_date == from_date:
-            print("DEBUG: Trimming start of leave.")
-            new_from = from_date + timedelta(days=1)
-            leave_obj.from_date = new_from.strftime('%Y-%m-%d')
-            leave_obj.days = max(0, leave_obj.days - 1)
-            leave_obj.save()
-            restore_balance(leave_obj.employee, leave_obj.type, days=1)
-            return
-
-        # Subcase B: Target is the END date
-        if target_date == to_date:
-            print("DEBUG: Trimming end of leave.")
-            new_to = to_date - timedelta(days=1)
-            leave_obj.to_date = new_to.strftime('%Y-%m-%d')
-            leave_obj.days = max(0, leave_obj.days - 1)
-            leave_obj.save()
-            restore_balance(leave_obj.employee, leave_obj.type, days=1)
-            return
-            
-        # Subcase C: Target is in the MIDDLE
-        if from_date < target_date < to_date:
-            print("DEBUG: Splitting leave into two.")
-            original_to = leave_obj.to_date  # Keep for Part 2
-            
-            # Update Part 1 (Current Object) -> From Start to Target-1
-            part1_end = target_date - timedelta(days=1)
-            leave_obj.to_date = part1_end.strftime('%Y-%m-%d')
-            leave_obj.days = (part1_end - from_date).days + 1
-            leave_obj.save()
-            
-            # Create Part 2 -> From Target+1 to End
-            part2_start = target_date + timedelta(days=1)
-            part2_start_str = part2_start.strftime('%Y-%m-%d')
-            original_to_date = datetime.strptime(original_to, '%Y-%m-%d').date()
-            days_part2 = (original_to_date - part2_start).days + 1
-            
-            Leaves.objects.create(
-                employee=leave_obj.employee,
-                type=leave_obj.type,
-                from_date=part2_start_str,
-                to_date=original_to,
-                days=days_part2,
-                reason=f"{leave_obj.reason} (Split due to check-in on {target_date_str})",
-                status='Approved',
-                created_at=leave_obj.created_at
-            )
-            restore_balance(leave_obj.employee, leave_obj.type, days=1)
-            return
+def cancel_leave_for_dates(leave_obj, target_date_strs, notify=True):
+    """
+    Removes every date in 'target_date_strs' from a leave in one locked transaction
+    (see api/leave_splits.py): the leave is cancelled, trimmed or split into parts,
+    and the balance gets a single adjustment. 'leave_obj' is updated in place.
+    Errors propagate, so a caller's transaction (e.g. the override approval) rolls back with it.
+    """
+    print(f"DEBUG: Process Leave Override | Leave ID: {leave_obj.id} [{leave_obj.from_date} to {leave_obj.to_date}] | Targets: {target_date_strs}")
+    leave, new_leaves = remove_leave_dates(leave_obj.id, target_date_strs)
+    if leave is None:
+        return
 
-    except Exception as e:
-        print(f"ERROR: Failed to cancel/split leave: {e}")
-        import traceback
-        traceback.print_exc()
+    for field in ('from_date', 'to_date', 'days', 'status', 'from_session', 'to_session'):
+        setattr(leave_obj, field, getattr(leave, field))
+    if new_leaves:
+        print(f"DEBUG: Split leave {leave.id} into {[l.id for l in new_leaves]}")
+
+    if notify and leave.status == 'Cancelled':
+        from api.leave_views import notify_employee_status_update
+        notify_employee_status_update(leave.id)
 
 
 @api_view(['GET'])
@@ -183,7 +98,7 @@ def resolve_location(request):
         # Proper User-Agent as per Nominatim Policy
         headers = {'User-Agent': 'MarkwaveHR-System/1.0 (info@markwave.ai)'}
         url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=18&addressdetails=1"
-        response = requests.get(url, headers=headers, timeout=5)
+        response = http_gateways.get(http_gateways.GEOCODING, url, headers=headers)
         
         if response.ok:
             data = response.json()
@@ -237,10 +152,7 @@ def clock(request):
         
     try:
         # Try lookup by employee_id first (the new standard)
-        employee = Employees.objects.filter(employee_id=employee_id).first()
-        if not employee and str(employee_id).isdigit():
-            # Fallback to internal ID for active sessions that haven't refreshed
-            employee = Employees.objects.filter(pk=employee_id).first()
+        employee = resolve_employee(request, employee_id)
             
         if not employee:
             print(f"DEBUG: Clock failed - Employee {employee_id} not found")
@@ -313,7 +225,7 @@ def clock(request):
             # Mark leave as overridden so admin can see it in UI
             conflicting_leave.is_overridden = True
             conflicting_leave.save()
-            threading.Thread(target=notify_leave_override, args=(employee, conflicting_leave, current_date_str)).start()
+            notify_leave_override(employee, conflicting_leave, current_date_str)
 
         # --- Ensure Attendance summary row exists showing Pending Override status ---
         # Do NOT set check_in/check_out times — those are set only after admin approves
@@ -429,13 +341,12 @@ def get_status(request, employee_id):
             'last_punch': None,
             'can_clock': True,
             'disabled_reason': None,
+            'is_wfh': False,
             'server_time': datetime.utcnow().isoformat()
         })
     try:
         # Lookup employee to handle both string employee_id and internal ID
-        employee = Employees.objects.filter(employee_id=employee_id).first()
-        if not employee and str(employee_id).isdigit():
-            employee = Employees.objects.filter(pk=employee_id).first()
+        employee = resolve_employee(request, employee_id)
         
         if not employee:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -467,6 +378,16 @@ def get_status(request, employee_id):
             if attendance_record.status.lower() in ['on leave', 'leave']:
                 is_on_leave = True
 
+        # WFH today, from a single request or a recurring rule
+        is_wfh = not is_on_leave and (
+            WorkFromHome.objects.filter(
+                employee=employee,
+                status__iexact='Approved',
+                from_date__lte=current_date_str,
+                to_date__gte=current_date_str
+            ).exists() or bool(on_recurring_wfh([employee.employee_id], current_date_str))
+        )
+
         is_weekend = now.weekday() >= 5  # 5=Saturday, 6=Sunday
         
         # Always allow clocking, even on leave/weekend/holiday
@@ -518,6 +439,7 @@ def get_status(request, employee_id):
             'last_punch': last_log.timestamp.strftime('%I:%M %p') if last_log else None,
             'can_clock': can_clock,
             'disabled_reason': disabled_reason,
+            'is_wfh': is_wfh,
             'server_time': now.isoformat()
         })
     except Exception as e:
@@ -542,9 +464,7 @@ def get_personal_stats(request, employee_id):
                 'team': {'avg': '8h 15m', 'onTime': '92%'}
             }
         })
-    employee = Employees.objects.filter(employee_id=employee_id).first()
-    if not employee and str(employee_id).isdigit():
-        employee = Employees.objects.filter(pk=employee_id).first()
+    employee = resolve_employee(request, employee_id)
     
     if not employee:
         return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -726,9 +646,7 @@ def get_history(request, employee_id):
                 'logs': [{'in': '09:30 AM', 'out': '06:30 PM'}]
             })
         return Response(result)
-    employee = Employees.objects.filter(employee_id=employee_id).first()
-    if not employee and str(employee_id).isdigit():
-        employee = Employees.objects.filter(pk=employee_id).first()
+    employee = resolve_employee(request, employee_id)
     
     if not employee:
         return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -750,36 +668,45 @@ def get_history(request, employee_id):
         to_date__gte=start_date
     )
 
+    # Fetch Holidays in range
+    holidays_qs = Holidays.objects.filter(date__gte=start_date)
+    holiday_map = {h.date: h for h in holidays_qs}
+    calendar = WorkingDayCalendar.from_holidays(holidays_qs, LEAVE_WEEKMASK)
+
     leave_dates = {}
     for leave in leaves:
-        # Expand dates
+        # Expand to the working dates the leave actually covers
         try:
-            current_d = datetime.strptime(leave.from_date, '%Y-%m-%d')
-            end_d = datetime.strptime(leave.to_date, '%Y-%m-%d')
-            while current_d <= end_d:
-                d_str = current_d.strftime('%Y-%m-%d')
+            for day in calendar.working_dates(leave.from_date, leave.to_date):
+                d_str = day.strftime('%Y-%m-%d')
                 display_type = leave.type
                 
                 # Determine session for this specific day in the range
                 day_session = 'Full Day'
                 if d_str == leave.from_date:
-                    day_session = leave.from_session
+                    day_session = normalize_session(leave.from_session)
                 elif d_str == leave.to_date:
-                    day_session = leave.to_session
+                    day_session = normalize_session(leave.to_session)
                 
-                if day_session == 'Session 1':
+                if day_session == SESSION_1:
                     display_type = f"First Half {leave.type}"
-                elif day_session == 'Session 2':
+                elif day_session == SESSION_2:
                     display_type = f"Second Half {leave.type}"
                 
                 leave_dates[d_str] = display_type
-                current_d += timedelta(days=1)
         except ValueError:
             continue
 
-    # Fetch Holidays in range
-    holidays_qs = Holidays.objects.filter(date__gte=start_date)
-    holiday_map = {h.date: h for h in holidays_qs}
+    # WFH days: approved single requests plus recurring rules evaluated for the window
+    wfh_dates = set()
+    for wfh in WorkFromHome.objects.filter(employee=employee, status__iexact='Approved', to_date__gte=start_date):
+        try:
+            wfh_dates.update(d.strftime('%Y-%m-%d') for d in calendar.working_dates(wfh.from_date, wfh.to_date))
+        except ValueError:
+            continue
+    history_end = (datetime.utcnow() + timedelta(days=60)).date()
+    for rule_days in expand([employee.employee_id], start_date, history_end, calendar=calendar).values():
+        wfh_dates.update(d.strftime('%Y-%m-%d') for d in rule_days)
 
     # 3. Build Result List (Backend usually returns 30 days based on existing logic, 
     # but now we need to make sure we return dates that have EITHER attendance OR leave OR holiday)
@@ -875,6 +802,7 @@ def get_history(request, employee_id):
                 'isOptionalHoliday': is_optional_holiday,
                 'holidayName': holiday_name,
                 'isWeekend': log.is_weekend,
+                'isWfh': d_str in wfh_dates and not leave_type,
                 'logs': logs_data
             })
         else:
@@ -899,6 +827,7 @@ def get_history(request, employee_id):
                 'isOptionalHoliday': is_optional_holiday,
                 'holidayName': holiday_name,
                 'isWeekend': is_weekend,
+                'isWfh': d_str in wfh_dates and not leave_type,
                 'logs': []
             })
         
@@ -914,9 +843,7 @@ def submit_regularization(request):
     if not all([employee_id, date, requested_checkout, reason]):
         return Response({'error': 'All fields are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    employee = Employees.objects.filter(employee_id=employee_id).first()
-    if not employee and str(employee_id).isdigit():
-        employee = Employees.objects.filter(pk=employee_id).first()
+    employee = resolve_employee(request, employee_id)
         
     if not employee:
         return Response({'error': 'Employee not found'}, status=404)
@@ -941,16 +868,18 @@ def submit_regularization(request):
     try:
         subject = f"Regularization Request - {employee.first_name} {employee.last_name} ({employee.employee_id})"
         title = "New Regularization Request"
-        message = f"{employee.first_name} {employee.last_name} has requested attendance regularization for {date}.<br>Reason: {reason}<br>Requested Checkout: {requested_checkout}"
+        message = format_html(
+            "{} {} has requested attendance regularization for {}.<br>Reason: {}<br>Requested Checkout: {}",
+            employee.first_name, employee.last_name, date, reason, requested_checkout,
+        )
         
         managers = []
         for team in employee.teams.all():
             if team.manager and team.manager.email:
                 managers.append(team.manager.email)
         
-        for manager_email in set(managers):
-            t = threading.Thread(target=process_regularization_email, args=(manager_email, subject, title, message))
-            t.start()
+        if managers:
+            process_regularization_email(sorted(set(managers)), subject, title, message)
             
     except Exception as e:
         print(f"Error initiating regularization email: {e}")
@@ -970,9 +899,7 @@ def get_regularization_requests(request, manager_id):
         ).select_related('employee', 'attendance').order_by('-created_at')
     else:
         # Manager role: Fetch requests from team members or orphaned requests for admins
-        manager = Employees.objects.filter(employee_id=manager_id).first()
-        if not manager and str(manager_id).isdigit():
-            manager = Employees.objects.filter(pk=manager_id).first()
+        manager = resolve_employee(request, manager_id)
         
         # More inclusive admin check (matches frontend logic)
         admin_roles = ['Admin', 'Administrator', 'Project Manager', 'Advisor-Technology & Operations']
@@ -1092,8 +1019,7 @@ def action_regularization(request, pk):
         message = f"Your regularization request for {reg.attendance.date} has been {action}."
         
         if reg.employee.email:
-             t = threading.Thread(target=process_regularization_email, args=(reg.employee.email, subject, title, message, color, icon))
-             t.start()
+             process_regularization_email(reg.employee.email, subject, title, message, color, icon)
     except Exception as e:
         print(f"Error initiating action email: {e}")
 
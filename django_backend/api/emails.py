@@ -0,0 +1,66 @@
+"""
+Notification email and email-action page rendering. Bodies are Django templates
+under api/templates/emails/: the notification emails extend one layout
+(layout.html, with the details table in details.html) and the pages returned
+by the Approve/Reject links use page.html. Every template is compiled once
+when the app loads (ApiConfig.ready); the layout and includes they pull in are
+kept by Django's cached template loader, so rendering a message only fills in
+its variables.
+
+Variables are autoescaped. A caller that needs markup in a value (the alert
+message) builds it with django.utils.html.format_html.
+"""
+from django.http import HttpResponse
+from django.template.loader import get_template
+
+TEMPLATE_NAMES = (
+    'emails/approval_request.html',
+    'emails/status_update.html',
+    'emails/alert.html',
+    'emails/support_query.html',
+    'emails/approval_digest.html',
+    'emails/page.html',
+)
+
+STATUS_COLORS = {'Approved': '#10b981', 'Rejected': '#ef4444'}
+ACTION_ICONS = {'Approved': '✓', 'Rejected': '✕'}
+
+_templates = {}
+
+
+def load_templates():
+    for name in TEMPLATE_NAMES:
+        _templates[name] = get_template(name)
+
+
+def render_email(name, **context):
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = get_template(name)
+    return template.render(context)
+
+
+def status_color(status_text):
+    return STATUS_COLORS.get(status_text, '#ef4444')
+
+
+def action_page(title, message, icon=None, color=None, close_window=False):
+    """HttpResponse for the pages opened from the Approve/Reject links in approval emails."""
+    return HttpResponse(render_email(
+        'emails/page.html', title=title, message=message, icon=icon, color=color, close_window=close_window
+    ), content_type="text/html")
+
+
+def action_done_page(kind, status_text):
+    return action_page(
+        f"{kind} {status_text}", f"The {kind} request has been successfully updated.",
+        icon=ACTION_ICONS.get(status_text), color=status_color(status_text), close_window=True,
+    )
+
+
+def already_processed_page(kind, current_status):
+    return action_page(
+        'Request Already Processed',
+        f"This {kind} request has already been marked as {current_status}.",
+        icon='ℹ️', color='#64748b',
+    )
@@ -3,6 +3,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from core.models import Employees, Posts
 from .serializers import PostsSerializer
+from .session_tokens import resolve_employee
 from datetime import datetime
 from django.utils import timezone
 from django.db.models import Q
@@ -22,9 +23,7 @@ def post_list(request):
             images_data = data.get('images', [])
             post_type = data.get('type', 'Activity')
 
-            author = Employees.objects.filter(employee_id=author_id).first()
-            if not author and str(author_id).isdigit():
-                author = Employees.objects.filter(pk=author_id).first()
+            author = resolve_employee(request, author_id)
             
             if not author:
                 return Response({'error': f'Author with ID {author_id} not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -92,9 +91,7 @@ def add_comment(request, post_id):
 
     try:
         post = Posts.objects.get(pk=post_id)
-        employee = Employees.objects.filter(employee_id=employee_id).first()
-        if not employee and str(employee_id).isdigit():
-            employee = Employees.objects.filter(pk=employee_id).first()
+        employee = resolve_employee(request, employee_id)
         
         if not employee:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -151,9 +148,7 @@ def delete_comment(request, post_id, comment_id):
              return Response({'error': 'Requester ID required'}, status=status.HTTP_400_BAD_REQUEST)
              
         # Fetch requester for name check and admin check
-        requester = Employees.objects.filter(employee_id=requester_id).first()
-        if not requester and str(requester_id).isdigit():
-             requester = Employees.objects.filter(pk=requester_id).first()
+        requester = resolve_employee(request, requester_id)
 
         if not requester:
              return Response({'error': 'Requester not found'}, status=status.HTTP_404_NOT_FOUND)
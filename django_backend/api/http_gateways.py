@@ -0,0 +1,190 @@
+"""
+Shared HTTP client for the outside services the backend calls: the email API,
+Periskope (WhatsApp) and Nominatim reverse geocoding. Each gateway gets one
+requests.Session for the life of the process, so calls reuse kept-alive
+connections from a bounded pool instead of doing a TCP + TLS handshake per
+message.
+
+Per gateway (GATEWAYS, overridable with settings.HTTP_GATEWAYS):
+  timeout    read timeout in seconds (connect timeout is CONNECT_TIMEOUT)
+  retries    retries on connection errors; GETs are also retried on 502/503/504.
+             A POST is never re-sent once the request went out, because the
+             callers (outbox, OTP queue) do their own retrying.
+  pool_size  connections kept per host; extra concurrent calls wait for one
+
+Every call is timed into a per-gateway latency histogram (gateway_metrics()).
+async_request() is the awaitable variant: it uses httpx when installed and
+otherwise runs the pooled session call in a worker thread.
+"""
+import asyncio
+import bisect
+import threading
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+EMAIL = 'email'
+PERISKOPE = 'periskope'
+GEOCODING = 'geocoding'
+
+CONNECT_TIMEOUT = 3.05
+
+GATEWAYS = {
+    EMAIL: {'timeout': 10, 'retries': 2, 'pool_size': 10},
+    PERISKOPE: {'timeout': 30, 'retries': 2, 'pool_size': 10},
+    GEOCODING: {'timeout': 5, 'retries': 1, 'pool_size': 4},
+}
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is everything above)
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def gateway_config(name):
+    config = dict(GATEWAYS[name])
+    config.update(getattr(settings, 'HTTP_GATEWAYS', {}).get(name, {}))
+    return config
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.total_ms = 0.0
+            self.errors = 0
+
+    def observe(self, elapsed_ms, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            self.total_ms += elapsed_ms
+            self.errors += int(error)
+
+    def percentile(self, pct):
+        """Upper bound (ms) of the bucket holding the pct-th percentile; None above the last bound."""
+        count = sum(self.counts)
+        if not count:
+            return None
+        rank, seen = pct / 100 * count, 0
+        for bound, n in zip(LATENCY_BUCKETS_MS + (None,), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            count = sum(self.counts)
+            labels = [f"le_{b}ms" for b in LATENCY_BUCKETS_MS] + [f"gt_{LATENCY_BUCKETS_MS[-1]}ms"]
+            return {
+                'count': count,
+                'errors': self.errors,
+                'avg_ms': round(self.total_ms / count, 1) if count else None,
+                'p50_ms': self.percentile(50),
+                'p95_ms': self.percentile(95),
+                'p99_ms': self.percentile(99),
+                'buckets': dict(zip(labels, self.counts)),
+            }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_histograms = {name: LatencyHistogram() for name in GATEWAYS}
+
+
+def session_for(name):
+    """The pooled keep-alive Session for a gateway, created on first use."""
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                config = gateway_config(name)
+                retry = Retry(
+                    total=config['retries'], connect=config['retries'], read=config['retries'],
+                    status=config['retries'], status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset({'GET', 'HEAD'}), backoff_factor=0.3, raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=config['pool_size'], pool_block=True, max_retries=retry
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[name] = session
+    return session
+
+
+def request(name, method, url, **kwargs):
+    """Sends through the gateway's pooled session; raises requests.RequestException like requests does."""
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, gateway_config(name)['timeout']))
+    started = time.monotonic()
+    error = True
+    try:
+        response = session_for(name).request(method, url, **kwargs)
+        error = response.status_code >= 500
+        return response
+    finally:
+        _histograms[name].observe((time.monotonic() - started) * 1000, error=error)
+
+
+def post(name, url, **kwargs):
+    return request(name, 'POST', url, **kwargs)
+
+
+def get(name, url, **kwargs):
+    return request(name, 'GET', url, **kwargs)
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client(name):
+    # httpx clients are bound to the event loop they were created on
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if name not in clients:
+        config = gateway_config(name)
+        clients[name] = httpx.AsyncClient(
+            timeout=httpx.Timeout(config['timeout'], connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=config['pool_size'], max_keepalive_connections=config['pool_size']),
+            transport=httpx.AsyncHTTPTransport(retries=config['retries']),
+        )
+    return clients[name]
+
+
+async def async_request(name, method, url, **kwargs):
+    """Awaitable request(). Returns an httpx.Response when httpx is installed, else a requests.Response."""
+    if httpx is None:
+        return await asyncio.to_thread(request, name, method, url, **kwargs)
+    started = time.monotonic()
+    error = True
+    try:
+        response = await _async_client(name).request(method, url, **kwargs)
+        error = response.status_code >= 500
+        return response
+    finally:
+        _histograms[name].observe((time.monotonic() - started) * 1000, error=error)
+
+
+def gateway_metrics():
+    return {name: histogram.snapshot() for name, histogram in _histograms.items()}
+
+
+def reset_gateways():
+    """Closes pooled connections and clears the histograms (tests, settings changes)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+    for histogram in _histograms.values():
+        histogram.reset()
@@ -0,0 +1,319 @@
+"""
+Leave ledger: every allocation, debit, credit, carry-forward and encashment is
+appended to LeaveLedgerEntry, and the matching EmployeeLeaveBalance row is kept
+up to date in the same transaction so balance reads are a single row fetch.
+"""
+from collections import defaultdict
+from datetime import date
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from core.models import Employees, EmployeeLeaveBalance, LeaveLedgerEntry, LeaveType
+
+# Entry types that add to allocated_days vs. consumed_days (with sign)
+ALLOCATING_ENTRIES = {LeaveLedgerEntry.ALLOCATION, LeaveLedgerEntry.CARRY_FORWARD}
+CONSUMING_ENTRIES = {
+    LeaveLedgerEntry.DEBIT: 1,
+    LeaveLedgerEntry.ENCASHMENT: 1,
+    LeaveLedgerEntry.CREDIT: -1,
+}
+
+UNLIMITED_LEAVE_CODES = {'LWP'}
+
+# Employee statuses that receive a yearly allocation
+ACTIVE_EMPLOYEE_STATUSES = ['Active', 'Remote']
+
+
+def leave_year(leave):
+    """Leaves are charged to the year they start in."""
+    return int(str(leave.from_date)[:4])
+
+
+def get_leave_type(code):
+    if not code:
+        return None
+    return LeaveType.objects.filter(code=code.upper()).first()
+
+
+def get_balance(employee, leave_code, year, for_update=False):
+    """Returns the EmployeeLeaveBalance row for (employee, type, year) or None."""
+    qs = EmployeeLeaveBalance.objects.filter(
+        employee=employee,
+        leave_type__code=leave_code.upper(),
+        year=year
+    ).select_related('leave_type')
+    if for_update:
+        qs = qs.select_for_update(of=('self',))
+    return qs.first()
+
+
+def lock_balances(employee, year):
+    """
+    Row-locks every balance of (employee, year) until the surrounding
+    transaction ends, so concurrent applies for the same employee and year run
+    their check-then-debit one at a time. Returns the rows keyed by leave code.
+    """
+    rows = EmployeeLeaveBalance.objects.select_for_update(of=('self',)).filter(
+        employee=employee, year=year
+    ).select_related('leave_type').order_by('pk')
+    return {row.leave_type.code.upper(): row for row in rows}
+
+
+def post_entry(employee, leave_type, year, entry_type, days, leave=None, note=None, balance=None):
+    """
+    Appends a ledger entry and applies it to the running balance atomically.
+    Pass balance when the caller already holds its row lock.
+    """
+    with transaction.atomic():
+        if balance is None:
+            balance, _ = EmployeeLeaveBalance.objects.select_for_update().get_or_create(
+                employee=employee, leave_type=leave_type, year=year
+            )
+        entry = LeaveLedgerEntry.objects.create(
+            employee=employee,
+            leave_type=leave_type,
+            year=year,
+            entry_type=entry_type,
+            days=days,
+            leave=leave,
+            note=note
+        )
+        if entry_type in ALLOCATING_ENTRIES:
+            EmployeeLeaveBalance.objects.filter(pk=balance.pk).update(allocated_days=F('allocated_days') + days)
+        else:
+            sign = CONSUMING_ENTRIES[entry_type]
+            EmployeeLeaveBalance.objects.filter(pk=balance.pk).update(consumed_days=F('consumed_days') + sign * days)
+    return entry
+
+
+def post_entries(entries):
+    """
+    Bulk post_entry: inserts the entries and applies their net effect with one
+    update per affected balance row, however many entries touch it.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        key = (entry.employee_id, entry.leave_type_id, entry.year)
+        if entry.entry_type in ALLOCATING_ENTRIES:
+            deltas[key][0] += entry.days
+        else:
+            deltas[key][1] += CONSUMING_ENTRIES[entry.entry_type] * entry.days
+
+    with transaction.atomic():
+        LeaveLedgerEntry.objects.bulk_create(entries, batch_size=500)
+        for (employee_pk, leave_type_id, year), (allocated, consumed) in deltas.items():
+            if not allocated and not consumed:
+                continue
+            balance, _ = EmployeeLeaveBalance.objects.get_or_create(
+                employee_id=employee_pk, leave_type_id=leave_type_id, year=year
+            )
+            EmployeeLeaveBalance.objects.filter(pk=balance.pk).update(
+                allocated_days=F('allocated_days') + allocated,
+                consumed_days=F('consumed_days') + consumed
+            )
+    return entries
+
+
+def outstanding_days(leave):
+    """Days currently charged against the balance for this leave (debits minus credits)."""
+    totals = LeaveLedgerEntry.objects.filter(leave=leave).aggregate(
+        debited=Sum('days', filter=Q(entry_type=LeaveLedgerEntry.DEBIT)),
+        credited=Sum('days', filter=Q(entry_type=LeaveLedgerEntry.CREDIT)),
+    )
+    return (totals['debited'] or 0) - (totals['credited'] or 0)
+
+
+def debit_leave(leave, days=None, note=None, balance=None):
+    """
+    Charges a leave request against its balance. LWP and unknown types are not
+    tracked. balance is the already-locked row from lock_balances, if any.
+    """
+    code = (leave.type or '').upper()
+    if code in UNLIMITED_LEAVE_CODES:
+        return None
+    leave_type = balance.leave_type if balance is not None else get_leave_type(code)
+    days = leave.days if days is None else days
+    if not leave_type or not days:
+        return None
+    return post_entry(
+        leave.employee, leave_type, leave_year(leave), LeaveLedgerEntry.DEBIT, days,
+        leave=leave, note=note, balance=balance
+    )
+
+
+def credit_leave(leave, days=None, note=None):
+    """
+    Returns days of a leave request to the balance. Never credits more than was
+    debited for this leave, so repeated cancels/rejects are harmless.
+    """
+    code = (leave.type or '').upper()
+    if code in UNLIMITED_LEAVE_CODES:
+        return None
+    leave_type = get_leave_type(code)
+    if not leave_type:
+        return None
+    outstanding = outstanding_days(leave)
+    days = outstanding if days is None else min(days, outstanding)
+    if days <= 0:
+        return None
+    return post_entry(leave.employee, leave_type, leave_year(leave), LeaveLedgerEntry.CREDIT, days, leave=leave, note=note)
+
+
+def credit_leaves(leaves, note=None):
+    """
+    Batched credit_leave for many leave requests: one aggregate for what is
+    outstanding, one bulk insert of entries and one update per affected balance.
+    Callers should hold row locks on the leaves (select_for_update) so the same
+    leave cannot be credited twice concurrently.
+    """
+    leaves = [l for l in leaves if (l.type or '').upper() not in UNLIMITED_LEAVE_CODES]
+    if not leaves:
+        return []
+
+    types = {lt.code.upper(): lt for lt in LeaveType.objects.filter(code__in={l.type.upper() for l in leaves})}
+    outstanding = {
+        row['leave_id']: (row['debited'] or 0) - (row['credited'] or 0)
+        for row in LeaveLedgerEntry.objects.filter(leave__in=leaves).values('leave_id').annotate(
+            debited=Sum('days', filter=Q(entry_type=LeaveLedgerEntry.DEBIT)),
+            credited=Sum('days', filter=Q(entry_type=LeaveLedgerEntry.CREDIT)),
+        ).order_by()
+    }
+
+    entries = []
+    for leave in leaves:
+        leave_type = types.get(leave.type.upper())
+        days = outstanding.get(leave.id, 0)
+        if not leave_type or days <= 0:
+            continue
+        entries.append(LeaveLedgerEntry(
+            employee_id=leave.employee.pk, leave_type=leave_type, year=leave_year(leave),
+            entry_type=LeaveLedgerEntry.CREDIT, days=days, leave=leave, note=note
+        ))
+    return post_entries(entries)
+
+
+def rebuild_balances(year=None, employee=None):
+    """
+    Replays the ledger into EmployeeLeaveBalance. Only (employee, type, year)
+    keys that have ledger entries are touched. Returns the number of rows written.
+    """
+    scope = {}
+    if year is not None:
+        scope['year'] = year
+    if employee is not None:
+        scope['employee'] = employee
+    entries = LeaveLedgerEntry.objects.filter(**scope)
+
+    totals = entries.values('employee_id', 'leave_type_id', 'year').annotate(
+        allocated=Sum('days', filter=Q(entry_type__in=ALLOCATING_ENTRIES)),
+        debited=Sum('days', filter=Q(entry_type__in=[LeaveLedgerEntry.DEBIT, LeaveLedgerEntry.ENCASHMENT])),
+        credited=Sum('days', filter=Q(entry_type=LeaveLedgerEntry.CREDIT)),
+    ).order_by()
+
+    with transaction.atomic():
+        existing = {
+            (b.employee_id, b.leave_type_id, b.year): b
+            for b in EmployeeLeaveBalance.objects.select_for_update().filter(**scope)
+        }
+        to_create, to_update = [], []
+        for row in totals:
+            key = (row['employee_id'], row['leave_type_id'], row['year'])
+            allocated = row['allocated'] or 0
+            consumed = (row['debited'] or 0) - (row['credited'] or 0)
+            bal = existing.get(key)
+            if bal is None:
+                to_create.append(EmployeeLeaveBalance(
+                    employee_id=key[0], leave_type_id=key[1], year=key[2],
+                    allocated_days=allocated, consumed_days=consumed
+                ))
+            elif bal.allocated_days != allocated or bal.consumed_days != consumed:
+                bal.allocated_days = allocated
+                bal.consumed_days = consumed
+                to_update.append(bal)
+        EmployeeLeaveBalance.objects.bulk_create(to_create, batch_size=500)
+        EmployeeLeaveBalance.objects.bulk_update(to_update, ['allocated_days', 'consumed_days'], batch_size=500)
+        written = len(to_create) + len(to_update)
+    return written
+
+
+def prorated_allocation(days_per_year, joining_date, year):
+    """
+    Full allocation for employees who joined before the year, otherwise the
+    share of the year remaining from the joining date, rounded to half days.
+    """
+    if not joining_date or joining_date.year < year:
+        return days_per_year
+    if joining_date.year > year:
+        return 0
+    year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+    fraction = ((year_end - joining_date).days + 1) / ((year_end - year_start).days + 1)
+    return round(days_per_year * fraction * 2) / 2
+
+
+def allocate_year(year, carry_forward_cap=None, dry_run=False):
+    """
+    Year-end batch for the whole org: for every active employee and leave type,
+    carries forward (and/or encashes) last year's unused balance and allocates
+    this year's pro-rated days. Safe to re-run: a (employee, type) pair that
+    already has an entry of a kind for the year is not posted again.
+    Returns a dict of entry counts per entry type.
+    """
+    leave_types = [lt for lt in LeaveType.objects.all() if lt.code.upper() not in UNLIMITED_LEAVE_CODES]
+    employees = list(
+        Employees.objects.filter(status__in=ACTIVE_EMPLOYEE_STATUSES).values_list('id', 'joining_date')
+    )
+    employee_ids = [emp_id for emp_id, _ in employees]
+
+    # Entries already posted by a previous run (or by hand) for this year-end
+    posted = set(
+        LeaveLedgerEntry.objects.filter(employee_id__in=employee_ids).filter(
+            Q(year=year, entry_type__in=[LeaveLedgerEntry.ALLOCATION, LeaveLedgerEntry.CARRY_FORWARD]) |
+            Q(year=year - 1, entry_type=LeaveLedgerEntry.ENCASHMENT)
+        ).values_list('employee_id', 'leave_type_id', 'entry_type').distinct()
+    )
+    unused = {
+        (b.employee_id, b.leave_type_id): b.available_days
+        for b in EmployeeLeaveBalance.objects.filter(year=year - 1, employee_id__in=employee_ids)
+    }
+
+    entries = []
+    for emp_id, joining_date in employees:
+        for lt in leave_types:
+            if (emp_id, lt.id, LeaveLedgerEntry.ALLOCATION) not in posted:
+                days = prorated_allocation(lt.days_per_year, joining_date, year)
+                if days > 0:
+                    entries.append(LeaveLedgerEntry(
+                        employee_id=emp_id, leave_type=lt, year=year, entry_type=LeaveLedgerEntry.ALLOCATION,
+                        days=days, note=f'Annual allocation {year}'
+                    ))
+
+            remaining = unused.get((emp_id, lt.id), 0)
+            if remaining <= 0:
+                continue
+            carried = 0
+            if lt.carry_forward:
+                carried = remaining if carry_forward_cap is None else min(remaining, carry_forward_cap)
+                if (emp_id, lt.id, LeaveLedgerEntry.CARRY_FORWARD) not in posted:
+                    entries.append(LeaveLedgerEntry(
+                        employee_id=emp_id, leave_type=lt, year=year, entry_type=LeaveLedgerEntry.CARRY_FORWARD,
+                        days=carried, note=f'Carried forward from {year - 1}'
+                    ))
+            # Whatever is not carried forward is encashed where the type allows it, otherwise it lapses
+            encashed = remaining - carried
+            if lt.encashment and encashed > 0 and (emp_id, lt.id, LeaveLedgerEntry.ENCASHMENT) not in posted:
+                entries.append(LeaveLedgerEntry(
+                    employee_id=emp_id, leave_type=lt, year=year - 1, entry_type=LeaveLedgerEntry.ENCASHMENT,
+                    days=encashed, note=f'Encashed at year end {year - 1}'
+                ))
+
+    summary = defaultdict(int)
+    for entry in entries:
+        summary[entry.entry_type] += 1
+    if dry_run:
+        return dict(summary)
+
+    with transaction.atomic():
+        LeaveLedgerEntry.objects.bulk_create(entries, batch_size=500)
+        rebuild_balances(year=year)
+        if summary.get(LeaveLedgerEntry.ENCASHMENT):
+            rebuild_balances(year=year - 1)
+    return dict(summary)
@@ -0,0 +1,169 @@
+"""
+Org-wide leave liability and utilization forecast, computed with grouped
+aggregates over EmployeeLeaveBalance (ledger-maintained totals) and Leaves.
+Leave in progress on the as-of date is split: the working days up to it
+count as taken, the rest as booked. Results are cached for the rest of the day
+they were computed on.
+"""
+from calendar import isleap
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from core.models import EmployeeLeaveBalance, Leaves
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK, FULL_DAY
+
+BOOKED_STATUSES = ['Pending', 'Approved']
+
+
+def _seconds_until_midnight():
+    now = datetime.now()
+    return int((datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()) or 1
+
+
+def _forecast(row, elapsed_fraction):
+    """
+    Burn rate is leave taken so far spread over the elapsed part of the year.
+    The year-end forecast is what was taken, plus whichever is larger: leave
+    already booked ahead, or the burn rate continued over the rest of the year.
+    """
+    allocated = row.get('allocated') or 0
+    consumed = row.get('consumed') or 0
+    taken = row.get('taken') or 0
+    booked = row.get('booked') or 0
+    projected_rest = taken / elapsed_fraction * (1 - elapsed_fraction) if elapsed_fraction else 0
+    forecast = taken + max(booked, projected_rest)
+    return {
+        'headcount': row.get('headcount') or 0,
+        'allocated': allocated,
+        'consumed': consumed,
+        'available': allocated - consumed,
+        'taken_to_date': taken,
+        'booked_ahead': booked,
+        'burn_rate_per_month': round(taken / (elapsed_fraction * 12), 2) if elapsed_fraction else 0,
+        'forecast_year_end': round(forecast, 2),
+        'projected_utilization': round(forecast / allocated, 4) if allocated else None,
+    }
+
+
+def _split_in_progress(leaves, as_of):
+    """(leave, taken, booked) for leaves that start on or before as_of and end after it."""
+    calendar = WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+    as_of_str = as_of.isoformat()
+    split = []
+    for leave in leaves.filter(from_date__lte=as_of_str, to_date__gt=as_of_str).prefetch_related('employee__teams'):
+        try:
+            taken = calendar.leave_days(leave.from_date, as_of, leave.from_session, FULL_DAY)
+        except ValueError:
+            continue
+        taken = min(taken, leave.days or 0)
+        split.append((leave, taken, (leave.days or 0) - taken))
+    return split
+
+
+def build_leave_liability_report(year, as_of):
+    year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+    as_of = min(max(as_of, year_start - timedelta(days=1)), year_end)
+    elapsed_fraction = ((as_of - year_start).days + 1) / (366 if isleap(year) else 365)
+
+    balances = EmployeeLeaveBalance.objects.filter(year=year)
+    balance_totals = dict(
+        allocated=Sum('allocated_days'),
+        consumed=Sum('consumed_days'),
+        headcount=Count('employee', distinct=True),
+    )
+    # Leave charged to this year: taken up to as_of vs. booked after it
+    leaves = Leaves.objects.filter(
+        status__in=BOOKED_STATUSES,
+        from_date__gte=year_start.isoformat(),
+        from_date__lte=year_end.isoformat()
+    )
+    as_of_str = as_of.isoformat()
+    leave_totals = dict(
+        taken=Sum('days', filter=Q(to_date__lte=as_of_str)),
+        booked=Sum('days', filter=Q(from_date__gt=as_of_str)),
+    )
+    in_progress = _split_in_progress(leaves, as_of)
+    paid_in_progress = [item for item in in_progress if (item[0].type or '').lower() != 'lwp']
+
+    # --- Org ---
+    org_row = balances.aggregate(
+        **balance_totals,
+        liability=Sum(F('allocated_days') - F('consumed_days'), filter=Q(leave_type__encashment=True)),
+    )
+    org_row.update(leaves.exclude(type__iexact='lwp').aggregate(**leave_totals))
+    org_row['taken'] = (org_row['taken'] or 0) + sum(taken for _, taken, _ in paid_in_progress)
+    org_row['booked'] = (org_row['booked'] or 0) + sum(booked for _, _, booked in paid_in_progress)
+    org = _forecast(org_row, elapsed_fraction)
+    org['encashable_liability_days'] = org_row['liability'] or 0
+
+    # --- By leave type ---
+    # Leave codes are stored in different cases on Leaves, so fold them together
+    folded = {}
+    for row in leaves.values('type').annotate(**leave_totals).order_by():
+        agg = folded.setdefault((row['type'] or '').upper(), {'taken': 0, 'booked': 0})
+        agg['taken'] += row['taken'] or 0
+        agg['booked'] += row['booked'] or 0
+    for leave, taken, booked in in_progress:
+        agg = folded.setdefault((leave.type or '').upper(), {'taken': 0, 'booked': 0})
+        agg['taken'] += taken
+        agg['booked'] += booked
+
+    by_type = []
+    for row in balances.values('leave_type__code', 'leave_type__name', 'leave_type__encashment').annotate(**balance_totals).order_by('leave_type__code'):
+        code = row['leave_type__code'].upper()
+        row.update(folded.get(code, {}))
+        entry = _forecast(row, elapsed_fraction)
+        entry.update({
+            'code': code,
+            'name': row['leave_type__name'],
+            'encashable': row['leave_type__encashment'],
+            'encashable_liability_days': entry['available'] if row['leave_type__encashment'] else 0,
+        })
+        by_type.append(entry)
+
+    # --- By team (employees in several teams count towards each) ---
+    leave_by_team = {
+        row['employee__teams__id']: {'taken': row['taken'] or 0, 'booked': row['booked'] or 0}
+        for row in leaves.exclude(type__iexact='lwp').values('employee__teams__id').annotate(**leave_totals).order_by()
+    }
+    for leave, taken, booked in paid_in_progress:
+        for team in leave.employee.teams.all():
+            agg = leave_by_team.setdefault(team.id, {'taken': 0, 'booked': 0})
+            agg['taken'] += taken
+            agg['booked'] += booked
+    by_team = []
+    for row in balances.filter(employee__teams__isnull=False).values('employee__teams__id', 'employee__teams__name').annotate(
+        **balance_totals,
+        liability=Sum(F('allocated_days') - F('consumed_days'), filter=Q(leave_type__encashment=True)),
+    ).order_by('employee__teams__name'):
+        team_leaves = leave_by_team.get(row['employee__teams__id'], {})
+        row['taken'] = team_leaves.get('taken')
+        row['booked'] = team_leaves.get('booked')
+        entry = _forecast(row, elapsed_fraction)
+        entry.update({
+            'team_id': row['employee__teams__id'],
+            'team': row['employee__teams__name'],
+            'encashable_liability_days': row['liability'] or 0,
+        })
+        by_team.append(entry)
+
+    return {
+        'year': year,
+        'as_of': as_of_str,
+        'elapsed_fraction': round(elapsed_fraction, 4),
+        'org': org,
+        'by_leave_type': by_type,
+        'by_team': by_team,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def get_leave_liability_report(year=None, refresh=False):
+    today = date.today()
+    year = year or today.year
+    key = f'leave_liability:{year}:{today.isoformat()}'
+    data = None if refresh else cache.get(key)
+    if data is None:
+        data = build_leave_liability_report(year, today)
+        cache.set(key, data, _seconds_until_midnight())
+    return data
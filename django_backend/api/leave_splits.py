@@ -0,0 +1,141 @@
+"""
+Removes days from an approved leave (e.g. the employee checked in during it).
+All removed dates for a leave are handled in one pass: the remaining leave is
+computed as contiguous segments in memory, then written under a row lock on the
+leave together with the ledger entries, so concurrent approvals cannot split or
+credit the same leave twice.
+"""
+from datetime import timedelta
+from django.db import transaction
+from core.models import Leaves, LeaveLedgerEntry
+from .leave_ledger import (
+    get_leave_type, leave_year, outstanding_days, post_entries, UNLIMITED_LEAVE_CODES
+)
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK, FULL_DAY, SESSION_1, SESSION_2, normalize_session, parse_date
+
+
+def remaining_segments(start, end, removed):
+    """Contiguous (start, end) runs of [start, end] that avoid every removed date."""
+    segments = []
+    seg_start = None
+    d = start
+    while d <= end:
+        if d in removed:
+            if seg_start is not None:
+                segments.append((seg_start, d - timedelta(days=1)))
+                seg_start = None
+        elif seg_start is None:
+            seg_start = d
+        d += timedelta(days=1)
+    if seg_start is not None:
+        segments.append((seg_start, end))
+    return segments
+
+
+def _removed_days(calendar, leave, start, end, removed):
+    """Working days taken out of the leave, honouring half-day sessions at its ends."""
+    total = 0
+    for d in removed:
+        if not calendar.is_working_day(d):
+            continue
+        weight = 1
+        if d == start and normalize_session(leave.from_session) == SESSION_2:
+            weight -= 0.5
+        if d == end and normalize_session(leave.to_session) == SESSION_1:
+            weight -= 0.5
+        total += max(0, weight)
+    return total
+
+
+def remove_leave_dates(leave_id, date_strs, reason_note=None):
+    """
+    Cuts the given dates out of a leave in one transaction. The leave is
+    cancelled if nothing remains; otherwise it keeps the first remaining segment
+    and each further segment becomes a new leave with the same type and status.
+    Returns (leave, new_leaves), or (None, []) if the leave does not exist.
+    """
+    with transaction.atomic():
+        leave = Leaves.objects.select_for_update(of=('self',)).select_related('employee').filter(pk=leave_id).first()
+        if not leave or leave.status in ('Cancelled', 'Rejected'):
+            return leave, []
+
+        start, end = parse_date(leave.from_date), parse_date(leave.to_date)
+        removed = {parse_date(d) for d in date_strs}
+        removed = {d for d in removed if start <= d <= end}
+        if not removed:
+            return leave, []
+
+        checked_in = ', '.join(sorted(d.isoformat() for d in removed))
+        note = reason_note or f"Checked in on {checked_in}"
+        segments = remaining_segments(start, end, removed)
+        leave_type = None
+        code = (leave.type or '').upper()
+        if code not in UNLIMITED_LEAVE_CODES:
+            leave_type = get_leave_type(code)
+        outstanding = outstanding_days(leave) if leave_type else 0
+
+        if not segments:
+            leave.status = 'Cancelled'
+            leave.save()
+            if leave_type and outstanding > 0:
+                post_entries([LeaveLedgerEntry(
+                    employee_id=leave.employee.pk, leave_type=leave_type, year=leave_year(leave),
+                    entry_type=LeaveLedgerEntry.CREDIT, days=outstanding, leave=leave, note=note
+                )])
+            return leave, []
+
+        calendar = WorkingDayCalendar.from_db(LEAVE_WEEKMASK)
+        removed_days = _removed_days(calendar, leave, start, end, removed)
+
+        # Segments after the first become new leaves; their days come from the calendar
+        new_specs = []
+        for seg_start, seg_end in segments[1:]:
+            to_session = leave.to_session if seg_end == end else FULL_DAY
+            new_specs.append((seg_start, seg_end, to_session, calendar.leave_days(seg_start, seg_end, FULL_DAY, to_session)))
+        moved_days = sum(spec[3] for spec in new_specs)
+
+        first_start, first_end = segments[0]
+        leave.from_date = first_start.isoformat()
+        leave.to_date = first_end.isoformat()
+        if first_start != start:
+            leave.from_session = FULL_DAY
+        if first_end != end:
+            leave.to_session = FULL_DAY
+        leave.days = max(0, leave.days - removed_days - moved_days)
+        leave.save()
+
+        new_leaves = []
+        for seg_start, seg_end, to_session, days in new_specs:
+            new_leaves.append(Leaves.objects.create(
+                employee=leave.employee,
+                type=leave.type,
+                from_date=seg_start.isoformat(),
+                to_date=seg_end.isoformat(),
+                days=days,
+                reason=f"{leave.reason} (Split due to check-in on {checked_in})",
+                from_session=FULL_DAY,
+                to_session=to_session,
+                status=leave.status,
+                created_at=leave.created_at
+            ))
+
+        # One set of ledger entries: return the removed days and move the split-off
+        # days onto the new leaves, so each part can be cancelled on its own.
+        if leave_type:
+            employee_pk, year = leave.employee.pk, leave_year(leave)
+            entries = []
+            credit = min(outstanding, removed_days + moved_days)
+            if credit > 0:
+                entries.append(LeaveLedgerEntry(
+                    employee_id=employee_pk, leave_type=leave_type, year=year,
+                    entry_type=LeaveLedgerEntry.CREDIT, days=credit, leave=leave, note=note
+                ))
+            for new_leave in new_leaves:
+                if new_leave.days > 0:
+                    entries.append(LeaveLedgerEntry(
+                        employee_id=employee_pk, leave_type=leave_type, year=leave_year(new_leave),
+                        entry_type=LeaveLedgerEntry.DEBIT, days=new_leave.days, leave=new_leave,
+                        note=f"Split from leave {leave.id}"
+                    ))
+            post_entries(entries)
+        return leave, new_leaves
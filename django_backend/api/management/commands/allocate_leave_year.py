@@ -0,0 +1,23 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from core.models import LeaveLedgerEntry
+from api.leave_ledger import allocate_year
+
+
+class Command(BaseCommand):
+    help = 'Allocates leave for a year: carry-forward and encashment of last year, then pro-rated allocations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year to allocate (defaults to the current year)')
+        parser.add_argument('--carry-forward-cap', type=float, help='Maximum days carried forward per leave type')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be posted')
+
+    def handle(self, *args, **options):
+        year = options.get('year') or date.today().year
+        summary = allocate_year(year, carry_forward_cap=options.get('carry_forward_cap'), dry_run=options['dry_run'])
+
+        prefix = 'Would post' if options['dry_run'] else 'Posted'
+        for entry_type, label in LeaveLedgerEntry.ENTRY_TYPES:
+            if summary.get(entry_type):
+                self.stdout.write(f"{prefix} {summary[entry_type]} {label} entr{'y' if summary[entry_type] == 1 else 'ies'}")
+        self.stdout.write(self.style.SUCCESS(f"Leave allocation for {year} complete"))
@@ -0,0 +1,46 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+from api.ratelimit import TokenBucket, check_rate_limit
+from .loadtest_leave_apply import percentile
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-request cost of the OTP rate limiter (cache buckets, local buckets and the full view check)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Calls per measurement')
+        parser.add_argument('--keys', type=int, default=1000, help='Distinct phones/emails to spread the calls over')
+        parser.add_argument('--p99-budget-us', type=float, default=500, help='Fail if the p99 of the view check exceeds this')
+
+    def _measure(self, label, fn, idents):
+        timings = []
+        for ident in idents:
+            start = time.perf_counter()
+            fn(ident)
+            timings.append((time.perf_counter() - start) * 1e6)
+        self.stdout.write(
+            f"{label:<22} mean={sum(timings) / len(timings):.1f}us p50={percentile(timings, 50):.1f}us "
+            f"p99={percentile(timings, 99):.1f}us"
+        )
+        return timings
+
+    def handle(self, *args, **options):
+        idents = [f"bench-{random.randrange(options['keys'])}" for _ in range(options['iterations'])]
+        bucket = TokenBucket('bench', capacity=5, rate=1 / 60)
+        self._measure('cache bucket', bucket.consume_cached, idents)
+        self._measure('local bucket', bucket.consume_local, idents)
+
+        factory = APIRequestFactory()
+        request = factory.post('/api/auth/send-otp/')
+
+        def view_check(ident):
+            request.META['REMOTE_ADDR'] = ident  # one client per identity, so both buckets are checked
+            return check_rate_limit(request, 'otp_send', ident)
+
+        timings = self._measure('check_rate_limit', view_check, idents)
+
+        if percentile(timings, 99) > options['p99_budget_us']:
+            raise CommandError(f"p99 above budget of {options['p99_budget_us']}us")
+        self.stdout.write(self.style.SUCCESS('Rate limiter within budget'))
@@ -0,0 +1,41 @@
+import json
+from django.core.management.base import BaseCommand
+from api.leave_reports import get_leave_liability_report
+
+
+class Command(BaseCommand):
+    help = 'Prints org-wide leave liability and year-end utilization forecast by leave type and team'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Report year (defaults to the current year)')
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+        parser.add_argument('--refresh', action='store_true', help="Recompute instead of using today's cached report")
+
+    def handle(self, *args, **options):
+        report = get_leave_liability_report(options.get('year'), refresh=options['refresh'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+            return
+
+        org = report['org']
+        self.stdout.write(f"Leave liability for {report['year']} as of {report['as_of']}")
+        self.stdout.write(
+            f"Org: {org['headcount']} employees, {org['available']:.1f} days available, "
+            f"{org['encashable_liability_days']:.1f} encashable, forecast utilization "
+            f"{(org['projected_utilization'] or 0) * 100:.1f}%"
+        )
+
+        header = f"{'':<28}{'Alloc':>8}{'Used':>8}{'Avail':>8}{'Encash':>8}{'Burn/mo':>9}{'Forecast':>10}{'Util%':>7}"
+        for title, rows, label in (
+            ('By leave type', report['by_leave_type'], 'code'),
+            ('By team', report['by_team'], 'team'),
+        ):
+            self.stdout.write(f"\n{title}")
+            self.stdout.write(header)
+            for row in rows:
+                util = f"{row['projected_utilization'] * 100:.0f}" if row['projected_utilization'] is not None else '-'
+                self.stdout.write(
+                    f"{str(row[label])[:27]:<28}{row['allocated']:>8.1f}{row['consumed']:>8.1f}{row['available']:>8.1f}"
+                    f"{row['encashable_liability_days']:>8.1f}{row['burn_rate_per_month']:>9.2f}{row['forecast_year_end']:>10.1f}{util:>7}"
+                )
+        self.stdout.write(self.style.SUCCESS(f"\nGenerated at {report['generated_at']}"))
@@ -0,0 +1,128 @@
+import time
+import threading
+from collections import Counter
+from datetime import date
+from queue import Queue, Empty
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+from core.models import Employees, Leaves, LeaveType, LeaveLedgerEntry, EmployeeLeaveBalance
+from api.leave_ledger import post_entry
+from api.leave_views import apply_leave
+from api.working_days import WorkingDayCalendar, LEAVE_WEEKMASK
+
+LOADTEST_CODE = 'LOADTEST'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires concurrent single-day leave applies for a throwaway employee with a small allocation, '
+        'then checks the balance was never overdrawn and reports latency percentiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=40, help='Total apply requests (one working day each)')
+        parser.add_argument('--allocation', type=float, default=10, help='Days allocated to the test employee')
+        parser.add_argument('--p99-budget-ms', type=float, default=500, help='Fail if p99 latency exceeds this')
+        parser.add_argument('--keep', action='store_true', help='Keep the test employee and leaves afterwards')
+
+    def handle(self, *args, **options):
+        year = date.today().year + 1
+        calendar = WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+        days = []
+        for d in calendar.working_dates(date(year, 1, 1), date(year, 12, 31)):
+            days.append(d)
+            if len(days) == options['requests']:
+                break
+        if len(days) < options['requests']:
+            raise CommandError(f"Only {len(days)} working days available in {year}")
+
+        stamp = int(time.time())
+        leave_type, _ = LeaveType.objects.get_or_create(
+            code=LOADTEST_CODE, defaults={'name': 'Load Test Leave', 'days_per_year': 0}
+        )
+        employee = Employees.objects.create(
+            employee_id=f'LOADTEST-{stamp}',
+            first_name='Load',
+            last_name='Test',
+            email=f'loadtest-{stamp}@example.com',
+            role='Developer',
+            status='Active'
+        )
+        post_entry(employee, leave_type, year, LeaveLedgerEntry.ALLOCATION, options['allocation'], note='Load test allocation')
+
+        queue = Queue()
+        for d in days:
+            queue.put(d)
+        factory = APIRequestFactory()
+        latencies, outcomes = [], Counter()
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        d = queue.get_nowait()
+                    except Empty:
+                        return
+                    request = factory.post('/api/leaves/apply/', {
+                        'employeeId': employee.employee_id,
+                        'fromDate': d.isoformat(),
+                        'toDate': d.isoformat(),
+                        'type': LOADTEST_CODE.lower(),
+                        'days': 1,
+                        'reason': 'Load test'
+                    }, format='json')
+                    started = time.perf_counter()
+                    response = apply_leave(request)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes[response.status_code] += 1
+            finally:
+                connection.close()
+
+        self.stdout.write(f"Firing {len(days)} applies from {options['threads']} threads against {options['allocation']} days")
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        balance = EmployeeLeaveBalance.objects.get(employee=employee, leave_type=leave_type, year=year)
+        booked = sum(Leaves.objects.filter(employee=employee).values_list('days', flat=True))
+        overdrawn = balance.consumed_days > balance.allocated_days or booked > balance.allocated_days
+        mismatch = balance.consumed_days != booked
+
+        self.stdout.write(f"Responses: {dict(outcomes)} in {wall:.2f}s ({len(latencies) / wall:.1f} req/s)")
+        self.stdout.write(
+            f"Latency ms: p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+            f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}"
+        )
+        self.stdout.write(
+            f"Balance: allocated={balance.allocated_days} consumed={balance.consumed_days} booked={booked}"
+        )
+
+        if not options['keep']:
+            Leaves.objects.filter(employee=employee).delete()
+            employee.delete()
+            if not LeaveLedgerEntry.objects.filter(leave_type=leave_type).exists():
+                leave_type.delete()
+
+        if overdrawn:
+            raise CommandError('Balance was overdrawn')
+        if mismatch:
+            raise CommandError('Ledger balance does not match the leaves that were booked')
+        if percentile(latencies, 99) > options['p99_budget_ms']:
+            raise CommandError(f"p99 latency above budget of {options['p99_budget_ms']}ms")
+        self.stdout.write(self.style.SUCCESS('No overdraw, p99 within budget'))
@@ -0,0 +1,108 @@
+import time
+import threading
+from collections import Counter
+from queue import Queue, Empty
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+from core.models import Employees
+from api.models import OTPStore
+from api.otp_delivery import SENT, FAILED
+from api.views import send_otp
+from .loadtest_leave_apply import percentile
+
+LOADTEST_PHONE = '9000000001'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires concurrent send_otp requests against the local stand-in gateway, then waits for the '
+        'delivery queue to drain and reports API and delivery latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Total send_otp requests')
+        parser.add_argument('--gateway-latency-ms', type=float, default=800, help='Simulated gateway latency')
+        parser.add_argument('--failure-rate', type=float, default=0.1, help='Share of gateway calls that fail')
+        parser.add_argument('--workers', type=int, default=8, help='Delivery worker threads')
+        parser.add_argument('--timeout', type=float, default=120, help='Seconds to wait for the queue to drain')
+        parser.add_argument('--p99-budget-ms', type=float, default=250, help='Fail if API p99 latency exceeds this')
+        parser.add_argument('--keep', action='store_true', help='Keep the test employee and OTP rows afterwards')
+
+    def handle(self, *args, **options):
+        employee, created = Employees.objects.get_or_create(
+            employee_id='LOADTEST-OTP',
+            defaults={'first_name': 'Load', 'last_name': 'Test', 'email': 'loadtest-otp@example.com',
+                      'role': 'Tester', 'status': 'Active', 'contact': LOADTEST_PHONE}
+        )
+        overrides = override_settings(
+            OTP_GATEWAY='local',
+            OTP_LOCAL_GATEWAY_LATENCY_MS=options['gateway_latency_ms'],
+            OTP_LOCAL_GATEWAY_FAILURE_RATE=options['failure_rate'],
+            OTP_DELIVERY_WORKERS=options['workers'],
+            OTP_DELIVERY_RETRY_DELAYS=(0.1, 0.5, 1),
+            OTP_RATE_LIMITS={'otp_send': (10 ** 6, 1000), 'otp_send_ip': (10 ** 6, 1000)},
+        )
+        overrides.enable()
+        try:
+            self._run(options)
+        finally:
+            overrides.disable()
+            if not options['keep']:
+                OTPStore.objects.filter(phone=LOADTEST_PHONE).delete()
+                if created:
+                    employee.delete()
+
+    def _run(self, options):
+        factory = APIRequestFactory()
+        work = Queue()
+        for _ in range(options['requests']):
+            work.put(None)
+        latencies, outcomes, delivery_ids = [], Counter(), []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    work.get_nowait()
+                except Empty:
+                    return
+                request = factory.post('/api/auth/send-otp/', {'phone': LOADTEST_PHONE}, format='json')
+                start = time.perf_counter()
+                response = send_otp(request)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    outcomes[response.status_code] += 1
+                    if response.status_code == 200:
+                        delivery_ids.append(response.data['delivery_id'])
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        api_wall = time.perf_counter() - started
+        self.stdout.write(f"Responses: {dict(outcomes)} in {api_wall:.2f}s ({len(latencies) / api_wall:.1f} req/s)")
+        self.stdout.write(
+            f"API latency ms: p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+            f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}"
+        )
+
+        deadline = time.monotonic() + options['timeout']
+        statuses = Counter()
+        while time.monotonic() < deadline:
+            statuses = Counter(OTPStore.objects.filter(delivery_id__in=delivery_ids).values_list('delivery_status', flat=True))
+            if statuses[SENT] + statuses[FAILED] == len(delivery_ids):
+                break
+            time.sleep(0.2)
+        drained = time.perf_counter() - started
+        self.stdout.write(f"Delivery: {dict(statuses)} after {drained:.2f}s")
+
+        if statuses[SENT] + statuses[FAILED] != len(delivery_ids):
+            raise CommandError('Delivery queue did not drain before the timeout')
+        if percentile(latencies, 99) > options['p99_budget_ms']:
+            raise CommandError(f"API p99 latency above budget of {options['p99_budget_ms']}ms")
+        self.stdout.write(self.style.SUCCESS('Queue drained, API p99 within budget'))
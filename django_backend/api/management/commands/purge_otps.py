@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from api.otp import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Deletes login OTPs that expired or were used more than --hours ago (run periodically, e.g. hourly cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Keep codes that expired within this many hours (default 24)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be deleted')
+
+    def handle(self, *args, **options):
+        purged = purge_expired(older_than=timedelta(hours=options['hours']), dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for model_name, rows in purged.items():
+            self.stdout.write(self.style.SUCCESS(f"{verb} {rows} {model_name} row(s)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Employees
+from api.leave_ledger import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Replays the leave ledger and rewrites EmployeeLeaveBalance running totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only rebuild balances for this year')
+        parser.add_argument('--employee', type=str, help='Only rebuild balances for this employee_id')
+
+    def handle(self, *args, **options):
+        employee = None
+        if options.get('employee'):
+            employee = Employees.objects.filter(employee_id=options['employee']).first()
+            if not employee:
+                raise CommandError(f"Employee {options['employee']} not found")
+
+        written = rebuild_balances(year=options.get('year'), employee=employee)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} leave balance row(s) from the ledger"))
@@ -0,0 +1,39 @@
+import json
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.outbox import drain, retry_dead, purge_sent, outbox_metrics, POLL_SECONDS
+
+
+class Command(BaseCommand):
+    help = 'Sends queued notification emails from the outbox (loops until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due now and exit')
+        parser.add_argument('--batch', type=int, default=50, help='Rows claimed per round (default 50)')
+        parser.add_argument('--interval', type=int, default=POLL_SECONDS, help='Seconds between polls when idle')
+        parser.add_argument('--retry-dead', action='store_true', help='Requeue emails that ran out of attempts, then exit')
+        parser.add_argument('--purge-days', type=int, help='Delete sent emails older than this many days, then exit')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and delivery latency, then exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_metrics(), indent=2, default=str))
+            return
+        if options['retry_dead']:
+            self.stdout.write(self.style.SUCCESS(f"Requeued {retry_dead()} dead email(s)"))
+            return
+        if options['purge_days'] is not None:
+            deleted = purge_sent(older_than=timedelta(days=options['purge_days']))
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} sent email(s)"))
+            return
+
+        while True:
+            handled = drain(batch=options['batch'])
+            if handled:
+                self.stdout.write(f"Processed {handled} email(s)")
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
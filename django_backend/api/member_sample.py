@@ -0,0 +1,74 @@
+"""
+Random sample of active employees for the team member widget, drawn in the
+database so the directory is never loaded to show a handful of faces.
+
+On PostgreSQL a BERNOULLI TABLESAMPLE sized from the planner's row estimate
+picks the rows; elsewhere (or if the sample comes back short) random-offset
+keyset probes are used: pick a random id between min(id) and max(id) and take
+the first matching row at or after it, which is one index lookup per member.
+The sampled ids are cached briefly so the widget does not reshuffle on every
+render.
+"""
+import random
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from core.models import Employees
+
+SAMPLE_SIZE = 6
+SAMPLE_CACHE_TIMEOUT = 60
+SAMPLE_CACHE_KEY = 'member_sample_ids'
+MEMBER_STATUSES = ['Active', 'Remote']
+# Rows read per wanted member, to leave room for inactive employees in the sample
+OVERSAMPLE = 10
+
+
+def _tablesample_ids(k):
+    table = connection.ops.quote_name(Employees._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [Employees._meta.db_table])
+        row = cursor.fetchone()
+        estimate = row[0] if row else 0
+        if not estimate or estimate <= 0:
+            return []
+        percent = min(100.0, 100.0 * k * OVERSAMPLE / estimate)
+        cursor.execute(
+            f"SELECT id FROM {table} TABLESAMPLE BERNOULLI (%s) WHERE status IN %s ORDER BY random() LIMIT %s",
+            [percent, tuple(MEMBER_STATUSES), k]
+        )
+        return [r[0] for r in cursor.fetchall()]
+
+
+def _keyset_ids(queryset, k, exclude=()):
+    bounds = queryset.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return []
+    ids = list(exclude)
+    for _ in range(k * 3):
+        if len(ids) >= k:
+            break
+        pivot = random.randint(bounds['lo'], bounds['hi'])
+        remaining = queryset.exclude(id__in=ids)
+        found = (
+            remaining.filter(id__gte=pivot).order_by('id').values_list('id', flat=True).first()
+            or remaining.filter(id__lt=pivot).order_by('-id').values_list('id', flat=True).first()
+        )
+        if found is None:
+            break
+        ids.append(found)
+    return ids
+
+
+def sample_member_ids(k=SAMPLE_SIZE, refresh=False):
+    """Up to k random ids of active/remote employees, cached for SAMPLE_CACHE_TIMEOUT seconds."""
+    ids = None if refresh else cache.get(SAMPLE_CACHE_KEY)
+    if ids is not None:
+        return ids
+
+    ids = []
+    if connection.vendor == 'postgresql':
+        ids = _tablesample_ids(k)
+    if len(ids) < k:
+        ids = _keyset_ids(Employees.objects.filter(status__in=MEMBER_STATUSES), k, exclude=ids)
+    cache.set(SAMPLE_CACHE_KEY, ids, SAMPLE_CACHE_TIMEOUT)
+    return ids
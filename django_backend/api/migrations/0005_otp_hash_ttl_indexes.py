@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_otpstore_created_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='emailotpstore',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='otpstore',
+            name='otp',
+        ),
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='otp_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='otp_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='emailotpstore',
+            index=models.Index(fields=['email', 'is_verified', '-created_at'], name='api_emailotp_lookup'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotpstore',
+            index=models.Index(fields=['expires_at'], name='api_emailotp_expires'),
+        ),
+        migrations.AddIndex(
+            model_name='otpstore',
+            index=models.Index(fields=['phone', 'is_verified', '-created_at'], name='api_otp_phone_lookup'),
+        ),
+        migrations.AddIndex(
+            model_name='otpstore',
+            index=models.Index(fields=['expires_at'], name='api_otp_expires'),
+        ),
+    ]
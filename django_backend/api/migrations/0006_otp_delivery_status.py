@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_otp_hash_ttl_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='delivery_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='delivery_error',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='delivery_id',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='emailotpstore',
+            name='delivery_status',
+            field=models.CharField(default='Queued', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='delivery_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='delivery_error',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='delivery_id',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='otpstore',
+            name='delivery_status',
+            field=models.CharField(default='Queued', max_length=20),
+        ),
+    ]
@@ -2,30 +2,76 @@ from django.db import models
 
 class OTPStore(models.Model):
     phone = models.CharField(max_length=20)
-    otp = models.CharField(max_length=6)
+    otp_hash = models.CharField(max_length=64, default='')  # HMAC of the code, see api/otp.py
     is_verified = models.BooleanField(default=False)
     verified_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    delivery_id = models.CharField(max_length=32, unique=True, null=True, blank=True)  # see api/otp_delivery.py
+    delivery_status = models.CharField(max_length=20, default='Queued')  # Queued, Sending, Retrying, Sent, Failed
+    delivery_attempts = models.IntegerField(default=0)
+    delivery_error = models.CharField(max_length=255, blank=True, null=True)
 
     def __str__(self):
-        return f"{self.phone} - {self.otp} ({'Verified' if self.is_verified else 'Pending'})"
+        return f"{self.phone} ({'Verified' if self.is_verified else 'Pending'})"
 
     class Meta:
         verbose_name = "OTP Store"
         verbose_name_plural = "OTP Store entries"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['phone', 'is_verified', '-created_at'], name='api_otp_phone_lookup'),
+            models.Index(fields=['expires_at'], name='api_otp_expires'),
+        ]
 
 class EmailOTPStore(models.Model):
     email = models.EmailField(max_length=255)
-    otp = models.CharField(max_length=6)
+    otp_hash = models.CharField(max_length=64, default='')  # HMAC of the code, see api/otp.py
     is_verified = models.BooleanField(default=False)
     verified_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    delivery_id = models.CharField(max_length=32, unique=True, null=True, blank=True)  # see api/otp_delivery.py
+    delivery_status = models.CharField(max_length=20, default='Queued')  # Queued, Sending, Retrying, Sent, Failed
+    delivery_attempts = models.IntegerField(default=0)
+    delivery_error = models.CharField(max_length=255, blank=True, null=True)
 
     def __str__(self):
-        return f"{self.email} - {self.otp} ({'Verified' if self.is_verified else 'Pending'})"
+        return f"{self.email} ({'Verified' if self.is_verified else 'Pending'})"
 
     class Meta:
         verbose_name = "Email OTP Store"
         verbose_name_plural = "Email OTP Store entries"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['email', 'is_verified', '-created_at'], name='api_emailotp_lookup'),
+            models.Index(fields=['expires_at'], name='api_emailotp_expires'),
+        ]
+
+class NotificationOutbox(models.Model):
+    """Emails waiting to be sent by the outbox workers (see api/outbox.py)."""
+    PENDING = 'Pending'
+    PROCESSING = 'Processing'
+    SENT = 'Sent'
+    DEAD = 'Dead'
+
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField()  # not sent before this (retry backoff)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject} ({self.status})"
+
+    class Meta:
+        verbose_name = "Notification Outbox entry"
+        verbose_name_plural = "Notification Outbox"
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='api_outbox_due'),
+        ]
@@ -0,0 +1,161 @@
+"""
+Office occupancy forecast: expected in-office headcount per day, team and
+location for a window (a quarter ahead by default). Each active employee's
+chance of being in on a day is their historical check-in rate for that
+weekday, zeroed by an approved leave or WFH (single request or recurring
+rule) and halved by a pending one. Holidays and weekly offs have no one in.
+
+Everything comes from a handful of range queries: active employees with
+their teams, the unavailability store and recurring WFH rules for the
+window, and one grouped (employee, weekday) count over recent attendance.
+The result is cached; any leave/WFH/holiday change bumps a version key.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Count, DateField
+from django.db.models.functions import Cast, ExtractIsoWeekDay
+from core.models import Employees, Teams, Attendance, EmployeeUnavailability
+from .recurring_wfh import rules_in_window, expand_rules, ACTIVE_STATUSES
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK
+
+CACHE_TIMEOUT = 900
+VERSION_KEY = 'occupancy_version'
+DEFAULT_WINDOW_DAYS = 91
+MAX_WINDOW_DAYS = 184
+HISTORY_DAYS = 56
+# Share of a pending request that is assumed to be approved
+PENDING_WEIGHT = 0.5
+# Employees on site by default; 'Remote' employees are never counted in the office
+OFFICE_STATUSES = ['Active']
+
+
+def invalidate_occupancy():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _checkin_rates(employee_ids, as_of, calendar):
+    """
+    {(employee_id, weekday): rate} from the last HISTORY_DAYS of attendance,
+    the employee_ids that have any history, and {weekday: rate} for the whole
+    org as a fallback for new joiners.
+    """
+    start = as_of - timedelta(days=HISTORY_DAYS)
+    end = as_of - timedelta(days=1)
+    working = defaultdict(int)
+    for d in calendar.working_dates(start, end):
+        working[d.weekday()] += 1
+
+    rows = Attendance.objects.filter(
+        employee_id__in=employee_ids,
+        date__gte=start.isoformat(),
+        date__lte=end.isoformat(),
+        check_in__isnull=False
+    ).exclude(check_in__in=['', '-']).annotate(
+        weekday=ExtractIsoWeekDay(Cast('date', DateField()))
+    ).values('employee_id', 'weekday').annotate(days=Count('id')).order_by()
+
+    rates = {}
+    with_history = set()
+    org_days = defaultdict(int)
+    for row in rows:
+        weekday = row['weekday'] - 1
+        with_history.add(row['employee_id'])
+        org_days[weekday] += row['days']
+        if working[weekday]:
+            rates[(row['employee_id'], weekday)] = min(1.0, row['days'] / working[weekday])
+
+    headcount = len(employee_ids) or 1
+    org_rates = {
+        weekday: min(1.0, org_days[weekday] / (working[weekday] * headcount)) if working[weekday] and org_days else 1.0
+        for weekday in range(7)
+    }
+    return rates, with_history, org_rates
+
+
+def build_occupancy(start, end, as_of=None):
+    as_of = as_of or date.today()
+    calendar = WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    employees = {}
+    for row in Employees.objects.filter(status__in=OFFICE_STATUSES).values('id', 'employee_id', 'location', 'teams__id'):
+        emp = employees.setdefault(row['employee_id'], {'pk': row['id'], 'location': row['location'] or 'Unassigned', 'teams': []})
+        if row['teams__id']:
+            emp['teams'].append(row['teams__id'])
+    employee_ids = list(employees)
+    pk_to_employee_id = {emp['pk']: emp_id for emp_id, emp in employees.items()}
+
+    rates, with_history, org_rates = _checkin_rates(employee_ids, as_of, calendar)
+
+    # (employee_id, day index) -> weight of the day spent away from the office
+    away = defaultdict(float)
+
+    def mark(emp_id, d, status):
+        i = (d - start).days
+        away[(emp_id, i)] = max(away[(emp_id, i)], 1.0 if status == 'Approved' else PENDING_WEIGHT)
+
+    ranges = EmployeeUnavailability.objects.filter(
+        employee_id__in=list(pk_to_employee_id),
+        start_date__lte=end,
+        end_date__gte=start
+    ).values('employee_id', 'start_date', 'end_date', 'leave__status', 'wfh__status')
+    for row in ranges:
+        emp_id = pk_to_employee_id[row['employee_id']]
+        status = row['leave__status'] or row['wfh__status']
+        d = max(row['start_date'], start)
+        while d <= min(row['end_date'], end):
+            mark(emp_id, d, status)
+            d += timedelta(days=1)
+    for rule, d in expand_rules(rules_in_window(employee_ids, start, end, ACTIVE_STATUSES), start, end, calendar):
+        mark(rule.employee_id, d, rule.status)
+
+    result_days = []
+    for i, d in enumerate(days):
+        entry = {
+            'date': d.isoformat(),
+            'working': calendar.is_working_day(d),
+            'holiday': calendar.holiday_names.get(d),
+            'expected_in_office': 0,
+            'by_team': {},
+            'by_location': {},
+        }
+        if entry['working']:
+            by_team, by_location = defaultdict(float), defaultdict(float)
+            total = 0.0
+            weekday = d.weekday()
+            for emp_id, emp in employees.items():
+                default_rate = 0 if emp_id in with_history else org_rates[weekday]
+                expected = rates.get((emp_id, weekday), default_rate) * (1 - away.get((emp_id, i), 0))
+                if not expected:
+                    continue
+                total += expected
+                by_location[emp['location']] += expected
+                for team_id in emp['teams']:
+                    by_team[team_id] += expected
+            entry['expected_in_office'] = round(total, 1)
+            entry['by_team'] = {team_id: round(v, 1) for team_id, v in by_team.items()}
+            entry['by_location'] = {loc: round(v, 1) for loc, v in by_location.items()}
+        result_days.append(entry)
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'headcount': len(employees),
+        'teams': dict(Teams.objects.values_list('id', 'name')),
+        'days': result_days,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def get_occupancy(start, end, refresh=False):
+    version = cache.get(VERSION_KEY, 0)
+    key = f'occupancy:{start.isoformat()}:{end.isoformat()}:{date.today().isoformat()}:v{version}'
+    data = None if refresh else cache.get(key)
+    if data is None:
+        data = build_occupancy(start, end)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
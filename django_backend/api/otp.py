@@ -0,0 +1,101 @@
+"""
+Login OTPs (WhatsApp to a phone, or email). Codes are stored as an HMAC keyed
+with SECRET_KEY, never in plain text, and expire OTP_TTL_SECONDS after they are
+sent. Only the latest code sent to a phone/email is valid.
+
+The latest code for each phone/email is also kept in the cache for its TTL, so
+a verify attempt is checked without reading the table; the database (looked up
+through the (key, is_verified, created_at) index) is only consulted when the
+cache entry is missing, e.g. after a restart. A successful verify marks the row
+with one UPDATE by primary key, which also makes a code single-use when two
+attempts race. Old rows are removed by the purge_otps command.
+"""
+import hashlib
+import hmac
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import OTPStore, EmailOTPStore
+
+PHONE = 'phone'
+EMAIL = 'email'
+STORES = {
+    PHONE: (OTPStore, 'phone'),
+    EMAIL: (EmailOTPStore, 'email'),
+}
+
+
+def ttl_seconds():
+    return getattr(settings, 'OTP_TTL_SECONDS', 300)
+
+
+def hash_otp(kind, key, otp):
+    message = f"{kind}:{key}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _cache_key(kind, key):
+    return f"otp:{kind}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def generate_otp():
+    return str(random.SystemRandom().randint(100000, 999999))
+
+
+def issue_otp(kind, key, otp=None, delivery_id=None):
+    """Stores a new code for key (a normalized phone or an email) and returns it."""
+    model, field = STORES[kind]
+    otp = otp or generate_otp()
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl_seconds())
+    entry = model.objects.create(**{
+        field: key,
+        'otp_hash': hash_otp(kind, key, otp),
+        'created_at': now,
+        'expires_at': expires_at,
+        'delivery_id': delivery_id,
+    })
+    cache.set(_cache_key(kind, key), {'id': entry.id, 'hash': entry.otp_hash, 'expires_at': expires_at}, ttl_seconds())
+    return otp
+
+
+def _latest_pending(kind, key, now):
+    cached = cache.get(_cache_key(kind, key))
+    if cached is not None:
+        return cached
+    model, field = STORES[kind]
+    entry = model.objects.filter(**{field: key, 'is_verified': False}).order_by('-created_at').values(
+        'id', 'otp_hash', 'expires_at'
+    ).first()
+    if not entry or not entry['expires_at'] or entry['expires_at'] <= now:
+        return None
+    return {'id': entry['id'], 'hash': entry['otp_hash'], 'expires_at': entry['expires_at']}
+
+
+def verify_otp_code(kind, key, otp):
+    """True if otp is the latest unexpired, unused code for key; consumes it."""
+    if not otp:
+        return False
+    now = timezone.now()
+    pending = _latest_pending(kind, key, now)
+    if not pending or pending['expires_at'] <= now:
+        return False
+    if not hmac.compare_digest(pending['hash'], hash_otp(kind, key, str(otp))):
+        return False
+
+    model, _ = STORES[kind]
+    used = model.objects.filter(pk=pending['id'], is_verified=False).update(is_verified=True, verified_at=now)
+    cache.delete(_cache_key(kind, key))
+    return used == 1
+
+
+def purge_expired(older_than=timedelta(days=1), dry_run=False):
+    """Deletes codes that expired (or were used) more than older_than ago. Returns {model name: rows}."""
+    cutoff = timezone.now() - older_than
+    purged = {}
+    for model, _ in STORES.values():
+        stale = model.objects.filter(expires_at__lt=cutoff) | model.objects.filter(expires_at__isnull=True)
+        purged[model.__name__] = stale.count() if dry_run else stale.delete()[0]
+    return purged
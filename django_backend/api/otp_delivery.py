@@ -0,0 +1,184 @@
+"""
+Background delivery of login OTPs. send_otp / send_email_otp store the code,
+queue the message here and answer straight away; a small pool of worker
+threads hands it to the gateway (Periskope WhatsApp or the email API) and
+retries failures after OTP_DELIVERY_RETRY_DELAYS. Progress is written to the
+OTP row (delivery_status / delivery_attempts / delivery_error) so the app can
+poll it by delivery_id.
+
+With OTP_GATEWAY = 'local' every message goes to LocalGateway instead, which
+only waits OTP_LOCAL_GATEWAY_LATENCY_MS and fails OTP_LOCAL_GATEWAY_FAILURE_RATE
+of the time, so the whole flow can be load-tested offline (loadtest_otp_send).
+OTP_DELIVERY_WORKERS = 0 delivers in the calling thread.
+
+The queue is in memory: messages still queued when the process stops are not
+sent (the row stays Queued and the user asks for a new code).
+"""
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import close_old_connections
+from .otp import STORES
+from .utils import send_email_via_api
+from . import http_gateways
+from .http_gateways import PERISKOPE
+
+QUEUED = 'Queued'
+SENDING = 'Sending'
+RETRYING = 'Retrying'
+SENT = 'Sent'
+FAILED = 'Failed'
+
+WHATSAPP = 'whatsapp'
+EMAIL = 'email'
+
+
+@dataclass
+class DeliveryJob:
+    kind: str  # api.otp.PHONE / api.otp.EMAIL, picks the OTP table
+    delivery_id: str
+    channel: str
+    recipient: str
+    message: str
+    subject: str = None
+    attempts: int = 0
+
+
+class PeriskopeGateway:
+    def send(self, recipient, message, subject=None):
+        headers = {
+            "Authorization": f"Bearer {settings.PERISKOPE_API_KEY}",
+            "Content-Type": "application/json",
+            "x-phone": settings.PERISKOPE_SENDER_PHONE
+        }
+        payload = {"chat_id": recipient, "type": "text", "message": message}
+        response = http_gateways.post(PERISKOPE, settings.PERISKOPE_URL, headers=headers, json=payload, timeout=(http_gateways.CONNECT_TIMEOUT, 15))
+        print(f"[OTP DEBUG] Periskope Status: {response.status_code}")
+        if response.status_code in [200, 201]:
+            return True, None
+        return False, f"Periskope {response.status_code}: {response.text}"
+
+
+class EmailGateway:
+    def send(self, recipient, message, subject=None):
+        success, result = send_email_via_api(recipient, subject, message)
+        return success, None if success else str(result)
+
+
+class LocalGateway:
+    """Stand-in for the real gateways; keeps the last messages in `sent`."""
+
+    def __init__(self):
+        self.sent = deque(maxlen=1000)
+
+    def send(self, recipient, message, subject=None):
+        time.sleep(getattr(settings, 'OTP_LOCAL_GATEWAY_LATENCY_MS', 200) / 1000)
+        if random.random() < getattr(settings, 'OTP_LOCAL_GATEWAY_FAILURE_RATE', 0):
+            return False, 'Local gateway: simulated failure'
+        self.sent.append((recipient, subject, message))
+        return True, None
+
+
+GATEWAYS = {WHATSAPP: PeriskopeGateway(), EMAIL: EmailGateway()}
+local_gateway = LocalGateway()
+
+
+def gateway_for(channel):
+    if getattr(settings, 'OTP_GATEWAY', 'live') == 'local':
+        return local_gateway
+    return GATEWAYS[channel]
+
+
+def retry_delays():
+    return getattr(settings, 'OTP_DELIVERY_RETRY_DELAYS', (2, 10, 30))
+
+
+def new_delivery_id():
+    return uuid.uuid4().hex
+
+
+def _update(job, **fields):
+    """Best-effort status write: a failed write must not stop the message going out."""
+    model, _ = STORES[job.kind]
+    try:
+        model.objects.filter(delivery_id=job.delivery_id).update(**fields)
+    except Exception as e:
+        print(f"ERROR updating OTP delivery {job.delivery_id}: {str(e)}")
+
+
+def deliver(job):
+    """One delivery attempt; schedules the next one on failure while attempts remain."""
+    job.attempts += 1
+    _update(job, delivery_status=SENDING, delivery_attempts=job.attempts)
+    try:
+        ok, error = gateway_for(job.channel).send(job.recipient, job.message, job.subject)
+    except Exception as e:
+        ok, error = False, str(e)
+
+    if ok:
+        _update(job, delivery_status=SENT, delivery_error=None)
+        return
+    delays = retry_delays()
+    print(f"[OTP DEBUG] Delivery {job.delivery_id} attempt {job.attempts} failed: {error}")
+    if job.attempts <= len(delays):
+        _update(job, delivery_status=RETRYING, delivery_error=(error or '')[:255])
+        timer = threading.Timer(delays[job.attempts - 1], enqueue, args=(job,))
+        timer.daemon = True
+        timer.start()
+    else:
+        _update(job, delivery_status=FAILED, delivery_error=(error or '')[:255])
+
+
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _worker():
+    while True:
+        job = _queue.get()
+        try:
+            close_old_connections()
+            deliver(job)
+        except Exception as e:
+            print(f"ERROR in OTP delivery worker: {str(e)}")
+        finally:
+            close_old_connections()
+            _queue.task_done()
+
+
+def _ensure_workers(count):
+    with _workers_lock:
+        while len(_workers) < count:
+            thread = threading.Thread(target=_worker, name=f"otp-delivery-{len(_workers)}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+
+
+def enqueue(job):
+    workers = getattr(settings, 'OTP_DELIVERY_WORKERS', 4)
+    if workers <= 0:
+        deliver(job)
+        return
+    _ensure_workers(workers)
+    _queue.put(job)
+
+
+def queue_otp(kind, delivery_id, channel, recipient, message, subject=None):
+    enqueue(DeliveryJob(kind, delivery_id, channel, recipient, message, subject))
+
+
+def delivery_status(delivery_id):
+    """{'status', 'attempts', 'error'} for a delivery_id, or None."""
+    for model, _ in STORES.values():
+        row = model.objects.filter(delivery_id=delivery_id).values(
+            'delivery_status', 'delivery_attempts', 'delivery_error'
+        ).first()
+        if row:
+            return {'status': row['delivery_status'], 'attempts': row['delivery_attempts'], 'error': row['delivery_error']}
+    return None
@@ -0,0 +1,244 @@
+"""
+Notification outbox. Views render their emails as before but, instead of
+starting a thread per send, call queue_email(), which inserts a
+NotificationOutbox row. Called inside the view's transaction, the email is
+stored if and only if the change it announces is committed.
+
+Rows are sent by a fixed pool of worker threads in the web process (started on
+the first queued email, woken on commit; OUTBOX_WORKERS, 0 to disable) and by
+`manage.py run_outbox`, which docker-compose runs as the `outbox` service so
+rows left over from a restart are sent without waiting for a new email. Workers claim due rows with SELECT ... FOR UPDATE
+SKIP LOCKED where the database supports it, so several processes can drain the
+same table. A failed send is retried with exponential backoff; after
+OUTBOX_MAX_ATTEMPTS the row is marked Dead and kept for inspection
+(run_outbox --retry-dead requeues them). A row left Processing by a worker that
+died is picked up again after OUTBOX_LEASE_SECONDS.
+
+Identical emails are coalesced: rows claimed together with the same subject
+and body go out as one email API call with all of them in to_emails (up to
+OUTBOX_MAX_RECIPIENTS); if that call fails, each row is sent on its own so a
+bad address only holds back itself. A new row only becomes due
+OUTBOX_COALESCE_SECONDS after it is queued, and workers wait that long after
+being woken, so the emails one event raises for several approvers are sent
+together.
+
+outbox_metrics() reports queue depth per status, the age of the oldest due
+email and delivery latency (queued -> sent) percentiles.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from .models import NotificationOutbox
+from .utils import send_email_via_api
+
+POLL_SECONDS = 30
+LATENCY_WINDOW = timedelta(hours=1)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def coalesce_window():
+    return _setting('OUTBOX_COALESCE_SECONDS', 2)
+
+
+def queue_email(recipients, subject, body):
+    """
+    Stores an email for the outbox workers, one row per recipient (a single
+    address or a list). Returns the rows; blank and duplicate addresses are dropped.
+    """
+    if isinstance(recipients, str) or recipients is None:
+        recipients = [recipients]
+    addresses = list(dict.fromkeys(r.strip() for r in recipients if r and r.strip()))
+    if not addresses:
+        return []
+    due = timezone.now() + timedelta(seconds=coalesce_window())
+    rows = NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(recipient=address, subject=subject[:255], body=body, available_at=due)
+        for address in addresses
+    ])
+    transaction.on_commit(wake_workers)
+    return rows
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: base * 2^(n-1), capped, with jitter."""
+    base = _setting('OUTBOX_BACKOFF_SECONDS', 30)
+    delay = min(base * (2 ** (attempts - 1)), _setting('OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(batch=20):
+    """
+    Marks up to `batch` due rows Processing and returns them. The update is
+    conditional on the rows still being due, and only rows it stamped with this
+    claim's locked_at are returned, so without SKIP LOCKED (SQLite) two workers
+    that selected the same rows do not both send them.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300))
+    is_due = (
+        Q(status=NotificationOutbox.PENDING, available_at__lte=now)
+        | Q(status=NotificationOutbox.PROCESSING, locked_at__lt=now - lease)
+    )
+    with transaction.atomic():
+        due = NotificationOutbox.objects.filter(is_due).order_by('available_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        pks = list(due.values_list('pk', flat=True)[:batch])
+        if not pks:
+            return []
+        NotificationOutbox.objects.filter(is_due, pk__in=pks).update(
+            status=NotificationOutbox.PROCESSING, locked_at=now
+        )
+        return list(NotificationOutbox.objects.filter(
+            pk__in=pks, status=NotificationOutbox.PROCESSING, locked_at=now
+        ).order_by('available_at', 'id'))
+
+
+def batches(rows):
+    """Groups claimed rows with the same subject and body, at most OUTBOX_MAX_RECIPIENTS per group."""
+    size = _setting('OUTBOX_MAX_RECIPIENTS', 50)
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row.subject, row.body)].append(row)
+    for group in groups.values():
+        for start in range(0, len(group), size):
+            yield group[start:start + size]
+
+
+def deliver(rows):
+    """
+    Sends claimed rows sharing a subject and body as one email and records the
+    outcome. If a group fails, each row is sent on its own, so one rejected
+    address is retried and dead-lettered without the rest. Returns True if all were sent.
+    """
+    first = rows[0]
+    recipients = [row.recipient for row in rows]
+    try:
+        ok, result = send_email_via_api(recipients, first.subject, first.body)
+    except Exception as e:
+        ok, result = False, str(e)
+
+    now = timezone.now()
+    if ok:
+        for row in rows:
+            NotificationOutbox.objects.filter(pk=row.pk).update(
+                status=NotificationOutbox.SENT, attempts=row.attempts + 1, sent_at=now, locked_at=None, last_error=None
+            )
+        return True
+
+    if len(rows) > 1:
+        print(f"DEBUG: Outbox batch of {len(rows)} failed, sending each on its own: {result}")
+        return all([deliver([row]) for row in rows])
+
+    attempts = first.attempts + 1
+    if attempts >= _setting('OUTBOX_MAX_ATTEMPTS', 6):
+        print(f"ERROR: Outbox email {first.pk} to {first.recipient} dead after {attempts} attempts: {result}")
+        fields = {'status': NotificationOutbox.DEAD}
+    else:
+        print(f"DEBUG: Outbox email {first.pk} to {first.recipient} failed (attempt {attempts}): {result}")
+        fields = {'status': NotificationOutbox.PENDING, 'available_at': now + timedelta(seconds=backoff(attempts))}
+    NotificationOutbox.objects.filter(pk=first.pk).update(
+        attempts=attempts, locked_at=None, last_error=str(result)[:2000], **fields
+    )
+    return False
+
+
+def drain(batch=50, limit=None):
+    """Sends due rows until none are left (or `limit` were handled). Returns how many were handled."""
+    handled = 0
+    while limit is None or handled < limit:
+        rows = claim(batch if limit is None else min(batch, limit - handled))
+        if not rows:
+            break
+        for group in batches(rows):
+            deliver(group)
+        handled += len(rows)
+    return handled
+
+
+_wake = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _worker():
+    while True:
+        if _wake.wait(POLL_SECONDS):
+            # Let the rest of a burst reach the table so it is sent as one batch
+            time.sleep(coalesce_window())
+        _wake.clear()
+        try:
+            close_old_connections()
+            drain()
+        except Exception as e:
+            print(f"ERROR in outbox worker: {str(e)}")
+        finally:
+            close_old_connections()
+
+
+def wake_workers():
+    count = _setting('OUTBOX_WORKERS', 2)
+    if count <= 0:
+        return
+    with _workers_lock:
+        while len(_workers) < count:
+            thread = threading.Thread(target=_worker, name=f"outbox-{len(_workers)}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+    _wake.set()
+
+
+def retry_dead():
+    return NotificationOutbox.objects.filter(status=NotificationOutbox.DEAD).update(
+        status=NotificationOutbox.PENDING, attempts=0, available_at=timezone.now(), locked_at=None
+    )
+
+
+def purge_sent(older_than=timedelta(days=30)):
+    return NotificationOutbox.objects.filter(
+        status=NotificationOutbox.SENT, sent_at__lt=timezone.now() - older_than
+    ).delete()[0]
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def outbox_metrics():
+    now = timezone.now()
+    depth = {s: 0 for s in (NotificationOutbox.PENDING, NotificationOutbox.PROCESSING,
+                            NotificationOutbox.SENT, NotificationOutbox.DEAD)}
+    for row in NotificationOutbox.objects.values('status').annotate(n=Count('id')).order_by():
+        depth[row['status']] = row['n']
+    oldest_due = NotificationOutbox.objects.filter(
+        status=NotificationOutbox.PENDING, available_at__lte=now
+    ).aggregate(oldest=Min('created_at'))['oldest']
+
+    latencies = sorted(
+        (sent_at - created_at).total_seconds()
+        for created_at, sent_at in NotificationOutbox.objects.filter(
+            status=NotificationOutbox.SENT, sent_at__gte=now - LATENCY_WINDOW
+        ).values_list('created_at', 'sent_at')
+    )
+    return {
+        'depth': depth,
+        'oldest_due_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        'sent_last_hour': len(latencies),
+        'latency_seconds': {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+        },
+        'workers': sum(1 for t in _workers if t.is_alive()),
+    }
@@ -0,0 +1,121 @@
+"""
+Session/profile payload shared by login, phone and email OTP verify and
+get_profile. The employee's teams (with managers), the teams they manage and
+their team leads are read in a fixed number of queries; the org-wide parts
+(project manager names, advisor) are cached separately.
+
+Both caches are keyed by one version number that is bumped whenever an
+employee, a team or a team membership changes (see signals.py): a payload shows
+other employees' names and roles too (leads, managers), so any of those rows
+can change it.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+from core.models import Employees, Teams
+from .utils import is_employee_admin
+
+VERSION_KEY = 'profile_payload:version'
+CACHE_TIMEOUT = 3600
+PROJECT_MANAGER_ROLES = ('Manager', 'Project Manager', 'Administrator', 'Admin')
+ADVISOR_ROLE = 'Advisor-Technology & Operations'
+LEAD_ROLE_KEYWORDS = ('Lead', 'Manager', 'Admin', 'Founder', 'Advisor')
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_profile_payloads():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _full_name(emp):
+    return f"{emp.first_name} {emp.last_name or ''}".strip()
+
+
+def org_parts(manager_roles=PROJECT_MANAGER_ROLES):
+    """Comma-separated project manager names and the advisor's name."""
+    key = f"profile_payload:org:{_version()}:{','.join(manager_roles).replace(' ', '_')}"
+    parts = cache.get(key)
+    if parts is None:
+        managers = Employees.objects.filter(role__in=manager_roles).only('first_name', 'last_name')
+        advisor = Employees.objects.filter(role=ADVISOR_ROLE).only('first_name', 'last_name').first()
+        parts = {
+            'project_manager_name': ", ".join(_full_name(m) for m in managers),
+            'advisor_name': _full_name(advisor) if advisor else None,
+        }
+        cache.set(key, parts, CACHE_TIMEOUT)
+    return parts
+
+
+def build_employee_payload(emp):
+    """The employee-specific part of the payload (no request-dependent URLs)."""
+    teams = list(emp.teams.select_related('manager').order_by('id'))
+    managed = list(Teams.objects.filter(manager=emp).select_related('manager').order_by('id'))
+
+    lead_filter = Q()
+    for keyword in LEAD_ROLE_KEYWORDS:
+        lead_filter |= Q(role__icontains=keyword)
+    leads = {
+        _full_name(m) for m in Employees.objects.filter(
+            teams__in=[t.id for t in teams], status='Active'
+        ).filter(lead_filter).only('first_name', 'last_name').distinct()
+    } if teams else set()
+    leads.update(_full_name(t.manager) for t in teams if t.manager)
+    team_leads = sorted(leads)
+
+    return {
+        'id': emp.id,
+        'employee_id': emp.employee_id,
+        'first_name': emp.first_name,
+        'last_name': emp.last_name,
+        'email': emp.email,
+        'contact': emp.contact,
+        'location': emp.location,
+        'aadhar': emp.aadhar,
+        'qualification': emp.qualification,
+        'joining_date': emp.joining_date,
+        'role': emp.role,
+        'team_id': teams[0].id if teams else None,
+        'team_ids': ",".join(str(t.id) for t in teams),
+        'team_name': ", ".join(t.name for t in teams) or None,
+        'teams': [
+            {'id': t.id, 'name': t.name, 'manager_name': _full_name(t.manager) if t.manager else None}
+            for t in teams + managed
+        ],
+        'team_leads': team_leads,
+        'team_lead_name': ", ".join(team_leads) or None,
+        'is_manager': bool(managed),
+        'is_admin': is_employee_admin(emp),
+        'profile_picture_path': emp.profile_picture.url if emp.profile_picture else None,
+    }
+
+
+def get_profile_payload(emp, request, team_name_default=None, manager_roles=PROJECT_MANAGER_ROLES):
+    """
+    Full user dict for the app session. team_name_default fills team_name when
+    the employee has no team; manager_roles picks who counts as project manager.
+    """
+    key = f"profile_payload:{_version()}:{emp.pk}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_employee_payload(emp)
+        cache.set(key, payload, CACHE_TIMEOUT)
+
+    payload = dict(payload, **org_parts(manager_roles))
+    if not payload['team_name']:
+        payload['team_name'] = team_name_default
+    path = payload.pop('profile_picture_path')
+    if path:
+        url = request.build_absolute_uri(path)
+        payload['profile_picture'] = url.replace('http://', 'https://') if request.is_secure() else url
+    else:
+        payload['profile_picture'] = None
+    return payload
@@ -0,0 +1,146 @@
+"""
+Token-bucket rate limits for the OTP endpoints, per phone/email and per client
+IP, checked before any database or gateway work.
+
+A bucket holds `capacity` tokens and refills at `rate` tokens per second. In
+the cache it is a single integer: the number of tokens consumed, on a clock
+where int(now * rate) tokens have been issued since the epoch. A request takes
+a token with one atomic incr; it is allowed while consumed <= issued, and a
+denied request gives its token back with decr. A bucket that has been idle long
+enough to be full again is clamped (consumed >= issued - capacity) and its key
+expires, so idle clients cost nothing.
+
+If the cache backend fails, the same buckets are kept in process memory
+(exact, under a lock), so a cache outage degrades to per-worker limits instead
+of no limits.
+"""
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+# scope: (capacity, tokens per second)
+DEFAULT_LIMITS = {
+    'otp_send': (3, 1 / 60),         # 3 codes at once, then one a minute per phone/email
+    'otp_send_ip': (20, 1 / 6),      # 10 a minute from one address
+    'otp_verify': (5, 1 / 60),       # guesses per phone/email
+    'otp_verify_ip': (30, 1 / 2),
+}
+LOCAL_MAX_BUCKETS = 10000
+
+
+def limits():
+    return {**DEFAULT_LIMITS, **getattr(settings, 'OTP_RATE_LIMITS', {})}
+
+
+class TokenBucket:
+    def __init__(self, scope, capacity, rate):
+        self.scope = scope
+        self.capacity = capacity
+        self.rate = rate
+        self.timeout = math.ceil(capacity / rate) + 1
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def _key(self, ident):
+        return f"rl:{self.scope}:{ident}"
+
+    def _retry_after(self, consumed, now):
+        return max(1, math.ceil(consumed / self.rate - now))
+
+    def consume_cached(self, ident, now=None):
+        """(allowed, retry_after_seconds) using atomic cache counters."""
+        now = time.time() if now is None else now
+        issued = int(now * self.rate)
+        floor = issued - self.capacity
+        key = self._key(ident)
+        if cache.add(key, floor + 1, self.timeout):
+            return True, 0
+        try:
+            consumed = cache.incr(key)
+        except ValueError:  # expired between add and incr
+            cache.set(key, floor + 1, self.timeout)
+            return True, 0
+        if consumed <= floor:
+            # Bucket had refilled past capacity: clamp it to full minus this token
+            cache.set(key, floor + 1, self.timeout)
+            return True, 0
+        if consumed <= issued:
+            cache.touch(key, self.timeout)
+            return True, 0
+        cache.decr(key)
+        return False, self._retry_after(consumed, now)
+
+    def consume_local(self, ident, now=None):
+        """(allowed, retry_after_seconds) using an in-process bucket."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._local.get(ident, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._local[ident] = (tokens - 1, now)
+                allowed, retry_after = True, 0
+            else:
+                self._local[ident] = (tokens, now)
+                allowed, retry_after = False, max(1, math.ceil((1 - tokens) / self.rate))
+            if len(self._local) > LOCAL_MAX_BUCKETS:
+                # Drop buckets that have refilled; they are equivalent to a missing entry
+                full_after = self.capacity / self.rate
+                self._local = {k: v for k, v in self._local.items() if now - v[1] < full_after}
+        return allowed, retry_after
+
+    def consume(self, ident):
+        try:
+            return self.consume_cached(ident)
+        except Exception:
+            return self.consume_local(ident)
+
+
+_buckets = {}
+
+
+def bucket(scope):
+    capacity, rate = limits()[scope]
+    current = _buckets.get(scope)
+    if current is None or (current.capacity, current.rate) != (capacity, rate):
+        current = _buckets[scope] = TokenBucket(scope, capacity, rate)
+    return current
+
+
+def client_ip(request):
+    """
+    The caller's address. X-Forwarded-For is only read behind TRUSTED_PROXY_COUNT
+    proxies, and then from the right: each proxy appends the address it saw, so
+    the hop that many entries from the end was added by our outermost proxy and
+    anything left of it is whatever the client chose to send.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies > 0 and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check_rate_limit(request, scope, identity):
+    """
+    Takes a token from the `scope` bucket of the caller's IP and of identity (a
+    phone or email). Returns a 429 Response when either is empty, else None.
+    """
+    checks = [(f"{scope}_ip", client_ip(request))]
+    if identity:
+        checks.append((scope, str(identity).strip().lower()))
+    for bucket_scope, ident in checks:
+        allowed, retry_after = bucket(bucket_scope).consume(ident)
+        if not allowed:
+            response = Response(
+                {'error': f'Too many requests. Please try again in {retry_after} seconds.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+    return None
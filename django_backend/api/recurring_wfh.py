@@ -0,0 +1,141 @@
+"""
+Recurring WFH rules (e.g. every Tue/Thu until a date) are stored as one
+RecurringWFH row and expanded for whatever window is being read. Expansion
+steps through each rule weekday a week at a time, so it costs one step per
+WFH day in the window, not per day of the rule. Rule days that fall on a
+weekly off, a holiday or an active leave are skipped: the leave wins, and the
+rule's quota charge is recounted whenever such a leave is added or dropped. A
+single WFH request may not fall on a rule day (nor a rule on a single WFH day).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from core.models import RecurringWFH, EmployeeUnavailability
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK, parse_date
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+ACTIVE_STATUSES = ['Pending', 'Approved']
+
+
+def parse_weekdays(value):
+    """
+    Accepts [1, 3], ['Tue', 'Thu'] or "Tue,Thu" and returns sorted weekday
+    numbers (Monday=0). Raises ValueError for anything else.
+    """
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    days = set()
+    for item in value or []:
+        item = str(item).strip()
+        if item.isdigit():
+            day = int(item)
+        else:
+            names = [n.lower() for n in WEEKDAY_NAMES]
+            if item[:3].lower() not in names:
+                raise ValueError(f'Invalid weekday: {item}')
+            day = names.index(item[:3].lower())
+        if not 0 <= day <= 6:
+            raise ValueError(f'Invalid weekday: {item}')
+        days.add(day)
+    if not days:
+        raise ValueError('At least one weekday is required')
+    return sorted(days)
+
+
+def rule_dates(rule, start, end, calendar):
+    """Working dates in [start, end] on which the rule applies."""
+    start = max(parse_date(start), rule.start_date)
+    end = min(parse_date(end), rule.end_date)
+    dates = []
+    for weekday in rule.weekday_list:
+        d = start + timedelta(days=(weekday - start.weekday()) % 7)
+        while d <= end:
+            if calendar.is_working_day(d):
+                dates.append(d)
+            d += timedelta(days=7)
+    return sorted(dates)
+
+
+def rules_in_window(employee_ids, start, end, statuses=('Approved',)):
+    """Rules of the given employees (employee_id strings) that overlap [start, end]."""
+    return RecurringWFH.objects.filter(
+        employee_id__in=list(employee_ids),
+        status__in=list(statuses),
+        start_date__lte=parse_date(end),
+        end_date__gte=parse_date(start)
+    )
+
+
+def expand_rules(rules, start, end, calendar=None):
+    """
+    (rule, date) pairs for the rules' WFH days in [start, end]. One query for
+    the employees' active leaves in the window, whatever the number of rules.
+    """
+    start, end = parse_date(start), parse_date(end)
+    rules = list(rules)
+    if not rules:
+        return []
+    calendar = calendar or WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+
+    leave_ranges = defaultdict(list)
+    for row in EmployeeUnavailability.objects.filter(
+        employee__employee_id__in={r.employee_id for r in rules},
+        kind=EmployeeUnavailability.LEAVE,
+        start_date__lte=end,
+        end_date__gte=start
+    ).values('employee__employee_id', 'start_date', 'end_date'):
+        leave_ranges[row['employee__employee_id']].append((row['start_date'], row['end_date']))
+
+    pairs = []
+    for rule in rules:
+        ranges = leave_ranges.get(rule.employee_id, [])
+        for d in rule_dates(rule, start, end, calendar):
+            if not any(s <= d <= e for s, e in ranges):
+                pairs.append((rule, d))
+    return pairs
+
+
+def expand(employee_ids, start, end, statuses=('Approved',), calendar=None):
+    """{employee_id: [dates]} of recurring WFH days in [start, end]."""
+    result = defaultdict(set)
+    for rule, d in expand_rules(rules_in_window(employee_ids, start, end, statuses), start, end, calendar):
+        result[rule.employee_id].add(d)
+    return {emp_id: sorted(dates) for emp_id, dates in result.items()}
+
+
+def on_recurring_wfh(employee_ids, day, statuses=('Approved',)):
+    """Set of employee_ids whose recurring rules put them on WFH on the given day."""
+    return set(expand(employee_ids, day, day, statuses))
+
+
+def find_conflicting_rule(employee, weekdays, start, end, exclude=None):
+    """An active rule of the employee sharing a weekday with [start, end], or None."""
+    qs = rules_in_window([employee.employee_id], start, end, ACTIVE_STATUSES)
+    if exclude is not None:
+        qs = qs.exclude(pk=exclude.pk)
+    for rule in qs:
+        if set(rule.weekday_list) & set(weekdays):
+            return rule
+    return None
+
+
+def find_rule_day(employee, start, end, calendar=None):
+    """Earliest (rule, date) in [start, end] on which an active rule of the employee gives WFH, or None."""
+    rules = rules_in_window([employee.employee_id], start, end, ACTIVE_STATUSES)
+    return min(expand_rules(rules, start, end, calendar), key=lambda pair: pair[1], default=None)
+
+
+def find_wfh_on_weekdays(employee, weekdays, start, end, calendar=None):
+    """Earliest working date in [start, end] on one of the weekdays already covered by an active single WFH request, or None."""
+    start, end = parse_date(start), parse_date(end)
+    calendar = calendar or WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+    rows = EmployeeUnavailability.objects.filter(
+        employee=employee,
+        kind=EmployeeUnavailability.WFH,
+        start_date__lte=end,
+        end_date__gte=start
+    ).order_by('start_date')
+    for row in rows:
+        for d in calendar.working_dates(max(start, row.start_date), min(end, row.end_date)):
+            if d.weekday() in weekdays:
+                return d
+    return None
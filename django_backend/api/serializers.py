@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from core.models import Employees, Teams, Leaves, Attendance, AttendanceLogs, Posts, WorkFromHome, LeaveOverrideRequest
+from core.models import Employees, Teams, Leaves, Attendance, AttendanceLogs, Posts, WorkFromHome, RecurringWFH, LeaveOverrideRequest
 
 class LeaveOverrideRequestSerializer(serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
@@ -37,15 +37,33 @@ class WorkFromHomeSerializer(serializers.ModelSerializer):
             return obj.created_at.strftime('%Y-%m-%d')
         return None
 
+class RecurringWFHSerializer(WorkFromHomeSerializer):
+    weekdays = serializers.SerializerMethodField()
+    weekday_names = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecurringWFH
+        fields = ['id', 'employee', 'employee_id', 'employee_name', 'weekdays', 'weekday_names', 'start_date', 'end_date', 'reason', 'status', 'applied_on']
+
+    def get_weekdays(self, obj):
+        return obj.weekday_list
+
+    def get_weekday_names(self, obj):
+        from .recurring_wfh import WEEKDAY_NAMES
+        return [WEEKDAY_NAMES[d] for d in obj.weekday_list]
+
 class TeamsSerializer(serializers.ModelSerializer):
     member_count = serializers.SerializerMethodField()
     manager_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Teams
-        fields = ['id', 'name', 'description', 'manager', 'manager_name', 'member_count', 'whatsapp_chat_id', 'whatsapp_group_url']
+        fields = ['id', 'name', 'description', 'manager', 'manager_name', 'member_count', 'whatsapp_chat_id', 'whatsapp_group_url', 'wfh_monthly_quota']
 
     def get_member_count(self, obj):
+        # Annotated by team_directory.teams_with_counts() for listings
+        if hasattr(obj, 'active_member_count'):
+            return obj.active_member_count
         from django.db.models import Q
         return Employees.objects.filter(
             Q(teams=obj) | Q(managed_teams=obj),
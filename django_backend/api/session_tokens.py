@@ -0,0 +1,118 @@
+"""
+Signed session tokens. The login and OTP verify views hand the app a token
+(Django's signing: HMAC-SHA256 with SECRET_KEY plus a timestamp) carrying the
+employee's id, pk, admin/manager flags and team ids. The app sends it back as
+`Authorization: Bearer <token>`; SessionTokenAuthentication checks the
+signature and age without touching the database and sets request.user to a
+SessionIdentity.
+
+Requests without a token are still served as before (AllowAny), so older app
+builds keep working; a present but invalid or expired token gets a 401 so the
+app knows to sign in again. Claims are a snapshot from sign-in: a role or team
+change shows up in the next token.
+"""
+from django.conf import settings
+from django.core import signing
+from rest_framework import authentication, exceptions
+from core.models import Employees
+
+TOKEN_SALT = 'api.session_tokens'
+
+
+def max_age():
+    return getattr(settings, 'SESSION_TOKEN_MAX_AGE', 7 * 24 * 3600)
+
+
+class SessionIdentity:
+    """request.user for token-authenticated requests."""
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.employee_id = claims['eid']
+        self.pk = claims.get('pk')
+        self.is_admin = bool(claims.get('adm'))
+        self.is_manager = bool(claims.get('mgr'))
+        self.team_ids = claims.get('teams', [])
+        self._employee = None
+
+    def matches(self, employee_id):
+        ids = [str(self.employee_id)] + ([str(self.pk)] if self.pk is not None else [])
+        return str(employee_id) in ids
+
+    @property
+    def employee(self):
+        """
+        The Employees row, fetched by pk on first use and kept for the rest of the
+        request. None when the token has no pk or the row's employee_id is not the claim's.
+        """
+        if self._employee is None and self.pk is not None:
+            employee = Employees.objects.filter(pk=self.pk).first()
+            if employee and employee.employee_id == self.employee_id:
+                self._employee = employee
+        return self._employee
+
+    def __str__(self):
+        return self.employee_id
+
+
+def issue_session_token(user, employee=None):
+    """
+    Token for a user payload as returned by the sign-in views (see profile_payload.py).
+    The pk claim is only set from `employee`, the signed-in Employees row, never
+    from the payload: the demo/admin placeholder payloads carry made-up ids.
+    """
+    team_ids = user.get('team_ids') or ''
+    if not isinstance(team_ids, str):
+        team_ids = ','.join(str(t) for t in team_ids)
+    claims = {
+        'eid': user['employee_id'],
+        'pk': employee.pk if employee is not None else None,
+        'adm': bool(user.get('is_admin')),
+        'mgr': bool(user.get('is_manager')),
+        'teams': [int(t) for t in team_ids.split(',') if t.strip().isdigit()],
+    }
+    return signing.dumps(claims, salt=TOKEN_SALT, compress=True)
+
+
+def read_session_token(token):
+    """SessionIdentity for a token; raises signing.BadSignature (or SignatureExpired) if it is not valid."""
+    return SessionIdentity(signing.loads(token, salt=TOKEN_SALT, max_age=max_age()))
+
+
+class SessionTokenAuthentication(authentication.BaseAuthentication):
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid session token header.')
+        token = header[1].decode(errors='ignore')
+        try:
+            return read_session_token(token), token
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Session expired. Please sign in again.')
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed('Invalid session token.')
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def resolve_employee(request, employee_id):
+    """
+    The employee an id from the URL/body refers to: employee_id first, then the
+    numeric pk older app sessions send. When it is the signed-in user the row
+    comes from the token identity (one pk lookup per request at most).
+    """
+    if not employee_id:
+        return None
+    identity = getattr(request, 'user', None)
+    if isinstance(identity, SessionIdentity) and identity.matches(employee_id) and identity.employee:
+        return identity.employee
+    employee = Employees.objects.filter(employee_id=employee_id).first()
+    if not employee and str(employee_id).isdigit():
+        employee = Employees.objects.filter(pk=employee_id).first()
+    return employee
@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from core.models import Leaves, WorkFromHome, RecurringWFH, Holidays, Employees, Teams
+from .unavailability import sync_leave, sync_wfh, notify_changed
+from .working_days import invalidate_holiday_cache
+from .occupancy import invalidate_occupancy
+from .team_directory import invalidate_team_directory
+from .profile_payload import invalidate_profile_payloads
+from .team_calendar import invalidate_all_team_calendars
+
+
+@receiver(post_save, sender=Leaves)
+def leave_saved(sender, instance, **kwargs):
+    sync_leave(instance)
+
+
+@receiver(post_save, sender=WorkFromHome)
+def wfh_saved(sender, instance, **kwargs):
+    sync_wfh(instance)
+
+
+@receiver([post_save, post_delete], sender=RecurringWFH)
+def recurring_wfh_changed(sender, instance, **kwargs):
+    notify_changed(Employees.objects.filter(employee_id=instance.employee_id).values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Holidays)
+def holidays_changed(sender, instance, **kwargs):
+    invalidate_holiday_cache()
+    invalidate_occupancy()
+    invalidate_all_team_calendars()
+
+
+@receiver([post_save, post_delete], sender=Teams)
+@receiver([post_save, post_delete], sender=Employees)
+@receiver(m2m_changed, sender=Employees.teams.through)
+def org_structure_changed(sender, **kwargs):
+    invalidate_team_directory()
+    invalidate_profile_payloads()
+    invalidate_all_team_calendars()
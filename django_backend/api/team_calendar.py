@@ -0,0 +1,133 @@
+"""
+Team leave calendar: a day x member grid for one month, built from one range
+query over the unavailability store (active leaves and WFH) plus the members'
+recurring WFH rules expanded for the month, and cached per (team, month).
+Each team has a version counter in the cache; bumping it when a member's
+leave or WFH changes makes every cached month for that team stale. A second,
+global counter is bumped when holidays, teams or their membership change,
+which makes every team's cached months stale.
+"""
+import calendar as month_calendar
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db.models import Q
+from core.models import Teams, Holidays, EmployeeUnavailability
+from .recurring_wfh import rules_in_window, expand_rules, ACTIVE_STATUSES as WFH_RULE_STATUSES
+from .working_days import FULL_DAY, normalize_session
+
+CACHE_TIMEOUT = 300
+ACTIVE_EMPLOYEE_STATUSES = ['Active', 'Remote']
+
+
+GLOBAL_VERSION_KEY = 'team_calendar_version:all'
+
+
+def _version_key(team_id):
+    return f'team_calendar_version:{team_id}'
+
+
+def _cache_key(team_id, year, month):
+    versions = cache.get_many([GLOBAL_VERSION_KEY, _version_key(team_id)])
+    version = f"{versions.get(GLOBAL_VERSION_KEY, 0)}.{versions.get(_version_key(team_id), 0)}"
+    return f'team_calendar:{team_id}:{year}-{month:02d}:v{version}'
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_team_calendars(employee_pks):
+    """Marks cached calendars stale for every team the given employees belong to or manage."""
+    employee_pks = list(employee_pks)
+    if not employee_pks:
+        return
+    team_ids = Teams.objects.filter(
+        Q(members__id__in=employee_pks) | Q(manager__id__in=employee_pks)
+    ).values_list('id', flat=True).distinct()
+    for team_id in team_ids:
+        _bump(_version_key(team_id))
+
+
+def invalidate_all_team_calendars():
+    """Marks every cached calendar stale (holidays, teams or team membership changed)."""
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def _cell(row):
+    if row.kind == EmployeeUnavailability.WFH:
+        return {'kind': 'wfh', 'status': row.wfh.status}
+    return {'kind': 'leave', 'type': row.leave.type, 'status': row.leave.status}
+
+
+def build_team_calendar(team, year, month):
+    first = date(year, month, 1)
+    last = date(year, month, month_calendar.monthrange(year, month)[1])
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+    members = list(
+        team.members.filter(status__in=ACTIVE_EMPLOYEE_STATUSES)
+        .order_by('first_name', 'last_name')
+        .values('id', 'employee_id', 'first_name', 'last_name')
+    )
+    row_by_pk = {m['id']: i for i, m in enumerate(members)}
+    grid = [[None] * len(days) for _ in members]
+
+    ranges = EmployeeUnavailability.objects.filter(
+        employee_id__in=list(row_by_pk),
+        start_date__lte=last,
+        end_date__gte=first
+    ).select_related('leave', 'wfh')
+
+    for row in ranges:
+        cells = grid[row_by_pk[row.employee_id]]
+        start = max(row.start_date, first)
+        end = min(row.end_date, last)
+        for offset in range((start - first).days, (end - first).days + 1):
+            cell = _cell(row)
+            if row.leave_id:
+                # Half-day sessions apply to the first/last day of the leave only
+                d = first + timedelta(days=offset)
+                if d == row.start_date and normalize_session(row.leave.from_session) != FULL_DAY:
+                    cell['session'] = normalize_session(row.leave.from_session)
+                elif d == row.end_date and normalize_session(row.leave.to_session) != FULL_DAY:
+                    cell['session'] = normalize_session(row.leave.to_session)
+            cells[offset] = cell
+
+    # Recurring WFH fills days not already taken by a leave or a single WFH request
+    row_by_employee_id = {m['employee_id']: row_by_pk[m['id']] for m in members}
+    rules = rules_in_window(row_by_employee_id, first, last, WFH_RULE_STATUSES)
+    for rule, d in expand_rules(rules, first, last):
+        cells = grid[row_by_employee_id[rule.employee_id]]
+        offset = (d - first).days
+        if cells[offset] is None:
+            cells[offset] = {'kind': 'wfh', 'status': rule.status, 'recurring': True}
+
+    holidays = {
+        h.date: h.name
+        for h in Holidays.objects.filter(date__gte=first.isoformat(), date__lte=last.isoformat())
+    }
+
+    return {
+        'team': team.id,
+        'month': f'{year}-{month:02d}',
+        'days': [d.isoformat() for d in days],
+        'weekly_off': [i for i, d in enumerate(days) if d.weekday() == 6],
+        'holidays': holidays,
+        'members': [
+            {'employee_id': m['employee_id'], 'name': f"{m['first_name']} {m['last_name'] or ''}".strip()}
+            for m in members
+        ],
+        'grid': grid,
+    }
+
+
+def get_team_calendar(team, year, month):
+    key = _cache_key(team.id, year, month)
+    data = cache.get(key)
+    if data is None:
+        data = build_team_calendar(team, year, month)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,46 @@
+"""
+Team listing: member counts come from one annotated query (active/remote
+members, plus the manager when they are not already a member) with managers
+joined in, instead of two extra queries per team. The serialized directory is
+cached and dropped whenever team membership, a team or an employee changes.
+"""
+from django.core.cache import cache
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from core.models import Teams, Employees
+
+ACTIVE_STATUSES = ['Active', 'Remote']
+CACHE_KEY = 'team_directory'
+CACHE_TIMEOUT = 300
+
+
+def teams_with_counts():
+    Membership = Employees.teams.through
+    active_members = Membership.objects.filter(
+        teams_id=OuterRef('pk'),
+        employees__status__in=ACTIVE_STATUSES
+    ).order_by().values('teams_id').annotate(n=Count('employees_id', distinct=True)).values('n')
+    manager_is_member = Membership.objects.filter(
+        teams_id=OuterRef('pk'),
+        employees__employee_id=OuterRef('manager_id')
+    )
+    return Teams.objects.select_related('manager').annotate(
+        active_member_count=Coalesce(Subquery(active_members, output_field=IntegerField()), Value(0)) + Case(
+            When(Q(manager__status__in=ACTIVE_STATUSES) & ~Exists(manager_is_member), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    ).order_by('id')
+
+
+def get_team_directory(refresh=False):
+    from .serializers import TeamsSerializer
+    data = None if refresh else cache.get(CACHE_KEY)
+    if data is None:
+        data = [dict(row) for row in TeamsSerializer(teams_with_counts(), many=True).data]
+        cache.set(CACHE_KEY, data, CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_team_directory():
+    cache.delete(CACHE_KEY)
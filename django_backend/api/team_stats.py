@@ -0,0 +1,164 @@
+"""
+Team stats cards (headcount, active now, on leave, remote, average hours,
+on-time arrival) for one or more teams. Members are read once with their team
+ids, attendance for the period is reduced in SQL to one row per employee
+(worked minutes and the 09:30 on-time check are parsed in the database), and
+today's leave/WFH comes from one probe of the unavailability store. The
+per-employee figures are then rolled up per team and for all requested teams
+together, so an employee in two teams is counted once in the combined stats.
+Results are cached per (teams, duration) for a short time.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Length, StrIndex, Substr
+from core.models import Employees, Attendance, EmployeeUnavailability
+from .recurring_wfh import on_recurring_wfh
+
+ACTIVE_STATUSES = ['Active', 'Remote']
+CACHE_TIMEOUT = 60
+WORKED_HOURS_PATTERN = r'^[0-9]+h [0-9]+m$'
+CHECK_IN_PATTERN = r'^[0-9]{2}:[0-9]{2} [AP]M$'
+ON_TIME_CUTOFF = (9, 30)
+
+
+def _int(expr):
+    return Cast(expr, IntegerField())
+
+
+def _worked_minutes():
+    """'7h 45m' -> 465, anything else -> 0."""
+    h_pos = StrIndex('worked_hours', Value('h'))
+    space_pos = StrIndex('worked_hours', Value(' '))
+    hours = _int(Substr('worked_hours', 1, h_pos - 1))
+    minutes = _int(Substr('worked_hours', space_pos + 1, Length('worked_hours') - space_pos - 1))
+    return Case(
+        When(worked_hours__regex=WORKED_HOURS_PATTERN, then=hours * 60 + minutes),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _on_time():
+    """1 when check_in ('09:12 AM') is at or before the cutoff, else 0."""
+    hour = _int(Substr('check_in', 1, 2))
+    minute = _int(Substr('check_in', 4, 2))
+    cutoff_h, cutoff_m = ON_TIME_CUTOFF
+    return Case(
+        When(
+            Q(check_in__regex=CHECK_IN_PATTERN, check_in__endswith='AM') & (
+                Q(hour_in=12) | Q(hour_in__lt=cutoff_h) | Q(hour_in=cutoff_h, minute_in__lte=cutoff_m)
+            ),
+            then=Value(1)
+        ),
+        default=Value(0),
+        output_field=IntegerField()
+    ), hour, minute
+
+
+def _live_minutes(check_in, now):
+    """Minutes since today's check-in, for rows that have no worked_hours yet."""
+    try:
+        in_time = datetime.strptime(check_in, '%I:%M %p').replace(year=now.year, month=now.month, day=now.day)
+    except (TypeError, ValueError):
+        return 0, False
+    cutoff = in_time.replace(hour=ON_TIME_CUTOFF[0], minute=ON_TIME_CUTOFF[1])
+    minutes = int((now - in_time).total_seconds() / 60) if now > in_time else 0
+    return minutes, in_time <= cutoff
+
+
+def period_start(duration, now):
+    if duration == 'Today':
+        return now.strftime('%Y-%m-%d')
+    if duration == 'This Month':
+        return now.replace(day=1).strftime('%Y-%m-%d')
+    return (now - timedelta(days=now.weekday())).strftime('%Y-%m-%d')  # This Week (default)
+
+
+def _summary(emp_ids, per_employee, remote_ids, on_leave_ids):
+    present = sum(per_employee[e]['present'] for e in emp_ids if e in per_employee)
+    minutes = sum(per_employee[e]['minutes'] for e in emp_ids if e in per_employee)
+    on_time = sum(per_employee[e]['on_time'] for e in emp_ids if e in per_employee)
+    avg_mins = minutes // present if present else 0
+    return {
+        'total': len(emp_ids),
+        'active': sum(1 for e in emp_ids if per_employee.get(e, {}).get('active')),
+        'onLeave': len(emp_ids & on_leave_ids),
+        'remote': len(emp_ids & remote_ids),
+        'avg_working_hours': f"{avg_mins // 60}h {avg_mins % 60}m",
+        'on_time_arrival': f"{int((on_time / present) * 100)}%" if present else "0%",
+    }
+
+
+def build_team_stats(team_ids, duration, now=None):
+    now = now or (datetime.utcnow() + timedelta(hours=5, minutes=30))
+    today = now.strftime('%Y-%m-%d')
+    start = period_start(duration, now)
+
+    members_by_team = defaultdict(set)
+    remote_status, pk_to_employee_id = set(), {}
+    for row in Employees.objects.filter(status__in=ACTIVE_STATUSES, teams__id__in=team_ids).values('id', 'employee_id', 'status', 'teams__id'):
+        members_by_team[row['teams__id']].add(row['employee_id'])
+        pk_to_employee_id[row['id']] = row['employee_id']
+        if row['status'] == 'Remote':
+            remote_status.add(row['employee_id'])
+    all_ids = set(pk_to_employee_id.values())
+
+    # One row per employee: days with worked time, total minutes, on-time days, present today
+    on_time, hour_in, minute_in = _on_time()
+    per_employee = {}
+    rows = Attendance.objects.filter(employee_id__in=all_ids, date__gte=start).annotate(
+        worked_minutes=_worked_minutes(),
+        hour_in=hour_in,
+        minute_in=minute_in,
+    ).annotate(on_time=on_time).values('employee_id').annotate(
+        present=Count('id', filter=Q(worked_minutes__gt=0)),
+        minutes=Sum('worked_minutes'),
+        on_time_days=Count('id', filter=Q(worked_minutes__gt=0, on_time=1)),
+        active_today=Count('id', filter=Q(date=today, status='Present')),
+    ).order_by()
+    for row in rows:
+        per_employee[row['employee_id']] = {
+            'present': row['present'],
+            'minutes': row['minutes'] or 0,
+            'on_time': row['on_time_days'],
+            'active': row['active_today'] > 0,
+        }
+
+    # Today's open sessions have no worked_hours yet: count time since check-in
+    for row in Attendance.objects.filter(employee_id__in=all_ids, date=today).exclude(
+        worked_hours__regex=WORKED_HOURS_PATTERN
+    ).exclude(check_in__isnull=True).values('employee_id', 'check_in'):
+        minutes, was_on_time = _live_minutes(row['check_in'], now)
+        if minutes > 0:
+            stats = per_employee.setdefault(row['employee_id'], {'present': 0, 'minutes': 0, 'on_time': 0, 'active': False})
+            stats['present'] += 1
+            stats['minutes'] += minutes
+            stats['on_time'] += 1 if was_on_time else 0
+
+    # Today's approved leave and WFH in one probe of the unavailability store
+    on_leave_ids, wfh_ids = set(), set()
+    for row in EmployeeUnavailability.objects.filter(
+        employee_id__in=list(pk_to_employee_id), start_date__lte=now.date(), end_date__gte=now.date()
+    ).filter(Q(leave__status__iexact='Approved') | Q(wfh__status__iexact='Approved')).values('employee_id', 'kind'):
+        target = on_leave_ids if row['kind'] == EmployeeUnavailability.LEAVE else wfh_ids
+        target.add(pk_to_employee_id[row['employee_id']])
+    remote_ids = remote_status | wfh_ids | on_recurring_wfh(all_ids, today)
+
+    result = _summary(all_ids, per_employee, remote_ids, on_leave_ids)
+    result['teams'] = {
+        str(team_id): _summary(members_by_team.get(int(team_id), set()), per_employee, remote_ids, on_leave_ids)
+        for team_id in team_ids
+    }
+    return result
+
+
+def get_team_stats(team_ids, duration, refresh=False):
+    team_ids = sorted({int(t) for t in team_ids})
+    key = f"team_stats:{','.join(str(t) for t in team_ids)}:{duration}"
+    data = None if refresh else cache.get(key)
+    if data is None:
+        data = build_team_stats(team_ids, duration)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
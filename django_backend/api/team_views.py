@@ -1,4 +1,3 @@
-import random
 import os
 import traceback
 from rest_framework import status
@@ -6,7 +5,14 @@ from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 from core.models import Teams, Employees, Attendance, Leaves, WorkFromHome
-from .serializers import TeamsSerializer, EmployeesSerializer
+from .serializers import EmployeesSerializer
+from .team_calendar import get_team_calendar
+from .session_tokens import resolve_employee
+from .recurring_wfh import on_recurring_wfh
+from .occupancy import get_occupancy, DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS
+from .member_sample import sample_member_ids
+from .team_directory import get_team_directory
+from .team_stats import get_team_stats
 from datetime import datetime, timedelta
 
 def is_user_admin(employee):
@@ -65,9 +71,7 @@ def process_profile_picture(image_file):
 @api_view(['GET', 'POST'])
 def team_list(request):
     if request.method == 'GET':
-        teams = Teams.objects.all()
-        serializer = TeamsSerializer(teams, many=True)
-        return Response(serializer.data)
+        return Response(get_team_directory(refresh=request.query_params.get('refresh') in ('1', 'true')))
     
     elif request.method == 'POST':
         data = request.data
@@ -75,9 +79,7 @@ def team_list(request):
         manager = None
         if manager_id:
             try:
-                manager = Employees.objects.filter(employee_id=manager_id).first()
-                if not manager and str(manager_id).isdigit():
-                    manager = Employees.objects.filter(pk=manager_id).first()
+                manager = resolve_employee(request, manager_id)
                 
                 if not manager and manager_id:
                     return Response({'error': f'Manager with ID {manager_id} not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -126,11 +128,13 @@ def team_detail(request, pk):
         try:
             if 'name' in data: team.name = data['name']
             if 'description' in data: team.description = data['description']
+            if 'wfh_monthly_quota' in data:
+                # Empty/null removes the cap
+                quota = data['wfh_monthly_quota']
+                team.wfh_monthly_quota = int(quota) if quota not in (None, '') else None
             if 'manager_id' in data:
                 manager_id = data['manager_id']
-                manager = Employees.objects.filter(employee_id=manager_id).first()
-                if not manager and str(manager_id).isdigit():
-                    manager = Employees.objects.filter(pk=manager_id).first()
+                manager = resolve_employee(request, manager_id)
                 
                 if manager:
                     team.manager = manager
@@ -152,6 +156,55 @@ def team_detail(request, pk):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def team_calendar(request, pk):
+    """Day x member leave/WFH grid for a team: /team/<pk>/calendar/?month=YYYY-MM"""
+    team = Teams.objects.filter(pk=pk).first()
+    if not team:
+        return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    month_param = request.query_params.get('month') or datetime.now().strftime('%Y-%m')
+    try:
+        month_start = datetime.strptime(month_param, '%Y-%m')
+    except ValueError:
+        return Response({'error': 'Invalid month. Use YYYY-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(get_team_calendar(team, month_start.year, month_start.month))
+
+@api_view(['GET'])
+def occupancy_forecast(request):
+    """
+    Expected in-office headcount per day, team and location:
+    /occupancy/?from=YYYY-MM-DD&to=YYYY-MM-DD&team=<id>&location=<name>
+    Defaults to a quarter ahead from today.
+    """
+    try:
+        start = datetime.strptime(request.query_params['from'], '%Y-%m-%d').date() if request.query_params.get('from') else datetime.now().date()
+        end = datetime.strptime(request.query_params['to'], '%Y-%m-%d').date() if request.query_params.get('to') else start + timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    except ValueError:
+        return Response({'error': 'Invalid date format. Please use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+    if end < start:
+        return Response({'error': 'End date cannot be before start date.'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        return Response({'error': f'The window can cover at most {MAX_WINDOW_DAYS} days.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = get_occupancy(start, end, refresh=request.query_params.get('refresh') in ('1', 'true'))
+
+    # Team/location filters are applied to the cached org-wide forecast
+    team_id = request.query_params.get('team')
+    location = request.query_params.get('location')
+    if team_id or location:
+        days = []
+        for day in data['days']:
+            day = dict(day)
+            if team_id:
+                day['by_team'] = {k: v for k, v in day['by_team'].items() if str(k) == str(team_id)}
+            if location:
+                day['by_location'] = {k: v for k, v in day['by_location'].items() if k == location}
+            days.append(day)
+        data = dict(data, days=days)
+    return Response(data)
+
 @api_view(['GET', 'POST'])
 def member_list(request):
     if request.method == 'GET':
@@ -172,10 +225,13 @@ def member_list(request):
                 Q(employee_id__icontains=search)
             )
         
-        members = list(query)
-        # Only limit random sample if not searching and not specific team
-        if not team_id and not search and len(members) > 6:
-            members = random.sample(members, 6)
+        if not team_id and not search:
+            # Unfiltered widget: a random sample drawn in the database, not the whole directory
+            sample_ids = sample_member_ids()
+            by_id = {m.id: m for m in query.filter(id__in=sample_ids)}
+            members = [by_id[i] for i in sample_ids if i in by_id]
+        else:
+            members = list(query)
             
         india_time = datetime.utcnow() + timedelta(hours=5, minutes=30)
         current_date_str = india_time.strftime('%Y-%m-%d')
@@ -196,6 +252,8 @@ def member_list(request):
             from_date__lte=current_date_str,
             to_date__gte=current_date_str
         ).values_list('employee_id', flat=True))
+        # Recurring WFH rules are evaluated for today, not stored per day
+        on_wfh_ids |= on_recurring_wfh(member_ids, current_date_str)
 
         # Get today's attendance records to determine who is "Present" (Active Now)
         attendance_map = {
@@ -331,11 +389,7 @@ def designation_list(request):
 def member_detail(request, pk):
     try:
         # 1. Try exact employee_id match first (preferred)
-        employee = Employees.objects.filter(employee_id=pk).first()
-        
-        # 2. Fallback to Primary Key if not found as employee_id and is numeric
-        if not employee and str(pk).isdigit():
-            employee = Employees.objects.filter(id=pk).first()
+        employee = resolve_employee(request, pk)
             
         if not employee:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -488,125 +542,16 @@ def team_stats(request):
                 'on_time_arrival': None
             })
         
-        team_ids = [tid.strip() for tid in team_ids_str.split(',') if tid.strip()]
-        
-        duration = request.query_params.get('duration', 'This Week')
-        
-        query = Employees.objects.filter(status__in=['Active', 'Remote'])
-        if team_ids:
-            query = query.filter(teams__id__in=team_ids)
-            
-        members = query.all()
-        member_ids = [m.employee_id for m in members]
-        
-        total = len(members)
-        now = datetime.utcnow() + timedelta(hours=5, minutes=30)
-        today_date = now.strftime('%Y-%m-%d')
-        
-        # Determine start date based on duration
-        if duration == 'Today':
-            start_date_str = today_date
-        elif duration == 'This Month':
-            start_date = now.replace(day=1)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-        else: # This Week (Default)
-            monday = now - timedelta(days=now.weekday())
-            start_date_str = monday.strftime('%Y-%m-%d')
-        
-        # Calculate On Leave from Leaves table
-        # Note: Leaves might need to be filtered by the duration range too, but usually "On Leave" status implies *currently* on leave or relevant to the period.
-        # For simple stats, we often look at "Current Status". 
-        # However, if we want "Avg Hours" over a month, "On Leave" count is less relevant than "Total Absent Days".
-        # But keeping existing logic for "On Leave" count as "People currently on leave" seems safer for now unless specified.
-        # The original code filtered leaves intersecting with TODAY. Let's keep that for the "Status Cards" usually show current state.
-        
-        on_leave_ids = Leaves.objects.filter(
-            employee__employee_id__in=list(query.values_list('employee_id', flat=True)),
-            status='Approved',
-            from_date__lte=today_date,
-            to_date__gte=today_date
-        ).values_list('employee', flat=True).distinct()
-        
-        on_leave = on_leave_ids.count()
-        
-        # Active Now = Members who have clocked in TODAY (status='Present' in Attendance)
-        active = Attendance.objects.filter(
-            employee_id__in=member_ids,
-            date=today_date,
-            status='Present'
-        ).count()
-        
-        attendance_records = Attendance.objects.filter(
-            employee__employee_id__in=list(query.values_list('employee_id', flat=True)),
-            date__gte=start_date_str
-        )
-        
-        total_minutes = 0
-        present_count = 0
-        on_time_count = 0
-        
-        def parse_worked_hours(wh):
-            if not wh or 'h' not in wh: return 0
-            try:
-                parts = wh.replace('m', '').split('h ')
-                h = int(parts[0])
-                m = int(parts[1]) if len(parts) > 1 else 0
-                return h * 60 + m
-            except:
-                return 0
-
-        def is_on_time(check_in):
-            if not check_in or ':' not in check_in: return False
-            try:
-                t = datetime.strptime(check_in, '%I:%M %p')
-                cutoff = datetime.strptime('09:30 AM', '%I:%M %p')
-                return t <= cutoff
-            except:
-                return False
-
-        for rec in attendance_records:
-            rec_mins = parse_worked_hours(rec.worked_hours)
-            if not rec_mins and rec.check_in and rec.check_in != '-':
-                try:
-                    india_now = datetime.utcnow() + timedelta(hours=5, minutes=30)
-                    in_time = datetime.strptime(rec.check_in, '%I:%M %p')
-                    in_time = in_time.replace(year=india_now.year, month=india_now.month, day=india_now.day)
-                    if india_now > in_time:
-                        rec_mins = int((india_now - in_time).total_seconds() / 60)
-                except:
-                    pass
+        try:
+            team_ids = [int(tid) for tid in team_ids_str.split(',') if tid.strip()]
+        except ValueError:
+            return Response({'error': 'team_id must be a comma-separated list of team ids'}, status=status.HTTP_400_BAD_REQUEST)
 
-            if rec_mins > 0:
-                present_count += 1
-                total_minutes += rec_mins
-                if is_on_time(rec.check_in):
-                    on_time_count += 1
-                    
-        avg_mins = total_minutes // present_count if present_count > 0 else 0
-        avg_h = avg_mins // 60
-        avg_m = avg_mins % 60
-        
-        avg_working_hours = f"{avg_h}h {avg_m}m"
-        on_time_arrival = f"{int((on_time_count / present_count) * 100)}%" if present_count > 0 else "0%"
-        
-        # Remote count = Employees with status 'Remote' OR approved WFH today
-        wfh_count = WorkFromHome.objects.filter(
-            employee__employee_id__in=member_ids,
-            status__iexact='Approved',
-            from_date__lte=today_date,
-            to_date__gte=today_date
-        ).values('employee').distinct().count()
-        
-        remote = query.filter(status='Remote').count() + wfh_count
+        duration = request.query_params.get('duration', 'This Week')
+        refresh = request.query_params.get('refresh') in ('1', 'true', 'True')
 
-        return Response({
-            'total': total,
-            'active': active,
-            'onLeave': on_leave,
-            'remote': remote,
-            'avg_working_hours': avg_working_hours,
-            'on_time_arrival': on_time_arrival
-        })
+        # Combined stats at the top level (as before), per-team breakdown under 'teams'
+        return Response(get_team_stats(team_ids, duration, refresh=refresh))
     except Exception as e:
         print(f"Error in team_stats: {str(e)}")
         traceback.print_exc()
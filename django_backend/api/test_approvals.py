@@ -0,0 +1,153 @@
+from importlib import import_module
+from unittest import mock
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams, Leaves, WorkFromHome
+import datetime
+
+
+class ApprovalListTestCase(TestCase):
+    """Test cases for the paginated approvals queues"""
+
+    def setUp(self):
+        # The overlap constraint comes from migration 0027; install it when the test database skipped migrations
+        no_overlap = import_module('core.migrations.0027_unavailability_no_overlap')
+        for sql in {'sqlite': no_overlap.SQLITE_SQL, 'postgresql': no_overlap.POSTGRES_SQL}.get(connection.vendor, []):
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql)
+            except DatabaseError:
+                pass  # already there
+
+        self.client = APIClient()
+        self.team = Teams.objects.create(name='Platform')
+        self.alice = Employees.objects.create(
+            employee_id='APR001', first_name='Alice', last_name='Queue', email='alice@example.com',
+            role='Developer', status='Active'
+        )
+        self.bob = Employees.objects.create(
+            employee_id='APR002', first_name='Bob', last_name='Queue', email='bob@example.com',
+            role='Developer', status='Active'
+        )
+        self.alice.teams.add(self.team)
+
+        today = datetime.date.today()
+        self.monday = today + datetime.timedelta(days=7 - today.weekday())
+        self.next_monday = self.monday + datetime.timedelta(days=7)
+
+        self.alice_cl = self.leave(self.alice, 'cl', self.monday, 'Pending')
+        self.alice_sl = self.leave(self.alice, 'sl', self.next_monday, 'Approved')
+        self.bob_cl = self.leave(self.bob, 'cl', self.next_monday, 'Pending')
+        self.leave(self.bob, 'cl', self.monday + datetime.timedelta(days=2), 'Rejected')
+
+        # Alice is on leave on Monday, so her WFH is on the Tuesday
+        tuesday = (self.monday + datetime.timedelta(days=1)).isoformat()
+        self.alice_wfh = WorkFromHome.objects.create(
+            employee=self.alice, from_date=tuesday, to_date=tuesday, status='Pending'
+        )
+        WorkFromHome.objects.create(
+            employee=self.bob, from_date=self.monday.isoformat(), to_date=self.monday.isoformat(), status='Approved'
+        )
+
+    def leave(self, employee, leave_type, day, leave_status):
+        return Leaves.objects.create(
+            employee=employee, type=leave_type, days=1, status=leave_status,
+            from_date=day.isoformat(), to_date=day.isoformat()
+        )
+
+    def ids(self, response):
+        return sorted(row['id'] for row in response.data['results'])
+
+    def test_leave_queue_counts_and_filters(self):
+        """Test that the leave queue holds pending and recent approved leaves and honours every filter"""
+        response = self.client.get('/api/approvals/leaves/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), sorted([self.alice_cl.id, self.alice_sl.id, self.bob_cl.id]))
+        self.assertEqual(response.data['counts'], {'total': 3, 'pending': 2, 'approved': 1, 'overridden': 0})
+
+        response = self.client.get('/api/approvals/leaves/', {'team': self.team.id})
+        self.assertEqual(self.ids(response), sorted([self.alice_cl.id, self.alice_sl.id]))
+
+        response = self.client.get('/api/approvals/leaves/', {'from': self.next_monday.isoformat()})
+        self.assertEqual(self.ids(response), sorted([self.alice_sl.id, self.bob_cl.id]))
+        response = self.client.get('/api/approvals/leaves/', {'to': self.monday.isoformat()})
+        self.assertEqual(self.ids(response), [self.alice_cl.id])
+
+        response = self.client.get('/api/approvals/leaves/', {'type': 'CL'})
+        self.assertEqual(self.ids(response), sorted([self.alice_cl.id, self.bob_cl.id]))
+
+        response = self.client.get('/api/approvals/leaves/', {'status': 'Approved'})
+        self.assertEqual(self.ids(response), [self.alice_sl.id])
+        self.assertEqual(response.data['total'], 1)
+
+        response = self.client.get('/api/approvals/leaves/', {'status': 'Rejected'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_wfh_queue_and_unknown_kind(self):
+        """Test that the WFH queue only lists pending requests and an unknown kind is refused"""
+        response = self.client.get('/api/approvals/wfh/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [self.alice_wfh.id])
+        self.assertEqual(response.data['counts'], {'total': 1})
+
+        response = self.client.get('/api/approvals/wfh/', {'team': self.team.id, 'from': self.next_monday.isoformat()})
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get('/api/approvals/overtime/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_bounds(self):
+        """Test that pages are newest first, page_size is clamped and non-integers are refused"""
+        response = self.client.get('/api/approvals/leaves/', {'page_size': 2})
+        self.assertEqual((response.data['total'], response.data['total_pages']), (3, 2))
+        self.assertEqual([row['id'] for row in response.data['results']], [self.bob_cl.id, self.alice_sl.id])
+        response = self.client.get('/api/approvals/leaves/', {'page_size': 2, 'page': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.alice_cl.id])
+
+        response = self.client.get('/api/approvals/leaves/', {'page': 0, 'page_size': 1000})
+        self.assertEqual((response.data['page'], response.data['page_size']), (1, 100))
+        response = self.client.get('/api/approvals/leaves/', {'page_size': 0})
+        self.assertEqual(response.data['page_size'], 1)
+
+        response = self.client.get('/api/approvals/leaves/', {'page': 'two'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'page and page_size must be integers')
+
+    def test_bulk_action_errors(self):
+        """Test that expected bulk action failures are a 400 that changes nothing and anything else is not swallowed"""
+        body = {'action': 'Approve', 'leaves': [self.alice_cl.id, self.bob_cl.id], 'wfh': [self.alice_wfh.id]}
+
+        def unchanged():
+            self.assertEqual(Leaves.objects.get(pk=self.alice_cl.id).status, 'Pending')
+            self.assertEqual(Leaves.objects.get(pk=self.bob_cl.id).status, 'Pending')
+            self.assertEqual(WorkFromHome.objects.get(pk=self.alice_wfh.id).status, 'Pending')
+
+        # The digests are queued after every request has been updated, so a failure there must roll all of it back
+        with mock.patch('api.approval_views.send_approval_digests', side_effect=IntegrityError('overlap')):
+            response = self.client.post('/api/approvals/bulk-action/', body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['error'],
+            'A selected request overlaps another active leave or WFH request. Nothing was changed.'
+        )
+        unchanged()
+
+        with mock.patch('api.approval_views.send_approval_digests', side_effect=ValueError('bad time')):
+            response = self.client.post('/api/approvals/bulk-action/', body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'A selected request has invalid data: bad time. Nothing was changed.')
+        unchanged()
+
+        with mock.patch('api.approval_views.send_approval_digests', side_effect=RuntimeError('bug')):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/approvals/bulk-action/', body, format='json')
+        unchanged()
+
+        response = self.client.post('/api/approvals/bulk-action/', body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['processed']['leaves'], sorted([self.alice_cl.id, self.bob_cl.id]))
+        self.assertEqual(response.data['processed']['wfh'], [self.alice_wfh.id])
+        self.assertEqual(Leaves.objects.get(pk=self.alice_cl.id).status, 'Approved')
+        self.assertEqual(WorkFromHome.objects.get(pk=self.alice_wfh.id).status, 'Approved')
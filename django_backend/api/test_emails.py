@@ -0,0 +1,47 @@
+import datetime
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from core.models import Employees, WorkFromHome
+from api.models import NotificationOutbox
+from api.emails import TEMPLATE_NAMES, _templates, render_email
+
+
+@override_settings(OUTBOX_WORKERS=0)
+class EmailTemplatesTestCase(TestCase):
+    """Test cases for template-rendered notification emails and email-action pages"""
+
+    def setUp(self):
+        self.employee = Employees.objects.create(
+            employee_id='MAIL001', first_name='Mia', last_name='<Mailer>', email='mia@example.com',
+            role='Developer', status='Active'
+        )
+
+    def test_templates_are_compiled_at_startup_and_escape_values(self):
+        """Test that every template is loaded with the app and values cannot inject markup"""
+        self.assertEqual(set(_templates), set(TEMPLATE_NAMES))
+        body = render_email(
+            'emails/approval_request.html', title='Leave Application', employee=self.employee,
+            summary='has submitted a new leave request.', rows=[('Reason', '<script>x</script>')],
+            approve_url='https://hr.example.com/approve/', reject_url='https://hr.example.com/reject/',
+            request_name='leave', status_name='leave',
+        )
+        self.assertIn('Leave Application', body)
+        self.assertIn('&lt;Mailer&gt;', body)
+        self.assertIn('&lt;script&gt;', body)
+        self.assertIn('href="https://hr.example.com/approve/"', body)
+
+    def test_email_action_renders_page_and_queues_status_email(self):
+        """Test that approving from the email link returns the rendered page and queues the employee's email"""
+        day = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+        wfh = WorkFromHome.objects.create(employee=self.employee, from_date=day, to_date=day, status='Pending')
+
+        response = APIClient().get(f'/api/wfh/email-action/{wfh.id}/approve/')
+        self.assertContains(response, 'WFH Approved')
+        self.assertContains(response, 'You can close this window now.')
+
+        email = NotificationOutbox.objects.get(recipient='mia@example.com')
+        self.assertEqual(email.subject, 'WFH Request Update - Approved')
+        self.assertIn('Work From Home request has been <strong>approved</strong>', email.body)
+
+        response = APIClient().get(f'/api/wfh/email-action/{wfh.id}/reject/')
+        self.assertContains(response, 'Request Already Processed')
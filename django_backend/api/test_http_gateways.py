@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase
+from api import http_gateways
+from api.http_gateways import EMAIL, GEOCODING
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+
+    def _reply(self):
+        self.server.connections.add(self.client_address)
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        code = self.statuses.pop(0) if self.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPGatewaysTestCase(SimpleTestCase):
+    """Test cases for the pooled gateway client"""
+
+    def setUp(self):
+        http_gateways.reset_gateways()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.connections = set()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        http_gateways.reset_gateways()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_calls_reuse_one_connection_and_are_timed(self):
+        """Test that sequential calls share a kept-alive connection and land in the gateway histogram"""
+        for _ in range(5):
+            self.assertEqual(http_gateways.post(EMAIL, self.url, json={'a': 1}).json(), {'ok': True})
+        self.assertEqual(len(self.server.connections), 1)
+
+        metrics = http_gateways.gateway_metrics()
+        self.assertEqual((metrics[EMAIL]['count'], metrics[EMAIL]['errors']), (5, 0))
+        self.assertEqual(metrics[GEOCODING]['count'], 0)
+        self.assertIsNotNone(metrics[EMAIL]['p95_ms'])
+
+    def test_get_retries_gateway_errors_but_post_does_not(self):
+        """Test that a GET is retried on 503 while a POST returns the first response"""
+        _Handler.statuses[:] = [503]
+        self.assertEqual(http_gateways.get(GEOCODING, self.url).status_code, 200)
+
+        _Handler.statuses[:] = [503]
+        self.assertEqual(http_gateways.post(EMAIL, self.url, json={}).status_code, 503)
+        self.assertEqual(http_gateways.gateway_metrics()[EMAIL]['errors'], 1)
@@ -0,0 +1,241 @@
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Leaves, LeaveType, EmployeeLeaveBalance, LeaveLedgerEntry, EmployeeUnavailability, LeaveOverrideRequest
+from api.leave_ledger import rebuild_balances
+import datetime
+import threading
+
+
+class LeaveLedgerTestCase(TestCase):
+    """Test cases for the leave ledger and its running balances"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.employee = Employees.objects.create(
+            employee_id='LEDGER001',
+            first_name='Ledger',
+            last_name='Employee',
+            email='ledger@example.com',
+            role='Developer',
+            status='Active'
+        )
+        self.casual = LeaveType.objects.create(name='Casual Leave', code='CL', days_per_year=12)
+
+        # Next Monday, so the date is always valid for a non-admin applicant
+        today = datetime.date.today()
+        self.monday = today + datetime.timedelta(days=7 - today.weekday())
+        self.balance = EmployeeLeaveBalance.objects.create(
+            employee=self.employee, leave_type=self.casual, year=self.monday.year
+        )
+        LeaveLedgerEntry.objects.create(
+            employee=self.employee, leave_type=self.casual, year=self.monday.year,
+            entry_type=LeaveLedgerEntry.ALLOCATION, days=2
+        )
+        rebuild_balances(year=self.monday.year)
+
+    def apply(self, from_date, to_date, days):
+        return self.client.post('/api/leaves/apply/', {
+            'employeeId': self.employee.employee_id,
+            'fromDate': from_date.isoformat(),
+            'toDate': to_date.isoformat(),
+            'type': 'cl',
+            'days': days,
+            'reason': 'Personal work'
+        }, format='json')
+
+    def test_apply_debits_balance(self):
+        """Applying for leave appends a debit and updates the balance row"""
+        response = self.apply(self.monday, self.monday, 1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.allocated_days, 2)
+        self.assertEqual(self.balance.consumed_days, 1)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(entry_type=LeaveLedgerEntry.DEBIT).count(), 1)
+
+    def test_insufficient_balance_rejected(self):
+        """A request larger than the remaining balance is refused"""
+        tuesday = self.monday + datetime.timedelta(days=1)
+        wednesday = self.monday + datetime.timedelta(days=2)
+        response = self.apply(self.monday, wednesday, 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Insufficient leave balance', response.data['error'])
+
+        response = self.apply(self.monday, tuesday, 2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_reject_credits_once(self):
+        """A decided leave cannot be rejected, cancelled or re-approved again, so it is credited once"""
+        response = self.apply(self.monday, self.monday, 1)
+        leave_id = response.data['id']
+
+        response = self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'Reject'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for action in ('Reject', 'Cancel', 'Approve'):
+            response = self.client.post(f'/api/leaves/{leave_id}/action/', {'action': action}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['error'], 'Leave request is already Rejected')
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.consumed_days, 0)
+        self.assertEqual(Leaves.objects.get(pk=leave_id).status, 'Rejected')
+        self.assertEqual(LeaveLedgerEntry.objects.filter(entry_type=LeaveLedgerEntry.CREDIT).count(), 1)
+
+    def test_cancel_credit_rolls_back_with_status(self):
+        """A failure after the credit leaves neither the credit nor the new status behind"""
+        from unittest import mock
+        leave_id = self.apply(self.monday, self.monday, 1).data['id']
+        self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'Approve'}, format='json')
+
+        with mock.patch('api.leave_views.notify_employee_status_update', side_effect=RuntimeError('smtp down')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'Cancel'}, format='json')
+        self.assertEqual(Leaves.objects.get(pk=leave_id).status, 'Approved')
+        self.assertFalse(LeaveLedgerEntry.objects.filter(entry_type=LeaveLedgerEntry.CREDIT).exists())
+
+        response = self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'Cancel'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.consumed_days, 0)
+
+    def test_rebuild_replays_ledger(self):
+        """Replaying the ledger restores a balance row that drifted"""
+        self.apply(self.monday, self.monday, 1)
+        EmployeeLeaveBalance.objects.filter(pk=self.balance.pk).update(allocated_days=99, consumed_days=0)
+
+        rebuild_balances(year=self.monday.year)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.allocated_days, 2)
+        self.assertEqual(self.balance.consumed_days, 1)
+
+    def test_bulk_reject_credits_each_leave(self):
+        """Bulk rejection credits every pending leave once and skips the rest"""
+        first = self.apply(self.monday, self.monday, 1).data['id']
+        tuesday = self.monday + datetime.timedelta(days=1)
+        second = self.apply(tuesday, tuesday, 1).data['id']
+
+        response = self.client.post('/api/approvals/bulk-action/', {
+            'action': 'Reject',
+            'leaves': [first, second, 9999]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data['processed']['leaves']), sorted([first, second]))
+        self.assertEqual(response.data['skipped']['leaves'], [9999])
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.consumed_days, 0)
+        self.assertEqual(Leaves.objects.filter(status='Rejected').count(), 2)
+        self.assertFalse(EmployeeUnavailability.objects.filter(leave_id__in=[first, second]).exists())
+
+    def test_year_allocation_is_idempotent(self):
+        """Year-end allocation carries forward, pro-rates joiners and can be re-run safely"""
+        from api.leave_ledger import allocate_year
+        year = self.monday.year + 1
+        self.casual.carry_forward = True
+        self.casual.save()
+        joiner = Employees.objects.create(
+            employee_id='LEDGER002', first_name='New', last_name='Joiner', email='joiner@example.com',
+            role='Developer', status='Active', joining_date=datetime.date(year, 7, 2)
+        )
+
+        allocate_year(year, carry_forward_cap=1)
+        allocate_year(year, carry_forward_cap=1)
+
+        balance = EmployeeLeaveBalance.objects.get(employee=self.employee, leave_type=self.casual, year=year)
+        self.assertEqual(balance.allocated_days, 13)  # 12 allocated + 1 carried (capped)
+        joiner_balance = EmployeeLeaveBalance.objects.get(employee=joiner, leave_type=self.casual, year=year)
+        self.assertEqual(joiner_balance.allocated_days, 6)
+        self.assertEqual(LeaveLedgerEntry.objects.filter(year=year).count(), 3)
+
+    def test_override_dates_split_leave_once(self):
+        """Approving overrides on two dates splits the leave in one pass and credits both days"""
+        from api.leave_ledger import post_entry
+        post_entry(self.employee, self.casual, self.monday.year, LeaveLedgerEntry.ALLOCATION, 3)
+        friday = self.monday + datetime.timedelta(days=4)
+        leave_id = self.apply(self.monday, friday, 5).data['id']
+        leave = Leaves.objects.get(pk=leave_id)
+        leave.status = 'Approved'
+        leave.save()
+        for offset in (1, 3):
+            LeaveOverrideRequest.objects.create(
+                leave=leave, employee=self.employee,
+                date=(self.monday + datetime.timedelta(days=offset)).isoformat(),
+                check_in='09:30 AM', check_out='06:30 PM'
+            )
+
+        response = self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'ApproveOverride'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        parts = list(Leaves.objects.filter(employee=self.employee, status='Approved').order_by('from_date'))
+        self.assertEqual(
+            [(p.from_date, p.to_date, p.days) for p in parts],
+            [(self.monday.isoformat(), self.monday.isoformat(), 1),
+             ((self.monday + datetime.timedelta(days=2)).isoformat(), (self.monday + datetime.timedelta(days=2)).isoformat(), 1),
+             (friday.isoformat(), friday.isoformat(), 1)]
+        )
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.consumed_days, 3)
+
+    def test_failed_override_split_rolls_back(self):
+        """A failure while splitting the leave leaves the overrides Pending and the attendance untouched"""
+        from unittest import mock
+        from core.models import Attendance
+        leave_id = self.apply(self.monday, self.monday + datetime.timedelta(days=1), 2).data['id']
+        leave = Leaves.objects.get(pk=leave_id)
+        leave.status = 'Approved'
+        leave.save()
+        LeaveOverrideRequest.objects.create(
+            leave=leave, employee=self.employee, date=self.monday.isoformat(),
+            check_in='09:30 AM', check_out='06:30 PM'
+        )
+
+        with mock.patch('api.attendance_views.remove_leave_dates', side_effect=RuntimeError('split failed')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f'/api/leaves/{leave_id}/action/', {'action': 'ApproveOverride'}, format='json')
+
+        self.assertEqual(LeaveOverrideRequest.objects.get(leave=leave).status, 'Pending')
+        self.assertFalse(Attendance.objects.filter(employee=self.employee, date=self.monday.isoformat()).exists())
+        self.assertEqual(Leaves.objects.get(pk=leave_id).days, 2)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentLeaveApplyTestCase(TransactionTestCase):
+    """Concurrent applies against the same balance (needs a database with row locks)"""
+
+    def test_concurrent_applies_never_overdraw(self):
+        employee = Employees.objects.create(
+            employee_id='RACE001', first_name='Race', email='race@example.com', role='Developer', status='Active'
+        )
+        casual = LeaveType.objects.create(name='Casual Leave', code='CL', days_per_year=3)
+        year = datetime.date.today().year + 1
+        LeaveLedgerEntry.objects.create(
+            employee=employee, leave_type=casual, year=year, entry_type=LeaveLedgerEntry.ALLOCATION, days=3
+        )
+        rebuild_balances(year=year)
+
+        monday = datetime.date(year, 1, 1) + datetime.timedelta(days=(7 - datetime.date(year, 1, 1).weekday()) % 7)
+        codes = []
+
+        def apply(offset):
+            day = (monday + datetime.timedelta(days=offset)).isoformat()
+            response = APIClient().post('/api/leaves/apply/', {
+                'employeeId': employee.employee_id, 'fromDate': day, 'toDate': day,
+                'type': 'cl', 'days': 1, 'reason': 'Race'
+            }, format='json')
+            codes.append(response.status_code)
+            connection.close()
+
+        threads = [threading.Thread(target=apply, args=(offset,)) for offset in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        balance = EmployeeLeaveBalance.objects.get(employee=employee, leave_type=casual, year=year)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 3)
+        self.assertEqual(balance.consumed_days, 3)
+        self.assertEqual(Leaves.objects.filter(employee=employee).count(), 3)
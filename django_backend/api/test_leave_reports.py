@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams, Leaves, LeaveType, EmployeeLeaveBalance
+from api.leave_reports import build_leave_liability_report
+import datetime
+
+
+class LeaveLiabilityReportTestCase(TestCase):
+    """Test cases for the org leave liability and utilization forecast"""
+
+    def setUp(self):
+        cache.clear()
+        self.casual = LeaveType.objects.create(name='Casual Leave', code='CL', days_per_year=12, encashment=True)
+        self.sick = LeaveType.objects.create(name='Sick Leave', code='SL', days_per_year=6)
+        self.team = Teams.objects.create(name='Reports Team')
+        self.asha = Employees.objects.create(
+            employee_id='REP001', first_name='Asha', last_name='Report', email='asha@example.com',
+            role='Developer', status='Active'
+        )
+        self.ravi = Employees.objects.create(
+            employee_id='REP002', first_name='Ravi', last_name='Report', email='ravi@example.com',
+            role='Developer', status='Active'
+        )
+        self.ravi.teams.add(self.team)
+        EmployeeLeaveBalance.objects.create(
+            employee=self.asha, leave_type=self.casual, year=2030, allocated_days=12, consumed_days=3
+        )
+        EmployeeLeaveBalance.objects.create(
+            employee=self.ravi, leave_type=self.sick, year=2030, allocated_days=6, consumed_days=5
+        )
+
+        self.leave(self.asha, 'cl', '2030-01-07', '2030-01-08', 2)
+        self.leave(self.asha, 'CL', '2030-03-04', '2030-03-04', 1, 'Pending')
+        # Monday to Friday around the as-of Wednesday: three days taken, two still ahead
+        self.leave(self.ravi, 'sl', '2030-02-04', '2030-02-08', 5)
+        self.leave(self.ravi, 'lwp', '2030-01-14', '2030-01-14', 1)
+        self.leave(self.ravi, 'sl', '2030-01-21', '2030-01-21', 1, 'Rejected')
+        self.as_of = datetime.date(2030, 2, 6)
+
+    def leave(self, employee, leave_type, from_date, to_date, days, leave_status='Approved'):
+        return Leaves.objects.create(
+            employee=employee, type=leave_type, days=days, status=leave_status, from_date=from_date, to_date=to_date
+        )
+
+    def test_org_type_and_team_totals(self):
+        """Test that taken/booked split at as_of, LWP stays out of the org and team totals, and liability is encashable only"""
+        report = build_leave_liability_report(2030, self.as_of)
+        org = report['org']
+        self.assertEqual((org['headcount'], org['allocated'], org['consumed'], org['available']), (2, 18, 8, 10))
+        self.assertEqual((org['taken_to_date'], org['booked_ahead']), (5, 3))
+        self.assertEqual(org['encashable_liability_days'], 9)
+
+        by_type = {row['code']: row for row in report['by_leave_type']}
+        self.assertEqual((by_type['CL']['taken_to_date'], by_type['CL']['booked_ahead']), (2, 1))
+        self.assertEqual((by_type['SL']['taken_to_date'], by_type['SL']['booked_ahead']), (3, 2))
+        self.assertEqual(by_type['CL']['encashable_liability_days'], 9)
+        self.assertEqual(by_type['SL']['encashable_liability_days'], 0)
+
+        [team] = report['by_team']
+        self.assertEqual((team['team'], team['headcount'], team['taken_to_date'], team['booked_ahead']), ('Reports Team', 1, 3, 2))
+
+    def test_leave_in_progress_counts_half_day_and_past_end(self):
+        """Test that a leave starting in Session 2 before as_of counts half a day, and all of it once it has ended"""
+        Leaves.objects.filter(employee=self.ravi, type='sl', status='Approved').update(from_session='Second Half', days=4.5)
+        by_type = {row['code']: row for row in build_leave_liability_report(2030, self.as_of)['by_leave_type']}
+        self.assertEqual((by_type['SL']['taken_to_date'], by_type['SL']['booked_ahead']), (2.5, 2))
+
+        by_type = {row['code']: row for row in build_leave_liability_report(2030, datetime.date(2030, 2, 8))['by_leave_type']}
+        self.assertEqual((by_type['SL']['taken_to_date'], by_type['SL']['booked_ahead']), (4.5, 0))
+
+    def test_forecast_and_endpoint(self):
+        """Test the burn-rate forecast and that the endpoint validates the year"""
+        org = build_leave_liability_report(2030, self.as_of)['org']
+        elapsed = 37 / 365
+        self.assertEqual(org['forecast_year_end'], round(5 + 5 / elapsed * (1 - elapsed), 2))
+
+        client = APIClient()
+        self.assertEqual(client.get('/api/leaves/reports/liability/', {'year': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get('/api/leaves/reports/liability/', {'year': 2030})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['year'], 2030)
@@ -0,0 +1,63 @@
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from core.models import Employees
+from api.member_sample import sample_member_ids, _keyset_ids, MEMBER_STATUSES
+
+
+class MemberSampleTestCase(TestCase):
+    """Test cases for the random member sample behind the team widget"""
+
+    def setUp(self):
+        cache.clear()
+        self.members = []
+        for i in range(10):
+            self.members.append(Employees.objects.create(
+                employee_id=f'SMP{i:03d}', first_name=f'Member{i}', email=f'member{i}@example.com',
+                role='Developer', status='Remote' if i % 3 == 0 else 'Active'
+            ))
+        self.inactive = [
+            Employees.objects.create(
+                employee_id=f'OLD{i:03d}', first_name=f'Former{i}', email=f'former{i}@example.com',
+                role='Developer', status='Inactive'
+            )
+            for i in range(5)
+        ]
+        self.active_ids = {m.id for m in self.members}
+        self.queryset = Employees.objects.filter(status__in=MEMBER_STATUSES)
+
+    def test_keyset_probes_return_distinct_active_ids(self):
+        """Test that keyset probes only pick active/remote members, never twice, and keep the ids already sampled"""
+        for _ in range(20):
+            ids = _keyset_ids(self.queryset, 6)
+            self.assertEqual(len(ids), 6)
+            self.assertEqual(len(set(ids)), 6)
+            self.assertTrue(set(ids) <= self.active_ids)
+
+        ids = _keyset_ids(self.queryset, 6, exclude=[self.members[4].id])
+        self.assertEqual(ids[0], self.members[4].id)
+        self.assertEqual(len(set(ids)), 6)
+
+        # Asking for more than there are returns all of them
+        self.assertEqual(set(_keyset_ids(self.queryset, 50)), self.active_ids)
+        self.assertEqual(_keyset_ids(Employees.objects.none(), 6), [])
+
+    def test_short_tablesample_is_topped_up_by_keyset(self):
+        """Test that a PostgreSQL sample that comes back short is completed with keyset probes"""
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                mock.patch('api.member_sample._tablesample_ids', return_value=[self.members[1].id]) as tablesample:
+            ids = sample_member_ids(refresh=True)
+        tablesample.assert_called_once_with(6)
+        self.assertEqual(ids[0], self.members[1].id)
+        self.assertEqual(len(set(ids)), 6)
+        self.assertTrue(set(ids) <= self.active_ids)
+
+    def test_sample_is_cached_until_refresh(self):
+        """Test that the widget gets the same sample while it is cached"""
+        ids = sample_member_ids()
+        with self.assertNumQueries(0):
+            self.assertEqual(sample_member_ids(), ids)
+        with mock.patch('api.member_sample._keyset_ids', return_value=[self.members[2].id]):
+            self.assertEqual(sample_member_ids(refresh=True), [self.members[2].id])
+        self.assertEqual(sample_member_ids(), [self.members[2].id])
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams, Attendance, Leaves, WorkFromHome, RecurringWFH, Holidays
+from api.occupancy import build_occupancy
+import datetime
+
+
+class OccupancyForecastTestCase(TestCase):
+    """Test cases for the office occupancy forecast"""
+
+    def setUp(self):
+        cache.clear()
+        self.team = Teams.objects.create(name='Office Team')
+        self.meera = Employees.objects.create(
+            employee_id='OCC001', first_name='Meera', last_name='Desk', email='meera@example.com',
+            role='Developer', status='Active', location='Hyderabad'
+        )
+        self.new_joiner = Employees.objects.create(
+            employee_id='OCC002', first_name='Nikhil', last_name='Desk', email='nikhil@example.com',
+            role='Developer', status='Active'
+        )
+        Employees.objects.create(
+            employee_id='OCC003', first_name='Remote', last_name='Worker', email='remote@example.com',
+            role='Developer', status='Remote'
+        )
+        self.meera.teams.add(self.team)
+        # Forecast week starts Monday 2030-03-04; the 8 weeks before it are the check-in history
+        self.monday = datetime.date(2030, 3, 4)
+
+    def day(self, offset):
+        return (self.monday + datetime.timedelta(days=offset)).isoformat()
+
+    def history(self, employee, weekday, weeks, check_in='09:30 AM'):
+        for week in range(1, weeks + 1):
+            d = self.monday + datetime.timedelta(days=weekday - 7 * week)
+            Attendance.objects.create(employee=employee, date=d.isoformat(), check_in=check_in, status='Present')
+
+    def test_weekday_rates_and_absences(self):
+        """Test that per-weekday check-in rates (grouped on the string date column) are cut by leave, WFH and holidays"""
+        self.history(self.meera, 0, 8)   # every Monday
+        self.history(self.meera, 1, 4)   # half the Tuesdays
+        self.history(self.meera, 3, 8)   # every Thursday
+        self.history(self.meera, 2, 8, check_in='-')  # not a check-in
+        Leaves.objects.create(
+            employee=self.meera, type='cl', days=1, status='Approved', from_date=self.day(1), to_date=self.day(1)
+        )
+        WorkFromHome.objects.create(employee=self.new_joiner, from_date=self.day(0), to_date=self.day(0), status='Pending')
+        RecurringWFH.objects.create(
+            employee=self.meera, weekdays='3', start_date=self.monday, end_date=self.monday + datetime.timedelta(days=6),
+            status='Approved'
+        )
+        Holidays.objects.create(date=self.day(4), name='Office Closed', type='National Holiday')
+
+        data = build_occupancy(self.monday, self.monday + datetime.timedelta(days=6), as_of=self.monday)
+        self.assertEqual(data['headcount'], 2)
+        days = data['days']
+        # Meera is always in on Mondays; the new joiner uses the org Monday rate (8 of 16) halved by the pending WFH
+        self.assertEqual(days[0]['expected_in_office'], 1.2)
+        self.assertEqual(days[0]['by_team'], {self.team.id: 1.0})
+        self.assertEqual(days[0]['by_location'], {'Hyderabad': 1.0, 'Unassigned': 0.2})
+        # Meera is on leave on Tuesday, never in on Wednesday, and her recurring WFH covers Thursday
+        self.assertEqual([d['expected_in_office'] for d in days[1:4]], [0.2, 0, 0.5])
+        self.assertEqual((days[4]['working'], days[4]['holiday'], days[4]['expected_in_office']), (False, 'Office Closed', 0))
+        self.assertFalse(days[6]['working'])
+
+    def test_endpoint_filters_and_invalidation(self):
+        """Test the window validation, team filter and that a new leave refreshes the cached forecast"""
+        client = APIClient()
+        params = {'from': '2030-03-04', 'to': '2030-03-04'}
+        response = client.get('/api/occupancy/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['days'][0]['expected_in_office'], 2)
+
+        response = client.get('/api/occupancy/', dict(params, team=self.team.id))
+        self.assertEqual(response.data['days'][0]['by_team'], {self.team.id: 1.0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Leaves.objects.create(
+                employee=self.new_joiner, type='cl', days=1, status='Approved', from_date=self.day(0), to_date=self.day(0)
+            )
+        self.assertEqual(client.get('/api/occupancy/', params).data['days'][0]['expected_in_office'], 1)
+
+        self.assertEqual(client.get('/api/occupancy/', {'from': '2030-03-04', 'to': '2030-03-01'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(client.get('/api/occupancy/', {'from': '2030-01-01', 'to': '2030-12-31'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(client.get('/api/occupancy/', {'from': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
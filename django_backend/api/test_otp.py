@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees
+from api.models import EmailOTPStore
+from api.otp import issue_otp, verify_otp_code, EMAIL
+from api.otp_delivery import local_gateway
+
+
+class OTPTestCase(TestCase):
+    """Test cases for hashed, expiring login OTPs"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.employee = Employees.objects.create(
+            employee_id='OTP001', first_name='Olive', last_name='Tester', email='olive@example.com',
+            role='Developer', status='Active'
+        )
+
+    def test_code_is_hashed_and_single_use(self):
+        """Test that the stored code is hashed, verifies from cache once, and is then rejected"""
+        otp = issue_otp(EMAIL, self.employee.email)
+        entry = EmailOTPStore.objects.get()
+        self.assertNotIn(otp, entry.otp_hash)
+
+        with self.assertNumQueries(1):  # the consuming UPDATE only
+            self.assertTrue(verify_otp_code(EMAIL, self.employee.email, otp))
+        self.assertFalse(verify_otp_code(EMAIL, self.employee.email, otp))
+
+    def test_expired_code_rejected_and_purged(self):
+        """Test that an expired code fails verification (cache or DB) and is purged"""
+        otp = issue_otp(EMAIL, self.employee.email)
+        EmailOTPStore.objects.update(expires_at=timezone.now() - timedelta(days=2))
+        cache.clear()
+
+        response = self.client.post('/api/auth/verify-email-otp/', {'email': self.employee.email, 'otp': otp})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        call_command('purge_otps', stdout=StringIO())
+        self.assertEqual(EmailOTPStore.objects.count(), 0)
+
+    def test_db_fallback_when_cache_is_empty(self):
+        """Test that a valid code still verifies after the cache entry is lost"""
+        otp = issue_otp(EMAIL, self.employee.email)
+        cache.clear()
+        response = self.client.post('/api/auth/verify-email-otp/', {'email': self.employee.email, 'otp': otp})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['employee_id'], 'OTP001')
+
+    def test_verify_attempts_are_rate_limited(self):
+        """Test that guesses past the bucket capacity get 429 without touching the database"""
+        otp = issue_otp(EMAIL, self.employee.email)
+        for _ in range(5):
+            response = self.client.post('/api/auth/verify-email-otp/', {'email': self.employee.email, 'otp': '000000'})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/auth/verify-email-otp/', {'email': self.employee.email, 'otp': otp})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_client_ip_ignores_spoofed_forwarded_for(self):
+        """Test that X-Forwarded-For is only trusted from the right, and only behind configured proxies"""
+        from django.test import RequestFactory
+        from api.ratelimit import client_ip
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.9', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(client_ip(request), '10.0.0.2')
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(client_ip(request), '203.0.113.9')
+        with override_settings(TRUSTED_PROXY_COUNT=5):
+            self.assertEqual(client_ip(request), '6.6.6.6')
+
+    @override_settings(OTP_GATEWAY='local', OTP_DELIVERY_WORKERS=0, OTP_LOCAL_GATEWAY_LATENCY_MS=0)
+    def test_send_returns_delivery_id_and_status_is_pollable(self):
+        """Test that send_email_otp answers with a delivery id whose status reaches Sent"""
+        response = self.client.post('/api/auth/send-email-otp/', {'email': self.employee.email})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delivery_id = response.data['delivery_id']
+        self.assertEqual(local_gateway.sent[-1][0], self.employee.email)
+
+        response = self.client.get(f'/api/auth/otp-delivery/{delivery_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'Sent')
+        self.assertEqual(response.data['attempts'], 1)
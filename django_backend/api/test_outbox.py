@@ -0,0 +1,123 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from api.models import NotificationOutbox
+from django.db.models import QuerySet
+from api.outbox import queue_email, claim, drain, outbox_metrics
+
+
+@override_settings(OUTBOX_WORKERS=0, OUTBOX_MAX_ATTEMPTS=3, OUTBOX_COALESCE_SECONDS=0)
+class NotificationOutboxTestCase(TestCase):
+    """Test cases for the transactional notification outbox"""
+
+    def test_email_is_queued_with_the_change(self):
+        """Test that a view queues its email in its transaction and a rolled back change queues nothing"""
+        response = APIClient().post('/api/support/submit/', {
+            'firstName': 'Sam', 'lastName': 'Query', 'email': 'sam@example.com',
+            'phone': '9999999999', 'message': 'Help',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        before = NotificationOutbox.objects.count()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                queue_email('admin@example.com', 'Subject', 'Body')
+                raise RuntimeError('change rolled back')
+        self.assertEqual(NotificationOutbox.objects.count(), before)
+
+    @mock.patch('api.outbox.send_email_via_api', return_value=(False, 'gateway down'))
+    def test_failed_send_backs_off_then_goes_dead(self, send):
+        """Test that failures are retried after a growing delay and dead-lettered after the last attempt"""
+        [row] = queue_email('emp@example.com', 'Subject', 'Body')
+
+        self.assertEqual(drain(), 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.last_error), (NotificationOutbox.PENDING, 1, 'gateway down'))
+        self.assertGreater(row.available_at, timezone.now())
+        self.assertEqual(drain(), 0)  # not due yet
+
+        for _ in range(2):
+            NotificationOutbox.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+            drain()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (NotificationOutbox.DEAD, 3))
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(outbox_metrics()['depth'][NotificationOutbox.DEAD], 1)
+
+    @mock.patch('api.outbox.send_email_via_api', return_value=(True, 'ok'))
+    def test_sent_rows_and_metrics(self, send):
+        """Test that sent rows are recorded with latency and a stale Processing lease is reclaimed"""
+        queue_email('a@example.com', 'Subject', 'Body')
+        [stale] = queue_email('b@example.com', 'Subject 2', 'Body')
+        NotificationOutbox.objects.filter(pk=stale.pk).update(
+            status=NotificationOutbox.PROCESSING, locked_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(drain(), 2)
+        metrics = outbox_metrics()
+        self.assertEqual(metrics['depth'][NotificationOutbox.SENT], 2)
+        self.assertEqual(metrics['sent_last_hour'], 2)
+        self.assertIsNotNone(metrics['latency_seconds']['p95'])
+        self.assertEqual(metrics['oldest_due_seconds'], 0)
+
+    @mock.patch('api.outbox.send_email_via_api', return_value=(True, 'ok'))
+    def test_identical_emails_coalesce_into_one_call(self, send):
+        """Test that identical emails queued together go out as one call with every recipient"""
+        queue_email(['m1@example.com', 'm2@example.com', ' m3@example.com', ''], 'Approve', 'Body')
+        queue_email('m4@example.com', 'Approve', 'Body')
+        queue_email('emp@example.com', 'Approve', 'Different body')
+
+        self.assertEqual(drain(), 5)
+        self.assertEqual(
+            sorted(sorted(c.args[0]) for c in send.call_args_list),
+            [['emp@example.com'], ['m1@example.com', 'm2@example.com', 'm3@example.com', 'm4@example.com']]
+        )
+        self.assertEqual(NotificationOutbox.objects.filter(status=NotificationOutbox.SENT).count(), 5)
+
+        send.reset_mock()
+        queue_email([f"e{i}@example.com" for i in range(5)], 'Digest', 'Body')
+        with override_settings(OUTBOX_MAX_RECIPIENTS=2):
+            drain()
+        self.assertEqual([len(c.args[0]) for c in send.call_args_list], [2, 2, 1])
+
+    def test_one_bad_recipient_does_not_fail_the_batch(self):
+        """Test that a rejected group is sent per recipient so only the bad address is retried and dead-lettered"""
+        def gateway(recipients, subject, body):
+            if 'bad@example.com' in recipients:
+                return False, 'invalid recipient bad@example.com'
+            return True, 'ok'
+
+        queue_email(['ok1@example.com', 'bad@example.com', 'ok2@example.com'], 'Approve', 'Body')
+        with mock.patch('api.outbox.send_email_via_api', side_effect=gateway) as send:
+            self.assertEqual(drain(), 3)
+            self.assertEqual(send.call_count, 4)
+            for _ in range(2):
+                NotificationOutbox.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+                drain()
+
+        rows = {row.recipient: row for row in NotificationOutbox.objects.all()}
+        self.assertEqual((rows['ok1@example.com'].status, rows['ok1@example.com'].attempts), (NotificationOutbox.SENT, 1))
+        self.assertEqual(rows['ok2@example.com'].status, NotificationOutbox.SENT)
+        self.assertEqual((rows['bad@example.com'].status, rows['bad@example.com'].attempts), (NotificationOutbox.DEAD, 3))
+
+    def test_rows_claimed_by_another_worker_are_not_returned(self):
+        """Test that rows another worker claims between the select and the update are left to that worker"""
+        queue_email(['r1@example.com', 'r2@example.com'], 'Subject', 'Body')
+        update = QuerySet.update
+        other = []
+
+        def claim_first(queryset, **kwargs):
+            # Without SKIP LOCKED a second worker can select the same rows; let it claim them first
+            if not other:
+                other.append(None)
+                other.extend(claim())
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', claim_first):
+            mine = claim()
+        self.assertEqual(mine, [])
+        self.assertEqual(sorted(r.recipient for r in other[1:]), ['r1@example.com', 'r2@example.com'])
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams
+
+
+class ProfilePayloadTestCase(TestCase):
+    """Test cases for the shared session/profile payload"""
+
+    def setUp(self):
+        """An engineer in one team whose lead manages it"""
+        cache.clear()
+        self.client = APIClient()
+        self.lead = Employees.objects.create(
+            employee_id='PP001', first_name='Lena', last_name='Lead', email='lead@example.com',
+            role='Team Lead', status='Active'
+        )
+        self.employee = Employees.objects.create(
+            employee_id='PP002', first_name='Ed', last_name='Engineer', email='ed@example.com',
+            role='Developer', status='Active'
+        )
+        Employees.objects.create(
+            employee_id='PP003', first_name='Pam', last_name='Manager', email='pam@example.com',
+            role='Project Manager', status='Active'
+        )
+        self.team = Teams.objects.create(name='Platform', manager=self.lead)
+        self.team.members.set([self.lead, self.employee])
+
+    def test_profile_is_cached_until_teams_change(self):
+        """Test that get_profile is served from cache and rebuilt after a membership change"""
+        response = self.client.get(f'/api/auth/profile/{self.employee.employee_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['team_ids'], str(self.team.id))
+        self.assertEqual(response.data['team_lead_name'], 'Lena Lead')
+        self.assertEqual(response.data['project_manager_name'], 'Pam Manager')
+        self.assertFalse(response.data['is_manager'])
+
+        with self.assertNumQueries(1):  # only the employee lookup
+            self.client.get(f'/api/auth/profile/{self.employee.employee_id}/')
+
+        other = Teams.objects.create(name='Mobile')
+        other.members.add(self.employee)
+        response = self.client.get(f'/api/auth/profile/{self.employee.employee_id}/')
+        self.assertEqual(response.data['team_ids'], f'{self.team.id},{other.id}')
+        self.assertEqual(response.data['team_name'], 'Platform, Mobile')
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams, WorkFromHome
+from api.otp import issue_otp, EMAIL
+from api.session_tokens import read_session_token, issue_session_token
+
+
+class SessionTokenTestCase(TestCase):
+    """Test cases for signed session tokens"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.employee = Employees.objects.create(
+            employee_id='ST001', first_name='Sam', last_name='Token', email='sam@example.com',
+            role='Developer', status='Active'
+        )
+        self.team = Teams.objects.create(name='Core')
+        self.team.members.add(self.employee)
+
+    def sign_in(self):
+        otp = issue_otp(EMAIL, self.employee.email)
+        response = self.client.post('/api/auth/verify-email-otp/', {'email': self.employee.email, 'otp': otp})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def test_token_carries_identity_and_authenticates_requests(self):
+        """Test that the sign-in token is verified without a lookup and resolves the employee by pk"""
+        token = self.sign_in()
+        identity = read_session_token(token)
+        self.assertEqual(identity.employee_id, 'ST001')
+        self.assertEqual(identity.team_ids, [self.team.id])
+        self.assertFalse(identity.is_admin)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(2):  # employee by pk, then the leaves
+            response = self.client.get(f'/api/leaves/{self.employee.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bad_or_expired_token_rejected_but_sign_in_still_works(self):
+        """Test that tampered or expired tokens get 401 while anonymous and sign-in requests still work"""
+        token = self.sign_in()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token[:-2]}xx')
+        response = self.client.get(f'/api/leaves/{self.employee.employee_id}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.sign_in()
+
+        with override_settings(SESSION_TOKEN_MAX_AGE=-1):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = self.client.get(f'/api/leaves/{self.employee.employee_id}/')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.get(f'/api/leaves/{self.employee.employee_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_placeholder_token_does_not_resolve_to_a_real_employee(self):
+        """Test that the demo sign-in token (made-up id 999) never loads the employee stored at pk 999"""
+        other = Employees.objects.create(
+            pk=999, employee_id='ST999', first_name='Other', last_name='Person', email='other@example.com',
+            role='Developer', status='Active'
+        )
+        WorkFromHome.objects.create(employee=other, from_date='2030-01-07', to_date='2030-01-07', status='Pending')
+
+        response = self.client.post('/api/auth/verify-email-otp/', {'email': 'demo@gmail.com', 'otp': '123456'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        identity = read_session_token(response.data['token'])
+        self.assertIsNone(identity.pk)
+        self.assertIsNone(identity.employee)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        response = self.client.get('/api/wfh/requests/MW-DEMO/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_token_pk_must_match_the_employee_id_claim(self):
+        """Test that a token whose pk points at a different employee is not trusted for that pk"""
+        other = Employees.objects.create(
+            employee_id='ST002', first_name='Other', last_name='Person', email='other@example.com',
+            role='Developer', status='Active'
+        )
+        token = issue_session_token({'employee_id': 'ST001', 'id': other.pk}, employee=other)
+        self.assertIsNone(read_session_token(token).employee)
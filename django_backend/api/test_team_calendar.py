@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams, Leaves, WorkFromHome, RecurringWFH, Holidays
+import datetime
+
+
+class TeamCalendarTestCase(TestCase):
+    """Test cases for the cached team leave/WFH calendar"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.team = Teams.objects.create(name='Calendar Team')
+        self.zara = Employees.objects.create(
+            employee_id='CAL001', first_name='Zara', last_name='Grid', email='zara@example.com',
+            role='Developer', status='Active'
+        )
+        self.adam = Employees.objects.create(
+            employee_id='CAL002', first_name='Adam', last_name='Grid', email='adam@example.com',
+            role='Developer', status='Active'
+        )
+        self.team.members.add(self.zara, self.adam)
+        # The first Monday of March next year, so the whole week is in one month
+        self.first = datetime.date(datetime.date.today().year + 1, 3, 1)
+        self.monday = self.first + datetime.timedelta(days=(7 - self.first.weekday()) % 7)
+        self.month = self.first.strftime('%Y-%m')
+
+    def day(self, offset):
+        return (self.monday + datetime.timedelta(days=offset)).isoformat()
+
+    def get(self):
+        return self.client.get(f'/api/team/{self.team.id}/calendar/', {'month': self.month})
+
+    def column(self, response, d):
+        return response.data['days'].index(d)
+
+    def test_grid_holds_leaves_wfh_rules_and_holidays(self):
+        """Test that each member row shows leaves (with half-day sessions), WFH, recurring WFH and holidays"""
+        Leaves.objects.create(
+            employee=self.zara, type='cl', days=1.5, status='Approved', from_date=self.day(0), to_date=self.day(1),
+            from_session='Second Half', to_session='Full Day'
+        )
+        WorkFromHome.objects.create(employee=self.adam, from_date=self.day(0), to_date=self.day(0), status='Pending')
+        RecurringWFH.objects.create(
+            employee=self.adam, weekdays='3', start_date=self.monday, end_date=self.monday + datetime.timedelta(days=6),
+            status='Approved'
+        )
+        Holidays.objects.create(date=self.day(4), name='Spring Day', type='National Holiday')
+
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['name'] for m in response.data['members']], ['Adam Grid', 'Zara Grid'])
+        adam, zara = response.data['grid']
+        self.assertEqual(zara[self.column(response, self.day(0))], {
+            'kind': 'leave', 'type': 'cl', 'status': 'Approved', 'session': 'Session 2'
+        })
+        self.assertEqual(zara[self.column(response, self.day(1))], {'kind': 'leave', 'type': 'cl', 'status': 'Approved'})
+        self.assertEqual(adam[self.column(response, self.day(0))], {'kind': 'wfh', 'status': 'Pending'})
+        self.assertEqual(adam[self.column(response, self.day(3))], {'kind': 'wfh', 'status': 'Approved', 'recurring': True})
+        self.assertIsNone(adam[self.column(response, self.day(1))])
+        self.assertEqual(response.data['holidays'], {self.day(4): 'Spring Day'})
+        self.assertIn(self.column(response, self.day(6)), response.data['weekly_off'])
+
+    def test_bad_team_and_month(self):
+        """Test that an unknown team is a 404 and a malformed month a 400"""
+        self.assertEqual(self.client.get('/api/team/999999/calendar/').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/api/team/{self.team.id}/calendar/', {'month': 'March'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cache_invalidated_by_requests_holidays_and_membership(self):
+        """Test that the cached month is rebuilt after a member's leave, a holiday or a membership change"""
+        response = self.get()
+        self.assertIsNone(response.data['grid'][1][self.column(response, self.day(0))])
+        with self.assertNumQueries(1):
+            self.get()  # only the team lookup; the grid comes from the cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Leaves.objects.create(
+                employee=self.zara, type='cl', days=1, status='Pending', from_date=self.day(0), to_date=self.day(0)
+            )
+        response = self.get()
+        self.assertEqual(response.data['grid'][1][self.column(response, self.day(0))]['kind'], 'leave')
+
+        Holidays.objects.create(date=self.day(2), name='New Holiday', type='National Holiday')
+        self.assertEqual(self.get().data['holidays'], {self.day(2): 'New Holiday'})
+
+        self.team.members.remove(self.adam)
+        self.assertEqual([m['name'] for m in self.get().data['members']], ['Zara Grid'])
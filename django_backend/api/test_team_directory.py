@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Employees, Teams
+from api.serializers import TeamsSerializer
+from api.team_directory import get_team_directory, teams_with_counts
+
+
+class TeamDirectoryTestCase(TestCase):
+    """Test cases for the cached team listing and its member counts"""
+
+    def setUp(self):
+        cache.clear()
+
+        def employee(code, employee_status='Active'):
+            return Employees.objects.create(
+                employee_id=code, first_name=code.title(), last_name='Dir', email=f'{code.lower()}@example.com',
+                role='Developer', status=employee_status
+            )
+
+        self.lead = employee('LEAD')
+        self.dev = employee('DEV')
+        self.remote = employee('REMOTE', 'Remote')
+        self.former = employee('FORMER', 'Inactive')
+        self.lead_team = Teams.objects.create(name='Lead Member', manager=self.lead)
+        self.lead_team.members.add(self.lead, self.dev, self.remote, self.former)
+        self.outside_manager = Teams.objects.create(name='Outside Manager', manager=self.lead)
+        self.outside_manager.members.add(self.dev)
+        self.inactive_manager = Teams.objects.create(name='Inactive Manager', manager=self.former)
+        self.empty = Teams.objects.create(name='Empty')
+
+    def counts(self):
+        return {row['name']: row['member_count'] for row in get_team_directory()}
+
+    def test_annotated_counts_match_per_team_count(self):
+        """Test that the annotated counts agree with counting each team on its own"""
+        self.assertEqual(self.counts(), {
+            'Lead Member': 3, 'Outside Manager': 2, 'Inactive Manager': 0, 'Empty': 0
+        })
+        for team in teams_with_counts():
+            self.assertEqual(
+                team.active_member_count,
+                TeamsSerializer(Teams.objects.get(pk=team.pk)).data['member_count']
+            )
+
+    def test_directory_cached_and_invalidated(self):
+        """Test that the listing is served from cache and rebuilt after membership, employee or team changes"""
+        response = APIClient().get('/api/team/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        with self.assertNumQueries(0):
+            get_team_directory()
+
+        self.empty.members.add(self.remote)
+        self.assertEqual(self.counts()['Empty'], 1)
+
+        self.remote.status = 'Inactive'
+        self.remote.save()
+        self.assertEqual(self.counts()['Empty'], 0)
+        self.assertEqual(self.counts()['Lead Member'], 2)
+
+        self.empty.name = 'Renamed'
+        self.empty.save()
+        self.assertIn('Renamed', self.counts())
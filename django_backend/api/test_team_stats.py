@@ -0,0 +1,53 @@
+from django.test import TestCase
+from core.models import Employees, Teams, Attendance, Leaves, WorkFromHome
+from api.team_stats import build_team_stats
+import datetime
+
+
+class TeamStatsTestCase(TestCase):
+    """Test cases for the grouped team stats aggregation"""
+
+    def setUp(self):
+        """Two teams sharing one member, with a week of attendance"""
+        self.now = datetime.datetime(2026, 10, 14, 11, 0)  # Wednesday, 11:00 AM IST
+        self.alpha = Teams.objects.create(name='Alpha')
+        self.beta = Teams.objects.create(name='Beta')
+        self.employees = {}
+        for emp_id, emp_status, teams in [
+            ('T001', 'Active', [self.alpha]),
+            ('T002', 'Active', [self.alpha, self.beta]),
+            ('T003', 'Remote', [self.beta]),
+            ('T004', 'Inactive', [self.beta]),
+        ]:
+            emp = Employees.objects.create(
+                employee_id=emp_id, first_name=emp_id, last_name='Member',
+                email=f'{emp_id.lower()}@example.com', role='Developer', status=emp_status
+            )
+            emp.teams.set(teams)
+            self.employees[emp_id] = emp
+
+        Attendance.objects.create(employee=self.employees['T001'], date='2026-10-12', check_in='09:10 AM', worked_hours='8h 0m', status='Present')
+        Attendance.objects.create(employee=self.employees['T002'], date='2026-10-12', check_in='09:45 AM', worked_hours='7h 30m', status='Present')
+        Attendance.objects.create(employee=self.employees['T002'], date='2026-10-05', check_in='09:00 AM', worked_hours='9h 0m', status='Present')  # previous week
+        Attendance.objects.create(employee=self.employees['T001'], date='2026-10-14', check_in='09:00 AM', status='Present')  # still checked in
+        Leaves.objects.create(employee=self.employees['T002'], type='cl', days=1, status='Approved', from_date='2026-10-14', to_date='2026-10-14')
+        WorkFromHome.objects.create(employee=self.employees['T001'], from_date='2026-10-14', to_date='2026-10-14', reason='Plumber', status='Approved')
+
+    def test_combined_and_per_team_stats(self):
+        """Test that shared members are counted once combined and once per team"""
+        stats = build_team_stats([self.alpha.id, self.beta.id], 'This Week', now=self.now)
+
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['active'], 1)
+        self.assertEqual(stats['onLeave'], 1)
+        self.assertEqual(stats['remote'], 2)
+        # 480 + 450 + 120 live minutes over 3 present days, 2 of them on time
+        self.assertEqual(stats['avg_working_hours'], '5h 50m')
+        self.assertEqual(stats['on_time_arrival'], '66%')
+
+        alpha = stats['teams'][str(self.alpha.id)]
+        beta = stats['teams'][str(self.beta.id)]
+        self.assertEqual((alpha['total'], alpha['onLeave'], alpha['remote']), (2, 1, 1))
+        self.assertEqual((beta['total'], beta['onLeave'], beta['remote']), (2, 1, 1))
+        self.assertEqual(beta['avg_working_hours'], '7h 30m')
+        self.assertEqual(beta['on_time_arrival'], '0%')
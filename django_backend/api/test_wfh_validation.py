@@ -1,7 +1,9 @@
+from importlib import import_module
+from django.db import DatabaseError, connection, transaction
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
-from core.models import Employees, WorkFromHome, Holidays
+from core.models import Employees, WorkFromHome, Holidays, Leaves, EmployeeUnavailability
 import datetime
 
 
@@ -186,3 +188,243 @@ class WFHValidationTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('error', response.data)
         self.assertIn('Employee not found', response.data['error'])
+
+    def test_wfh_overlapping_leave_rejected(self):
+        """Test that WFH overlapping an active leave is rejected"""
+        today = datetime.date.today()
+        monday = today + datetime.timedelta(days=7 - today.weekday())
+        Leaves.objects.create(
+            employee=self.employee,
+            type='cl',
+            from_date=monday.isoformat(),
+            to_date=(monday + datetime.timedelta(days=1)).isoformat(),
+            days=2,
+            status='Approved'
+        )
+
+        response = self.client.post('/api/wfh/apply/', {
+            'employeeId': self.employee.employee_id,
+            'fromDate': (monday + datetime.timedelta(days=1)).isoformat(),
+            'toDate': (monday + datetime.timedelta(days=2)).isoformat(),
+            'reason': 'Overlaps leave',
+            'notifyTo': 'Manager'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('already applied for Leave', response.data['error'])
+
+    def test_rejected_wfh_frees_dates(self):
+        """Test that a rejected WFH request no longer blocks its dates"""
+        today = datetime.date.today()
+        monday = today + datetime.timedelta(days=7 - today.weekday())
+        wfh = WorkFromHome.objects.create(
+            employee=self.employee,
+            from_date=monday.isoformat(),
+            to_date=monday.isoformat(),
+            reason='First request',
+            status='Pending'
+        )
+        self.assertTrue(EmployeeUnavailability.objects.filter(wfh=wfh).exists())
+
+        wfh.status = 'Rejected'
+        wfh.save()
+        self.assertFalse(EmployeeUnavailability.objects.filter(wfh=wfh).exists())
+
+        response = self.client.post('/api/wfh/apply/', {
+            'employeeId': self.employee.employee_id,
+            'fromDate': monday.isoformat(),
+            'toDate': monday.isoformat(),
+            'reason': 'Second request',
+            'notifyTo': 'Manager'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_recurring_wfh_expanded_for_window(self):
+        """Test that a Tue/Thu rule expands lazily, skipping leave days, and blocks duplicate rules"""
+        today = datetime.date.today()
+        monday = today + datetime.timedelta(days=7 - today.weekday())
+        response = self.client.post('/api/wfh/recurring/apply/', {
+            'employeeId': self.employee.employee_id,
+            'weekdays': ['Tue', 'Thu'],
+            'fromDate': monday.isoformat(),
+            'toDate': (monday + datetime.timedelta(days=13)).isoformat(),
+            'reason': 'Hybrid schedule'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(WorkFromHome.objects.count(), 0)
+
+        Leaves.objects.create(
+            employee=self.employee, type='cl', days=1, status='Approved',
+            from_date=(monday + datetime.timedelta(days=3)).isoformat(),
+            to_date=(monday + datetime.timedelta(days=3)).isoformat()
+        )
+        response = self.client.get(f'/api/wfh/recurring/{self.employee.employee_id}/', {
+            'from': monday.isoformat(), 'to': (monday + datetime.timedelta(days=30)).isoformat()
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rules'][0]['weekday_names'], ['Tue', 'Thu'])
+        self.assertEqual(response.data['dates'], [
+            (monday + datetime.timedelta(days=offset)).isoformat() for offset in (1, 8, 10)
+        ])
+
+        response = self.client.post('/api/wfh/recurring/apply/', {
+            'employeeId': self.employee.employee_id,
+            'weekdays': 'Thu',
+            'fromDate': (monday + datetime.timedelta(days=7)).isoformat(),
+            'toDate': (monday + datetime.timedelta(days=20)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_monthly_quota_enforced_and_released(self):
+        """Test that the team WFH quota is checked against the monthly counter and freed on cancel"""
+        from core.models import Teams, WFHMonthlyUsage
+        team = Teams.objects.create(name='Quota Team', wfh_monthly_quota=2)
+        team.members.add(self.employee)
+        # Three working days inside one month, starting on a Monday
+        today = datetime.date.today()
+        monday = datetime.date(today.year + 1, 3, 1)
+        monday += datetime.timedelta(days=(7 - monday.weekday()) % 7)
+
+        def apply(start, end):
+            return self.client.post('/api/wfh/apply/', {
+                'employeeId': self.employee.employee_id,
+                'fromDate': start.isoformat(),
+                'toDate': end.isoformat(),
+                'reason': 'Quota'
+            })
+
+        first = apply(monday, monday + datetime.timedelta(days=1))
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        usage = WFHMonthlyUsage.objects.get(employee=self.employee, year=monday.year, month=monday.month)
+        self.assertEqual(usage.days, 2)
+
+        response = apply(monday + datetime.timedelta(days=2), monday + datetime.timedelta(days=2))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('WFH quota exceeded', response.data['error'])
+
+        response = self.client.post(f"/api/wfh/{first.data['id']}/action/", {'action': 'Cancel'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        usage.refresh_from_db()
+        self.assertEqual(usage.days, 0)
+
+        response = apply(monday + datetime.timedelta(days=2), monday + datetime.timedelta(days=2))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # The cancelled request gave its days back, so it cannot be re-approved past the quota
+        for action in ('Approve', 'Reject'):
+            response = self.client.post(f"/api/wfh/{first.data['id']}/action/", {'action': action}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['error'], 'WFH request is already Cancelled')
+        self.assertEqual(WorkFromHome.objects.get(pk=first.data['id']).status, 'Cancelled')
+        usage.refresh_from_db()
+        self.assertEqual(usage.days, 1)
+
+    def test_quota_release_ignores_holiday_changes(self):
+        """Test that cancel/reject give back exactly the days charged at apply time after a holiday is added"""
+        from core.models import WFHMonthlyUsage
+        monday = datetime.date(datetime.date.today().year + 1, 3, 1)
+        monday += datetime.timedelta(days=(7 - monday.weekday()) % 7)
+        tuesday = monday + datetime.timedelta(days=1)
+
+        response = self.client.post('/api/wfh/apply/', {
+            'employeeId': self.employee.employee_id,
+            'fromDate': monday.isoformat(),
+            'toDate': (monday + datetime.timedelta(days=2)).isoformat(),
+            'reason': 'Quota'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        wfh_id = response.data['id']
+        rule = self.client.post('/api/wfh/recurring/apply/', {
+            'employeeId': self.employee.employee_id, 'weekdays': ['Fri'], 'reason': 'Rule',
+            'fromDate': monday.isoformat(), 'toDate': (monday + datetime.timedelta(days=13)).isoformat(),
+        }, format='json')
+        self.assertEqual(rule.status_code, status.HTTP_201_CREATED)
+        usage = WFHMonthlyUsage.objects.get(employee=self.employee, year=monday.year, month=monday.month)
+        self.assertEqual(usage.days, 5)
+
+        Holidays.objects.create(date=tuesday.isoformat(), name='New Holiday', type='National Holiday')
+        Holidays.objects.create(date=(monday + datetime.timedelta(days=4)).isoformat(), name='Friday Off', type='National Holiday')
+
+        response = self.client.post(f"/api/wfh/{wfh_id}/action/", {'action': 'Cancel'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(f"/api/wfh/recurring/{rule.data['id']}/action/", {'action': 'Reject'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        usage.refresh_from_db()
+        self.assertEqual(usage.days, 0)
+        self.assertEqual(WorkFromHome.objects.get(pk=wfh_id).quota_days, {})
+
+    def test_single_requests_on_recurring_days_not_double_counted(self):
+        """Test that a single WFH on a rule day is refused and a leave on one takes that day off the rule's quota"""
+        from core.models import WFHMonthlyUsage
+        monday = datetime.date(datetime.date.today().year + 1, 3, 1)
+        monday += datetime.timedelta(days=(7 - monday.weekday()) % 7)
+        rule = self.client.post('/api/wfh/recurring/apply/', {
+            'employeeId': self.employee.employee_id, 'weekdays': ['Tue', 'Thu'], 'reason': 'Rule',
+            'fromDate': monday.isoformat(), 'toDate': (monday + datetime.timedelta(days=13)).isoformat(),
+        }, format='json')
+        self.assertEqual(rule.status_code, status.HTTP_201_CREATED)
+
+        def apply(day):
+            return self.client.post('/api/wfh/apply/', {
+                'employeeId': self.employee.employee_id, 'fromDate': day.isoformat(), 'toDate': day.isoformat(),
+            })
+
+        response = apply(monday + datetime.timedelta(days=8))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recurring WFH schedule already covers', response.data['error'])
+        self.assertEqual(apply(monday + datetime.timedelta(days=2)).status_code, status.HTTP_201_CREATED)
+        usage = WFHMonthlyUsage.objects.get(employee=self.employee, year=monday.year, month=monday.month)
+        self.assertEqual(usage.days, 5)
+
+        # A rule over the single WFH day is refused as well
+        response = self.client.post('/api/wfh/recurring/apply/', {
+            'employeeId': self.employee.employee_id, 'weekdays': ['Wed'],
+            'fromDate': monday.isoformat(), 'toDate': (monday + datetime.timedelta(days=6)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # The leave wins on a rule day: the rule stops charging it, and charges it again once the leave is cancelled
+        thursday = (monday + datetime.timedelta(days=3)).isoformat()
+        leave = Leaves.objects.create(
+            employee=self.employee, type='cl', days=1, status='Approved', from_date=thursday, to_date=thursday
+        )
+        usage.refresh_from_db()
+        self.assertEqual(usage.days, 4)
+        leave.status = 'Cancelled'
+        leave.save()
+        usage.refresh_from_db()
+        self.assertEqual(usage.days, 5)
+
+    def test_approving_legacy_overlap_returns_conflict(self):
+        """Test that approving a pre-store request overlapping an active one gives a 400 naming the conflict"""
+        # The overlap constraint comes from migration 0027; install it when the test database skipped migrations
+        no_overlap = import_module('core.migrations.0027_unavailability_no_overlap')
+        for sql in {'sqlite': no_overlap.SQLITE_SQL, 'postgresql': no_overlap.POSTGRES_SQL}.get(connection.vendor, []):
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql)
+            except DatabaseError:
+                pass  # already there
+        monday = datetime.date.today() + datetime.timedelta(days=7 - datetime.date.today().weekday())
+        Leaves.objects.create(
+            employee=self.employee, type='cl', from_date=monday.isoformat(), to_date=monday.isoformat(),
+            days=1, status='Approved'
+        )
+        # Legacy rows the 0027 backfill skipped: active but missing from the unavailability store
+        wfh = WorkFromHome.objects.create(
+            employee=self.employee, from_date=monday.isoformat(), to_date=monday.isoformat(), status='Rejected'
+        )
+        leave = Leaves.objects.create(
+            employee=self.employee, type='sl', from_date=monday.isoformat(), to_date=monday.isoformat(),
+            days=1, status='Rejected'
+        )
+        WorkFromHome.objects.filter(pk=wfh.pk).update(status='Pending')
+        Leaves.objects.filter(pk=leave.pk).update(status='Pending')
+
+        response = self.client.post(f'/api/wfh/{wfh.id}/action/', {'action': 'Approve'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f'active Leave request from {monday.isoformat()}', response.data['error'])
+
+        response = self.client.post(f'/api/leaves/{leave.id}/action/', {'action': 'Approve'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Leaves.objects.get(pk=leave.pk).status, 'Pending')
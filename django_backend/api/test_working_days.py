@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+from api.working_days import WorkingDayCalendar, LEAVE_WEEKMASK, REPORT_WEEKMASK, SESSION_1, SESSION_2, normalize_session
+import datetime
+
+
+class WorkingDayCalendarTestCase(SimpleTestCase):
+    """Test cases for the shared working-day calculator"""
+
+    def setUp(self):
+        # 2026-01-26 (Monday) and 2026-02-01 (Sunday) are holidays
+        self.holidays = [datetime.date(2026, 1, 26), datetime.date(2026, 2, 1)]
+        self.leave_calendar = WorkingDayCalendar(self.holidays, LEAVE_WEEKMASK)
+        self.report_calendar = WorkingDayCalendar(self.holidays, REPORT_WEEKMASK)
+
+    def naive_count(self, weekmask, start, end):
+        count = 0
+        d = start
+        while d <= end:
+            if weekmask[d.weekday()] and d not in self.holidays:
+                count += 1
+            d += datetime.timedelta(days=1)
+        return count
+
+    def test_count_matches_day_by_day_walk(self):
+        """Week arithmetic agrees with walking every day, for both weekly-off rules"""
+        base = datetime.date(2026, 1, 1)
+        for start_offset in range(0, 40, 3):
+            for length in range(0, 30, 4):
+                start = base + datetime.timedelta(days=start_offset)
+                end = start + datetime.timedelta(days=length)
+                self.assertEqual(self.leave_calendar.count(start, end), self.naive_count(LEAVE_WEEKMASK, start, end))
+                self.assertEqual(self.report_calendar.count(start, end), self.naive_count(REPORT_WEEKMASK, start, end))
+
+    def test_count_many(self):
+        """Batched counts match single counts and empty ranges count zero"""
+        ranges = [('2026-01-19', '2026-01-31'), ('2026-02-02', '2026-02-01'), ('2026-01-26', '2026-01-26')]
+        self.assertEqual(self.leave_calendar.count_many(ranges), [11, 0, 0])
+
+    def test_half_day_sessions(self):
+        """Starting in Session 2 or ending in Session 1 takes half a day off"""
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-20', '2026-01-20', SESSION_1, SESSION_1), 0.5)
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-20', '2026-01-20', SESSION_1, SESSION_2), 1)
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-20', '2026-01-23', SESSION_2, SESSION_1), 3)
+        # A session on a holiday does not subtract anything extra
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-26', '2026-01-27', SESSION_2), 1)
+
+    def test_mobile_session_spellings(self):
+        """'First Half'/'Second Half' from the mobile app count the same as Session 1/Session 2"""
+        self.assertEqual(normalize_session('First Half'), SESSION_1)
+        self.assertEqual(normalize_session('second half '), SESSION_2)
+        self.assertEqual(normalize_session(None), 'Full Day')
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-20', '2026-01-20', 'First Half', 'First Half'), 0.5)
+        self.assertEqual(self.leave_calendar.leave_days('2026-01-20', '2026-01-23', 'Second Half', 'First Half'), 3)
+        self.assertEqual(
+            self.leave_calendar.leave_days('2026-01-20', '2026-01-23', 'Second Half', 'First Half'),
+            self.leave_calendar.leave_days('2026-01-20', '2026-01-23', SESSION_2, SESSION_1)
+        )
+
+    def test_removed_days_honour_both_session_spellings(self):
+        """Cutting the half-day ends out of a leave credits half a day each, whichever spelling was stored"""
+        from types import SimpleNamespace
+        from api.leave_splits import _removed_days
+        start, end = datetime.date(2026, 1, 20), datetime.date(2026, 1, 23)
+        for from_session, to_session in ((SESSION_2, SESSION_1), ('Second Half', 'First Half')):
+            leave = SimpleNamespace(from_session=from_session, to_session=to_session)
+            self.assertEqual(_removed_days(self.leave_calendar, leave, start, end, {start, end}), 1)
+
+    def test_first_non_working_day(self):
+        """Finds the earliest Sunday or holiday in a range"""
+        self.assertEqual(self.leave_calendar.first_non_working_day('2026-01-19', '2026-01-24'), None)
+        self.assertEqual(self.leave_calendar.first_non_working_day('2026-01-19', '2026-01-30'), datetime.date(2026, 1, 25))
+        self.assertEqual(self.leave_calendar.first_non_working_day('2026-01-26', '2026-01-30'), datetime.date(2026, 1, 26))
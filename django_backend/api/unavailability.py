@@ -0,0 +1,129 @@
+"""
+Employee unavailability store: every Pending/Approved leave and WFH request is
+mirrored into EmployeeUnavailability as a real date range. The database rejects
+overlapping ranges for the same employee, so overlap checks are a single indexed
+probe and concurrent duplicate submissions fail with an IntegrityError.
+"""
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Q
+from core.models import EmployeeUnavailability, Leaves
+
+ACTIVE_STATUSES = ('Pending', 'Approved')
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def find_overlap(employee, start_date, end_date, exclude=None):
+    """Returns the earliest active range overlapping [start_date, end_date], or None."""
+    qs = EmployeeUnavailability.objects.filter(
+        employee=employee,
+        start_date__lte=end_date,
+        end_date__gte=start_date
+    )
+    if exclude is not None:
+        qs = qs.exclude(pk=exclude.pk)
+    return qs.order_by('start_date').first()
+
+
+def overlap_error(obj):
+    """
+    Error message for an IntegrityError raised while syncing a leave/WFH request:
+    names the active range it collides with. Requests that overlapped before the
+    store existed were left out of it by migration 0027 and hit this when saved.
+    """
+    start_date, end_date = _parse(obj.from_date), _parse(obj.to_date)
+    conflict = None
+    if start_date is not None and end_date is not None:
+        conflict = EmployeeUnavailability.objects.filter(
+            employee_id=obj.employee.pk, start_date__lte=end_date, end_date__gte=start_date
+        ).exclude(Q(leave_id=obj.pk) if isinstance(obj, Leaves) else Q(wfh_id=obj.pk)).order_by('start_date').first()
+    if conflict is None:
+        return 'This request overlaps another active leave or WFH request.'
+    return (
+        f"This request overlaps an active {conflict.kind} request from {conflict.start_date} "
+        f"to {conflict.end_date}. Cancel or reject that request first."
+    )
+
+
+def notify_changed(employee_pks):
+    """Invalidates cached views of these employees' leave/WFH once the transaction commits."""
+    from .team_calendar import invalidate_team_calendars
+    from .occupancy import invalidate_occupancy
+    employee_pks = set(employee_pks)
+    if employee_pks:
+        transaction.on_commit(lambda: invalidate_team_calendars(employee_pks))
+        transaction.on_commit(invalidate_occupancy)
+
+
+def _sync(kind, field, obj):
+    notify_changed([obj.employee.pk])
+    existing = EmployeeUnavailability.objects.filter(**{field: obj}).first()
+    old_range = (existing.start_date, existing.end_date) if existing else None
+
+    new_range = None
+    if obj.status in ACTIVE_STATUSES:
+        start_date, end_date = _parse(obj.from_date), _parse(obj.to_date)
+        if start_date is not None and end_date is not None and end_date >= start_date:
+            new_range = (start_date, end_date)
+
+    row = None
+    if new_range is None:
+        if existing:
+            existing.delete()
+    elif existing:
+        if old_range != new_range:
+            existing.start_date, existing.end_date = new_range
+            existing.save(update_fields=['start_date', 'end_date'])
+        row = existing
+    else:
+        row = EmployeeUnavailability.objects.create(
+            **{field: obj},
+            employee_id=obj.employee.pk,
+            kind=kind,
+            start_date=new_range[0],
+            end_date=new_range[1]
+        )
+
+    # WFH days count towards the monthly quota while the request is active
+    if kind == EmployeeUnavailability.WFH and old_range != new_range:
+        from .wfh_quota import move_usage
+        move_usage(obj, obj.employee.pk, new_range)
+    # Recurring WFH days on a leave are not WFH (the leave wins), so the rules there are recounted
+    if kind == EmployeeUnavailability.LEAVE and old_range != new_range:
+        from .wfh_quota import recharge_rules
+        recharge_rules(obj.employee.pk, obj.employee.employee_id, [old_range, new_range])
+    return row
+
+
+def sync_leave(leave):
+    """Mirrors a leave request into the store. Raises IntegrityError on overlap."""
+    return _sync(EmployeeUnavailability.LEAVE, 'leave', leave)
+
+
+def sync_wfh(wfh):
+    """Mirrors a WFH request into the store. Raises IntegrityError on overlap."""
+    return _sync(EmployeeUnavailability.WFH, 'wfh', wfh)
+
+
+def release(leave_ids=(), wfh_ids=()):
+    """
+    Drops the ranges of requests moved out of Pending/Approved with a queryset
+    update (which does not fire post_save).
+    """
+    from .wfh_quota import move_usage, recharge_rules
+    rows = EmployeeUnavailability.objects.filter(Q(leave_id__in=leave_ids) | Q(wfh_id__in=wfh_ids))
+    notify_changed(rows.values_list('employee_id', flat=True))
+    for row in rows.filter(kind=EmployeeUnavailability.WFH).select_related('wfh'):
+        move_usage(row.wfh, row.employee_id, None)
+    leaves = list(rows.filter(kind=EmployeeUnavailability.LEAVE).values_list(
+        'employee_id', 'employee__employee_id', 'start_date', 'end_date'
+    ))
+    rows.delete()
+    for employee_pk, employee_id, start_date, end_date in leaves:
+        recharge_rules(employee_pk, employee_id, [(start_date, end_date)])
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.http import HttpResponse
-from . import views, team_views, leave_views, attendance_views, feed_views, wfh_views
+from . import views, team_views, leave_views, attendance_views, feed_views, wfh_views, approval_views
 
 urlpatterns = [
     # Critical email actions
@@ -12,6 +12,7 @@ urlpatterns = [
     path('auth/send-otp/', views.send_otp, name='send_otp'),
     path('auth/verify-otp/', views.verify_otp, name='verify_otp'),
     path('auth/send-email-otp/', views.send_email_otp, name='send_email_otp'),
+    path('auth/otp-delivery/<str:delivery_id>/', views.otp_delivery_status, name='otp_delivery_status'),
     path('auth/verify-email-otp/', views.verify_email_otp, name='verify_email_otp'),
     path('auth/update-status/', views.update_account_status, name='update_account_status'),
     path('auth/profile/<str:employee_id>/', views.get_profile, name='get_profile'),
@@ -19,6 +20,8 @@ urlpatterns = [
     # Team
     path('team/', team_views.team_list, name='team-list'),
     path('team/<int:pk>/', team_views.team_detail, name='team-detail'),
+    path('team/<int:pk>/calendar/', team_views.team_calendar, name='team-calendar'),
+    path('occupancy/', team_views.occupancy_forecast, name='occupancy-forecast'),
     path('team/members/', team_views.member_list, name='member-list'),
     path('team/members/<str:pk>/', team_views.member_detail, name='member-detail'),
     path('team/registry/', team_views.registry_list, name='registry-list'),
@@ -30,6 +33,7 @@ urlpatterns = [
     path('leaves/apply/', leave_views.apply_leave, name='apply-leave'),
     path('leaves/pending/', leave_views.get_pending_leaves, name='get-pending-leaves'),
     path('leaves/balance/<str:employee_id>/', leave_views.get_leave_balance, name='get-leave-balance'),
+    path('leaves/reports/liability/', leave_views.leave_liability_report, name='leave-liability-report'),
     path('leaves/<str:employee_id>/', leave_views.get_leaves, name='get-leaves'),
     path('leaves/<int:request_id>/action/', leave_views.leave_action, name='leave-action'),
     path('leaves/email-action/<int:request_id>/<str:action>/', leave_views.email_leave_action, name='email-leave-action'),
@@ -63,7 +67,19 @@ urlpatterns = [
     path('wfh/pending/', wfh_views.get_pending_wfh, name='get-pending-wfh'),
     path('wfh/requests/<str:employee_id>/', wfh_views.get_wfh_requests, name='get-wfh-requests'),
     path('wfh/<int:request_id>/action/', wfh_views.wfh_action, name='wfh-action'),
+    path('wfh/quota/<str:employee_id>/', wfh_views.get_wfh_quota, name='get-wfh-quota'),
+    path('wfh/recurring/apply/', wfh_views.apply_recurring_wfh, name='apply-recurring-wfh'),
+    path('wfh/recurring/pending/', wfh_views.get_pending_recurring_wfh, name='get-pending-recurring-wfh'),
+    path('wfh/recurring/<int:rule_id>/action/', wfh_views.recurring_wfh_action, name='recurring-wfh-action'),
+    path('wfh/recurring/<str:employee_id>/', wfh_views.get_recurring_wfh, name='get-recurring-wfh'),
     path('wfh/email-action/<int:request_id>/<str:action>/', wfh_views.email_wfh_action, name='email-wfh-action'),
+
+    # Approvals
+    path('approvals/bulk-action/', approval_views.bulk_action, name='approval-bulk-action'),
+    path('approvals/<str:kind>/', approval_views.approval_list, name='approval-list'),
+
     path('support/submit/', views.submit_support_query, name='submit-support-query'),
+    path('notifications/outbox/metrics/', views.notification_outbox_metrics, name='notification-outbox-metrics'),
+    path('gateways/metrics/', views.http_gateway_metrics, name='http-gateway-metrics'),
     path('api-ping/', lambda r: HttpResponse('api-pong')),
 ]
@@ -3,6 +3,8 @@ import requests
 import json
 
 from django.conf import settings
+from . import http_gateways
+from .http_gateways import EMAIL, PERISKOPE
 
 def normalize_phone(phone_str):
     if not phone_str:
@@ -16,15 +18,17 @@ def normalize_phone(phone_str):
 
 
 def send_email_via_api(to_email, subject, body, cc_emails=None):
+    """to_email is one address or a list; a list goes out as a single email to all of them."""
     url = settings.EMAIL_API_URL
     
     if cc_emails is None:
         cc_emails = []
     
+    to_emails = [to_email] if isinstance(to_email, str) or to_email is None else list(to_email)
     payload = {
         "subject": subject,
         "msgbody": body,
-        "to_emails": [to_email.strip() if to_email else ""],
+        "to_emails": [e.strip() if e else "" for e in to_emails],
         "cc_emails": cc_emails
     }
     
@@ -33,7 +37,7 @@ def send_email_via_api(to_email, subject, body, cc_emails=None):
     }
     
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=10)
+        response = http_gateways.post(EMAIL, url, headers=headers, data=json.dumps(payload))
         response.raise_for_status()
         return True, response.json()
     except requests.exceptions.RequestException as e:
@@ -70,7 +74,7 @@ def create_whatsapp_group(group_name, participants):
     print(f"Request Payload: {json.dumps(payload)}")
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = http_gateways.post(PERISKOPE, url, headers=headers, json=payload)
         
         print(f"Response Status: {response.status_code}")
         print(f"Body: {response.text}")
@@ -129,7 +133,7 @@ def add_whatsapp_participant(chat_id, phone_number):
     try:
         print(f"Request URL: {url}")
         print(f"Request Payload: {json.dumps(payload)}")
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = http_gateways.post(PERISKOPE, url, headers=headers, json=payload)
         
         print(f"Response Status: {response.status_code}")
         print(f"Response Body: {response.text}")
@@ -174,7 +178,7 @@ def remove_whatsapp_participant(chat_id, phone_number):
     try:
         print(f"Request URL: {url}")
         print(f"Request Payload: {json.dumps(payload)}")
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = http_gateways.post(PERISKOPE, url, headers=headers, json=payload)
         
         print(f"Response Status: {response.status_code}")
         print(f"Response Body: {response.text}")
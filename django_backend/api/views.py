@@ -1,19 +1,23 @@
 import re
 import traceback
 import os
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status
-from core.models import Employees, Teams
-import random
-import requests
-from .models import OTPStore
-from django.utils import timezone
-from .utils import is_employee_admin, send_email_via_api
-import threading
+from core.models import Employees
+from .otp import issue_otp, verify_otp_code, PHONE, EMAIL
+from .ratelimit import check_rate_limit
+from .otp_delivery import new_delivery_id, queue_otp, delivery_status, WHATSAPP, EMAIL as EMAIL_CHANNEL
+from .utils import is_employee_admin
+from .outbox import queue_email, outbox_metrics
+from .emails import render_email
+from .http_gateways import gateway_metrics
+from .profile_payload import get_profile_payload
+from .session_tokens import issue_session_token, resolve_employee, SessionIdentity
+from django.db import transaction
 from django.db.models import Q
-from core.models import Employees, Teams, SupportQuery
+from core.models import SupportQuery
 
 @api_view(['POST'])
 def submit_support_query(request):
@@ -28,17 +32,16 @@ def submit_support_query(request):
         if not all([first_name, last_name, email, phone, message]):
             return Response({'error': 'All fields are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save to database
-        query = SupportQuery.objects.create(
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            phone=phone,
-            message=message
-        )
-
-        # Notify admins in background
-        threading.Thread(target=notify_admins_of_support_query, args=(query.id,)).start()
+        # Save to database, with the admin notifications queued in the same transaction
+        with transaction.atomic():
+            query = SupportQuery.objects.create(
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                phone=phone,
+                message=message
+            )
+            notify_admins_of_support_query(query.id)
 
         return Response({'message': 'Your message has been received. We will get back to you soon.', 'id': query.id}, status=status.HTTP_201_CREATED)
     except Exception as e:
@@ -64,61 +67,38 @@ def notify_admins_of_support_query(query_id):
 
         subject = f"New Support Message - {query.first_name} {query.last_name}"
         
-        body = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-</head>
-<body style="margin: 0; padding: 20px; font-family: Arial, sans-serif; background-color: #f5f5f5;">
-    <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden; border: 1px solid #e2e8f0;">
-        <tr>
-            <td style="background-color: #1e293b; padding: 30px; text-align: center;">
-                <h1 style="color: #ffffff; margin: 0; font-size: 24px;">New Support Inquiry</h1>
-            </td>
-        </tr>
-        <tr>
-            <td style="padding: 30px;">
-                <p style="font-size: 16px; color: #333333; margin: 0 0 20px 0;">Hello Admin,</p>
-                <p style="font-size: 15px; color: #333333; margin: 0 0 25px 0;">
-                    A new message has been received through the portal support form.
-                </p>
-                
-                <table width="100%" cellpadding="12" cellspacing="0" style="background-color: #f8f9fa; border-radius: 8px; margin: 20px 0; border: 1px solid #edf2f7;">
-                    <tr>
-                        <td style="color: #64748b; font-size: 13px; font-weight: bold; width: 120px;">NAME:</td>
-                        <td style="color: #1e293b; font-size: 14px; font-weight: bold;">{query.first_name} {query.last_name}</td>
-                    </tr>
-                    <tr>
-                        <td style="color: #64748b; font-size: 13px; font-weight: bold;">EMAIL:</td>
-                        <td style="color: #1e293b; font-size: 14px; font-weight: bold;">{query.email}</td>
-                    </tr>
-                    <tr>
-                        <td style="color: #64748b; font-size: 13px; font-weight: bold;">PHONE:</td>
-                        <td style="color: #1e293b; font-size: 14px; font-weight: bold;">{query.phone}</td>
-                    </tr>
-                    <tr>
-                        <td style="color: #64748b; font-size: 13px; font-weight: bold; vertical-align: top;">MESSAGE:</td>
-                        <td style="color: #1e293b; font-size: 14px; line-height: 1.5;">{query.message}</td>
-                    </tr>
-                </table>
-                
-                <p style="font-size: 12px; color: #94a3b8; text-align: center; margin: 30px 0 0 0; padding-top: 20px; border-top: 1px solid #edf2f7;">
-                    This is an automated alert from the Markwave HR Portal.
-                </p>
-            </td>
-        </tr>
-    </table>
-</body>
-</html>"""
-
-        for recipient in recipient_emails:
-            send_email_via_api(recipient, subject, body)
-            print(f"DEBUG: Sent support query notification to {recipient}")
+        body = render_email(
+            'emails/support_query.html',
+            title='New Support Inquiry',
+            header_color='#1e293b',
+            rows=[
+                ('Name', f"{query.first_name} {query.last_name}"),
+                ('Email', query.email),
+                ('Phone', query.phone),
+                ('Message', query.message),
+            ],
+        )
+
+        queue_email(recipient_emails, subject, body)
+        print(f"DEBUG: Queued support query notification to {', '.join(recipient_emails)}")
 
     except Exception as e:
         print(f"ERROR in notify_admins_of_support_query: {str(e)}")
 
+@api_view(['GET'])
+def notification_outbox_metrics(request):
+    """Outbox queue depth and delivery latency, for admins signed in with a session token."""
+    if not (isinstance(request.user, SessionIdentity) and request.user.is_admin):
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(outbox_metrics())
+
+@api_view(['GET'])
+def http_gateway_metrics(request):
+    """Latency histograms for the email, WhatsApp and geocoding gateways since this process started."""
+    if not (isinstance(request.user, SessionIdentity) and request.user.is_admin):
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(gateway_metrics())
+
 def normalize_phone(phone_str):
     if not phone_str:
         return ""
@@ -129,7 +109,15 @@ def normalize_phone(phone_str):
         return digits[1:]
     return digits
 
+def signed_in_response(user, employee=None):
+    """
+    Sign-in response: the user payload plus a signed session token (see session_tokens.py).
+    Pass the Employees row for real sign-ins; the demo/admin placeholders have none.
+    """
+    return Response({'success': True, 'user': user, 'token': issue_session_token(user, employee)})
+
 @api_view(['POST'])
+@authentication_classes([])
 def login(request):
     """
     Login with email and password.
@@ -140,9 +128,6 @@ def login(request):
 
     # Static bypass for testing
     if email == 'demo@gmail.com' and password == 'Demo@123':
-        from core.models import Teams
-        from django.db.models import Q
-
         # Check if demo user exists, otherwise create
         emp = Employees.objects.filter(email__iexact=email).first()
         if not emp:
@@ -161,48 +146,14 @@ def login(request):
         if emp.status == 'Inactive':
             return Response({'error': 'Your account is inactive. Please contact HR.'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Get session info like in verify_email_otp
-        managers = Employees.objects.filter(Q(role='Manager') | Q(role='Project Manager') | Q(role='Administrator') | Q(role='Admin'))
-        manager_names = ", ".join([f"{m.first_name} {m.last_name or ''}".strip() for m in managers])
-        advisor = Employees.objects.filter(role='Advisor-Technology & Operations').first()
-
-        return Response({
-            'success': True,
-            'user': {
-                'id': emp.id,
-                'employee_id': emp.employee_id,
-                'first_name': emp.first_name,
-                'last_name': emp.last_name,
-                'email': emp.email,
-                'contact': emp.contact,
-                'location': emp.location,
-                'role': emp.role,
-                'team_id': emp.teams.first().id if emp.teams.exists() else None,
-                'team_ids': ",".join([str(t.id) for t in emp.teams.all()]),
-                'team_name': ", ".join([t.name for t in emp.teams.all()]) or "Testing Team",
-                'teams': [{'id': t.id, 'name': t.name, 'manager_name': f"{t.manager.first_name} {t.manager.last_name or ''}".strip() if t.manager else None} for t in (list(emp.teams.all()) + list(Teams.objects.filter(manager=emp)))],
-                'team_lead_name': ", ".join(sorted(list(set([
-                    f"{m.first_name} {m.last_name or ''}".strip()
-                    for t in emp.teams.all()
-                    for m in t.members.filter(status='Active').filter(
-                        Q(role__icontains='Lead') | Q(role__icontains='Manager') | 
-                        Q(role__icontains='Admin') | Q(role__icontains='Founder') | 
-                        Q(role__icontains='Advisor')
-                    )
-                ] + ([f"{t.manager.first_name} {t.manager.last_name or ''}".strip() for t in emp.teams.all() if t.manager] if any(t.manager for t in emp.teams.all()) else []))))) or None,
-                'is_manager': Teams.objects.filter(manager=emp).exists(),
-                'is_admin': is_employee_admin(emp),
-                'project_manager_name': manager_names,
-                'advisor_name': f"{advisor.first_name} {advisor.last_name or ''}".strip() if advisor else None,
-                'profile_picture': request.build_absolute_uri(emp.profile_picture.url).replace('http://', 'https://') if emp.profile_picture and request.is_secure() else (request.build_absolute_uri(emp.profile_picture.url) if emp.profile_picture else None)
-            }
-        })
+        return signed_in_response(get_profile_payload(emp, request, team_name_default="Testing Team"), emp)
 
     return Response({
         'error': 'Static password login is disabled. Please use Phone or Email OTP to sign in.'
     }, status=status.HTTP_403_FORBIDDEN)
 
 @api_view(['POST'])
+@authentication_classes([])
 def send_otp(request):
     try:
         print("====== OTP DEBUG START ======")
@@ -222,6 +173,10 @@ def send_otp(request):
         
         target_phone = normalized_input if phone != 'admin' else 'admin'
 
+        limited = check_rate_limit(request, 'otp_send', target_phone)
+        if limited:
+            return limited
+
         purpose = request.data.get('purpose', 'login')
         acting_user_id = request.data.get('acting_user_id')
         delivery_phone = normalized_input # Default delivery to the user themselves
@@ -278,26 +233,12 @@ def send_otp(request):
             if purpose == 'activate' and target_emp and target_emp.status == 'Active':
                 return Response({'error': 'Your account is already active.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        otp = str(random.randint(100000, 999999))
-        print(f"[OTP DEBUG] Generated OTP: {otp} for key: {target_phone} (Delivery to: {delivery_phone})")
-        
-        OTPStore.objects.create(phone=target_phone, otp=otp, created_at=timezone.now())
+        delivery_id = new_delivery_id()
+        otp = issue_otp(PHONE, target_phone, delivery_id=delivery_id)
+        print(f"[OTP DEBUG] Generated OTP for key: {target_phone} (Delivery to: {delivery_phone})")
 
         whatsapp_recipient = f"91{delivery_phone}@c.us" if phone != 'admin' else f"{settings.ADMIN_WHATSAPP_NUMBER}@c.us"
         print(f"[OTP DEBUG] Final WhatsApp Recipient: {whatsapp_recipient}")
-        
-        # WhatsApp integration
-        headers = {
-            "Authorization": f"Bearer {settings.PERISKOPE_API_KEY}",
-            "Content-Type": "application/json",
-            "x-phone": settings.PERISKOPE_SENDER_PHONE
-        }
-        # Using the exact same message format that works for login to avoid carrier/API filtering
-        payload = {
-            "chat_id": whatsapp_recipient,
-            "type": "text",
-            "message": f"Your MarkwaveHR login OTP is: {otp}"
-        }
 
         # OTP_DEBUG MODE: Skip WhatsApp in development
         otp_debug_mode = os.getenv('OTP_DEBUG', 'False') == 'True'
@@ -305,20 +246,11 @@ def send_otp(request):
             print(f"[OTP DEBUG] ⚠️ OTP_DEBUG MODE: Skipping WhatsApp send")
             print(f"[OTP DEBUG] ✅ OTP for {phone}: {otp}")
             return Response({'success': True, 'message': f"OTP: {otp} (DEBUG)"})
-        
-        print(f"[OTP DEBUG] Calling Periskope API for {whatsapp_recipient}...")
-        try:
-            response = requests.post(settings.PERISKOPE_URL, headers=headers, json=payload, timeout=30)
-            print(f"[OTP DEBUG] Periskope Status: {response.status_code}")
-            print(f"[OTP DEBUG] Periskope Body: {response.text}")
-            
-            if response.status_code in [200, 201]:
-                return Response({'success': True, 'message': 'OTP sent successfully to WhatsApp'})
-                
-            return Response({'error': f'Failed to send OTP: {response.text}'}, status=500)
-        except Exception as e:
-            print(f"[OTP DEBUG] Exception sending OTP request: {str(e)}")
-            return Response({'error': f'WhatsApp connection error: {str(e)}'}, status=500)
+
+        # Delivered by the background queue; the app can poll auth/otp-delivery/<delivery_id>/
+        # Using the exact same message format that works for login to avoid carrier/API filtering
+        queue_otp(PHONE, delivery_id, WHATSAPP, whatsapp_recipient, f"Your MarkwaveHR login OTP is: {otp}")
+        return Response({'success': True, 'message': 'OTP is being sent to WhatsApp', 'delivery_id': delivery_id})
 
     except Exception as e:
         import traceback
@@ -330,6 +262,7 @@ def send_otp(request):
         return Response({'error': f"Internal Server Error: {error_msg}"}, status=500)
 
 @api_view(['POST'])
+@authentication_classes([])
 def verify_otp(request):
     phone = request.data.get('phone')
     otp = request.data.get('otp')
@@ -340,30 +273,26 @@ def verify_otp(request):
     normalized_input = normalize_phone(phone)
     target_phone = normalized_input if phone != 'admin' else 'admin'
 
+    limited = check_rate_limit(request, 'otp_verify', target_phone)
+    if limited:
+        return limited
+
     try:
-        otp_entry = OTPStore.objects.filter(phone=target_phone, is_verified=False).order_by('-created_at').first()
-        if not otp_entry or otp_entry.otp != otp:
-            return Response({'error': 'Invalid OTP'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        otp_entry.is_verified = True
-        otp_entry.verified_at = timezone.now()
-        otp_entry.save()
+        if not verify_otp_code(PHONE, target_phone, otp):
+            return Response({'error': 'Invalid or expired OTP'}, status=status.HTTP_401_UNAUTHORIZED)
 
         if phone == 'admin':
-            return Response({
-                'success': True,
-                'user': {
-                    'id': '0',
-                    'employee_id': 'MW-ADMIN',
-                    'first_name': 'Admin',
-                    'last_name': 'User',
-                    'email': 'admin@markwave.com',
-                    'role': 'Administrator',
-                    'team_id': None,
-                    'team_lead_name': 'Management',
-                    'is_manager': True,
-                    'is_admin': True
-                }
+            return signed_in_response({
+                'id': '0',
+                'employee_id': 'MW-ADMIN',
+                'first_name': 'Admin',
+                'last_name': 'User',
+                'email': 'admin@markwave.com',
+                'role': 'Administrator',
+                'team_id': None,
+                'team_lead_name': 'Management',
+                'is_manager': True,
+                'is_admin': True
             })
 
         for emp in Employees.objects.all():
@@ -371,46 +300,7 @@ def verify_otp(request):
                 if emp.status == 'Inactive':
                     return Response({'error': 'Your account is inactive. Please contact HR.'}, status=status.HTTP_403_FORBIDDEN)
 
-                # Fetch dynamic managers
-                from django.db.models import Q
-                managers = Employees.objects.filter(Q(role='Manager') | Q(role='Project Manager'))
-                manager_names = ", ".join([f"{m.first_name} {m.last_name or ''}".strip() for m in managers])
-                advisor = Employees.objects.filter(role='Advisor-Technology & Operations').first()
-
-                return Response({
-                    'success': True,
-                    'user': {
-                        'id': emp.id,
-                        'employee_id': emp.employee_id,
-                        'first_name': emp.first_name,
-                        'last_name': emp.last_name,
-                        'email': emp.email,
-                        'contact': emp.contact,
-                        'location': emp.location,
-                        'aadhar': emp.aadhar,
-                        'qualification': emp.qualification,
-                        'joining_date': emp.joining_date,
-                        'role': emp.role,
-                        'team_id': emp.teams.first().id if emp.teams.exists() else None,
-                        'team_ids': ",".join([str(t.id) for t in emp.teams.all()]),
-                        'team_name': ", ".join([t.name for t in emp.teams.all()]) or None,
-                        'teams': [{'id': t.id, 'name': t.name, 'manager_name': f"{t.manager.first_name} {t.manager.last_name or ''}".strip() if t.manager else None} for t in (list(emp.teams.all()) + list(Teams.objects.filter(manager=emp)))],
-                        'team_lead_name': ", ".join(sorted(list(set([
-                            f"{m.first_name} {m.last_name or ''}".strip()
-                            for t in emp.teams.all()
-                            for m in t.members.filter(status='Active').filter(
-                                Q(role__icontains='Lead') | Q(role__icontains='Manager') | 
-                                Q(role__icontains='Admin') | Q(role__icontains='Founder') | 
-                                Q(role__icontains='Advisor')
-                            )
-                        ] + ([f"{t.manager.first_name} {t.manager.last_name or ''}".strip() for t in emp.teams.all() if t.manager] if any(t.manager for t in emp.teams.all()) else []))))) or None,
-                        'is_manager': Teams.objects.filter(manager=emp).exists(),
-                        'is_admin': is_employee_admin(emp),
-                        'project_manager_name': manager_names,
-                        'advisor_name': f"{advisor.first_name} {advisor.last_name or ''}".strip() if advisor else None,
-                        'profile_picture': request.build_absolute_uri(emp.profile_picture.url).replace('http://', 'https://') if emp.profile_picture and request.is_secure() else (request.build_absolute_uri(emp.profile_picture.url) if emp.profile_picture else None)
-                    }
-                })
+                return signed_in_response(get_profile_payload(emp, request, manager_roles=('Manager', 'Project Manager')), emp)
         return Response({'error': 'User not found'}, status=404)
     except Exception as e:
         error_msg = str(e)
@@ -433,77 +323,30 @@ def get_profile(request, employee_id):
         })
     try:
         # 1. Try exact employee_id match first (preferred)
-        emp = Employees.objects.filter(employee_id=employee_id).first()
-        
-        # 2. Fallback to Primary Key if not found as employee_id and is numeric
-        if not emp and str(employee_id).isdigit():
-            emp = Employees.objects.filter(id=employee_id).first()
+        emp = resolve_employee(request, employee_id)
             
         if not emp:
             return Response({'error': 'User not found'}, status=404)
             
-        # Fetch dynamic managers
-        from django.db.models import Q
-        managers = Employees.objects.filter(Q(role='Manager') | Q(role='Project Manager') | Q(role='Administrator') | Q(role='Admin'))
-        manager_names = ", ".join([f"{m.first_name} {m.last_name or ''}".strip() for m in managers])
-        advisor = Employees.objects.filter(role='Advisor-Technology & Operations').first()
-        
-        return Response({
-            'id': emp.id,
-            'employee_id': emp.employee_id,
-            'first_name': emp.first_name,
-            'last_name': emp.last_name,
-            'role': emp.role,
-            'email': emp.email,
-            'contact': emp.contact,
-            'location': emp.location,
-            'aadhar': emp.aadhar,
-            'qualification': emp.qualification,
-            'joining_date': emp.joining_date,
-            'team_id': emp.teams.first().id if emp.teams.exists() else None,
-            'team_ids': ",".join([str(t.id) for t in emp.teams.all()]),
-            'team_name': ", ".join([t.name for t in emp.teams.all()]) or None,
-            'teams': [{'id': t.id, 'name': t.name, 'manager_name': f"{t.manager.first_name} {t.manager.last_name or ''}".strip() if t.manager else None} for t in (list(emp.teams.all()) + list(Teams.objects.filter(manager=emp)))],
-            'team_leads': sorted(list(set([
-                f"{m.first_name} {m.last_name or ''}".strip()
-                for t in emp.teams.all()
-                for m in t.members.filter(status='Active').filter(
-                    Q(role__icontains='Lead') | Q(role__icontains='Manager') | 
-                    Q(role__icontains='Admin') | Q(role__icontains='Founder') | 
-                    Q(role__icontains='Advisor')
-                )
-            ] + ([f"{t.manager.first_name} {t.manager.last_name or ''}".strip() for t in emp.teams.all() if t.manager] if any(t.manager for t in emp.teams.all()) else [])))),
-            'team_lead_name': ", ".join(sorted(list(set([
-                f"{m.first_name} {m.last_name or ''}".strip()
-                for t in emp.teams.all()
-                for m in t.members.filter(status='Active').filter(
-                    Q(role__icontains='Lead') | Q(role__icontains='Manager') | 
-                    Q(role__icontains='Admin') | Q(role__icontains='Founder') | 
-                    Q(role__icontains='Advisor')
-                )
-            ] + ([f"{t.manager.first_name} {t.manager.last_name or ''}".strip() for t in emp.teams.all() if t.manager] if any(t.manager for t in emp.teams.all()) else []))))) or None,
-            'is_manager': Teams.objects.filter(manager=emp).exists(),
-            'is_admin': is_employee_admin(emp),
-            'project_manager_name': manager_names,
-            'advisor_name': f"{advisor.first_name} {advisor.last_name or ''}".strip() if advisor else None,
-            'profile_picture': request.build_absolute_uri(emp.profile_picture.url).replace('http://', 'https://') if emp.profile_picture and request.is_secure() else (request.build_absolute_uri(emp.profile_picture.url) if emp.profile_picture else None)
-        })
+        return Response(get_profile_payload(emp, request))
     except Exception as e:
         error_msg = str(e)
         if "too many clients" in error_msg or "connection to server" in error_msg:
             return Response({'error': 'Database connection limit reached. Please try again in a moment.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response({'error': error_msg}, status=500)
 
-from .utils import send_email_via_api
-from .models import EmailOTPStore
-
 @api_view(['POST'])
+@authentication_classes([])
 def send_email_otp(request):
     try:
         email = request.data.get('email')
         if not email:
             return Response({'error': 'Email is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+        limited = check_rate_limit(request, 'otp_send', email)
+        if limited:
+            return limited
+
         if email.lower() == 'demo@gmail.com':
             return Response({'success': True, 'message': 'OTP sent successfully to email (DEMO MODE: use 123456)'})
 
@@ -530,26 +373,30 @@ def send_email_otp(request):
             if inactive_check:
                 return Response({'error': 'Your account is inactive. Please contact HR.'}, status=status.HTTP_403_FORBIDDEN)
 
-        otp = str(random.randint(100000, 999999))
-        # Use EmailOTPStore for email OTPs
-        EmailOTPStore.objects.create(email=email, otp=otp, created_at=timezone.now())
+        delivery_id = new_delivery_id()
+        otp = issue_otp(EMAIL, email, delivery_id=delivery_id)
 
         subject = "MarkwaveHR Login OTP"
         body = f"<h1>Your MarkwaveHR login OTP is: {otp}</h1>"
-        
-        success, result = send_email_via_api(email, subject, body)
-        
-        if success:
-            return Response({'success': True, 'message': 'OTP sent successfully to email'})
-        else:
-            return Response({'error': f'Failed to send email: {result}'}, status=500)
+        queue_otp(EMAIL, delivery_id, EMAIL_CHANNEL, email, body, subject=subject)
+        return Response({'success': True, 'message': 'OTP is being sent to email', 'delivery_id': delivery_id})
     except Exception as e:
         error_msg = str(e)
         if "too many clients" in error_msg or "connection to server" in error_msg:
             return Response({'error': 'Database connection limit reached. Please try again in a moment.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response({'error': f'Internal Server Error: {error_msg}'}, status=500)
 
+@api_view(['GET'])
+@authentication_classes([])
+def otp_delivery_status(request, delivery_id):
+    """Delivery progress of a code sent by send_otp / send_email_otp."""
+    result = delivery_status(delivery_id)
+    if not result:
+        return Response({'error': 'Delivery not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(result)
+
 @api_view(['POST'])
+@authentication_classes([])
 def verify_email_otp(request):
     email = request.data.get('email')
     otp = request.data.get('otp')
@@ -557,62 +404,53 @@ def verify_email_otp(request):
     if not email or not otp:
         return Response({'error': 'Email and OTP are required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    limited = check_rate_limit(request, 'otp_verify', email)
+    if limited:
+        return limited
+
     try:
         if email.lower() == 'demo@gmail.com' and otp == '123456':
             # Static bypass for demo user
-            return Response({
-                'success': True,
-                'user': {
-                    'id': 999,
-                    'employee_id': 'MW-DEMO',
-                    'first_name': 'Demo',
-                    'last_name': 'User',
-                    'email': 'demo@gmail.com',
-                    'contact': '0000000000',
-                    'location': 'Testing Lab',
-                    'role': 'Tester',
-                    'team_id': 1,
-                    'team_ids': "1",
-                    'team_name': "Testing Team",
-                    'teams': [{'id': 1, 'name': 'Testing Team', 'manager_name': 'Test Manager'}],
-                    'team_lead_name': "Test Manager",
-                    'is_manager': False,
-                    'is_admin': False,
-                    'project_manager_name': "Demo PM",
-                    'advisor_name': "Demo Advisor"
-                }
+            return signed_in_response({
+                'id': 999,
+                'employee_id': 'MW-DEMO',
+                'first_name': 'Demo',
+                'last_name': 'User',
+                'email': 'demo@gmail.com',
+                'contact': '0000000000',
+                'location': 'Testing Lab',
+                'role': 'Tester',
+                'team_id': 1,
+                'team_ids': "1",
+                'team_name': "Testing Team",
+                'teams': [{'id': 1, 'name': 'Testing Team', 'manager_name': 'Test Manager'}],
+                'team_lead_name': "Test Manager",
+                'is_manager': False,
+                'is_admin': False,
+                'project_manager_name': "Demo PM",
+                'advisor_name': "Demo Advisor"
             })
 
         # Retrieve the latest unverified OTP for this email
         try:
-            otp_entry = EmailOTPStore.objects.filter(email=email, is_verified=False).order_by('-created_at').first()
-            
-            if not otp_entry or otp_entry.otp != otp:
-                 return Response({'error': 'Invalid OTP'}, status=status.HTTP_401_UNAUTHORIZED)
-            
-            # Verify OTP
-            otp_entry.is_verified = True
-            otp_entry.verified_at = timezone.now()
-            otp_entry.save()
+            if not verify_otp_code(EMAIL, email, otp):
+                return Response({'error': 'Invalid or expired OTP'}, status=status.HTTP_401_UNAUTHORIZED)
         except Exception:
             # If DB is down, only the demo bypass works (handled above)
             return Response({'error': 'Verification system unavailable'}, status=503)
 
         # Return user details
         if email == 'admin@markwave.com':
-            return Response({
-                'success': True,
-                'user': {
-                    'id': '0',
-                    'employee_id': 'MW-ADMIN',
-                    'first_name': 'Admin',
-                    'last_name': 'User',
-                    'email': 'admin@markwave.com',
-                    'role': 'Administrator',
-                    'team_id': None,
-                    'team_lead_name': 'Management',
-                    'is_manager': True
-                }
+            return signed_in_response({
+                'id': '0',
+                'employee_id': 'MW-ADMIN',
+                'first_name': 'Admin',
+                'last_name': 'User',
+                'email': 'admin@markwave.com',
+                'role': 'Administrator',
+                'team_id': None,
+                'team_lead_name': 'Management',
+                'is_manager': True
             })
 
         employee = Employees.objects.filter(email__iexact=email).first()
@@ -622,46 +460,7 @@ def verify_email_otp(request):
         if employee.status == 'Inactive':
             return Response({'error': 'Your account is inactive. Please contact HR.'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Fetch dynamic managers
-        from django.db.models import Q
-        managers = Employees.objects.filter(Q(role='Manager') | Q(role='Project Manager') | Q(role='Administrator') | Q(role='Admin'))
-        manager_names = ", ".join([f"{m.first_name} {m.last_name or ''}".strip() for m in managers])
-        advisor = Employees.objects.filter(role='Advisor-Technology & Operations').first()
-
-        return Response({
-            'success': True,
-            'user': {
-                'id': employee.id,
-                'employee_id': employee.employee_id,
-                'first_name': employee.first_name,
-                'last_name': employee.last_name,
-                'email': employee.email,
-                'contact': employee.contact,
-                'location': employee.location,
-                'aadhar': employee.aadhar,
-                'qualification': employee.qualification,
-                'joining_date': employee.joining_date,
-                'role': employee.role,
-                'team_id': employee.teams.first().id if employee.teams.exists() else None,
-                'team_ids': ",".join([str(t.id) for t in employee.teams.all()]),
-                'team_name': ", ".join([t.name for t in employee.teams.all()]) or "No Team",
-                'teams': [{'id': t.id, 'name': t.name, 'manager_name': f"{t.manager.first_name} {t.manager.last_name or ''}".strip() if t.manager else None} for t in (list(employee.teams.all()) + list(Teams.objects.filter(manager=employee)))],
-                'team_lead_name': ", ".join(sorted(list(set([
-                    f"{m.first_name} {m.last_name or ''}".strip()
-                    for t in employee.teams.all()
-                    for m in t.members.filter(status='Active').filter(
-                        Q(role__icontains='Lead') | Q(role__icontains='Manager') | 
-                        Q(role__icontains='Admin') | Q(role__icontains='Founder') | 
-                        Q(role__icontains='Advisor')
-                    )
-                ] + ([f"{t.manager.first_name} {t.manager.last_name or ''}".strip() for t in employee.teams.all() if t.manager] if any(t.manager for t in employee.teams.all()) else []))))) or None,
-                'is_manager': Teams.objects.filter(manager=employee).exists(),
-                'is_admin': is_employee_admin(employee),
-                'project_manager_name': manager_names,
-                'advisor_name': f"{advisor.first_name} {advisor.last_name or ''}".strip() if advisor else None,
-                'profile_picture': request.build_absolute_uri(employee.profile_picture.url).replace('http://', 'https://') if employee.profile_picture and request.is_secure() else (request.build_absolute_uri(employee.profile_picture.url) if employee.profile_picture else None)
-            }
-        })
+        return signed_in_response(get_profile_payload(employee, request, team_name_default="No Team"), employee)
     except Exception as e:
         error_msg = str(e)
         if "too many clients" in error_msg or "connection to server" in error_msg:
@@ -678,6 +477,10 @@ def update_account_status(request):
     if not phone or not otp or not action or not acting_user_id:
         return Response({'error': 'Phone, OTP, action, and acting_user_id are required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    limited = check_rate_limit(request, 'otp_verify', normalize_phone(phone))
+    if limited:
+        return limited
+
     # Permission check: Only admins can activate/deactivate accounts
     try:
         if str(acting_user_id) in ['0', 'MW-ADMIN']:
@@ -702,13 +505,8 @@ def update_account_status(request):
 
     try:
         # OTP verification for the target phone number
-        otp_entry = OTPStore.objects.filter(phone=target_phone, is_verified=False).order_by('-created_at').first()
-        if not otp_entry or otp_entry.otp != otp:
-            return Response({'error': 'Invalid OTP'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        otp_entry.is_verified = True
-        otp_entry.verified_at = timezone.now()
-        otp_entry.save()
+        if not verify_otp_code(PHONE, target_phone, otp):
+            return Response({'error': 'Invalid or expired OTP'}, status=status.HTTP_401_UNAUTHORIZED)
 
         user_found = False
         for emp in Employees.objects.all():
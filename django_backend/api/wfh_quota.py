@@ -0,0 +1,117 @@
+"""
+Monthly WFH quotas. WFHMonthlyUsage keeps, per employee and month, the
+working days of their Pending/Approved WFH. It is adjusted whenever a request
+enters or leaves that state (the same transitions that add or drop its
+unavailability range) and when a recurring rule is created, rejected or
+cancelled (and a rule is recounted when a leave on its days is added or
+dropped, since the leave wins). Each request or rule stores the per-month days it was charged
+(quota_days) and gives back exactly those, so a holiday added or removed in
+between cannot make the counter drift. So checking a new request against the quota reads one counter per
+month it touches instead of scanning the employee's WFH history.
+
+The quota is the strictest wfh_monthly_quota of the employee's teams, or
+settings.WFH_MONTHLY_QUOTA when none of them sets one; None means no cap.
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from core.models import WFHMonthlyUsage, Teams
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK
+
+
+def days_by_month(dates):
+    """Counter of {(year, month): days} for the given dates."""
+    return Counter((d.year, d.month) for d in dates)
+
+
+def range_days(start, end, calendar=None):
+    calendar = calendar or WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+    return days_by_month(calendar.working_dates(start, end))
+
+
+def rule_days(rule, calendar=None):
+    """Days a recurring rule counts against the quota over its whole range (its days on a leave do not count)."""
+    from .recurring_wfh import expand_rules
+    return days_by_month(d for _, d in expand_rules([rule], rule.start_date, rule.end_date, calendar))
+
+
+def add_usage(employee_pk, counts, sign=1):
+    """Adds (sign=1) or removes (sign=-1) the counted days, one update per month."""
+    with transaction.atomic():
+        for (year, month), days in counts.items():
+            if not days:
+                continue
+            usage, _ = WFHMonthlyUsage.objects.get_or_create(employee_id=employee_pk, year=year, month=month)
+            WFHMonthlyUsage.objects.filter(pk=usage.pk).update(days=F('days') + sign * days)
+
+
+def encode_counts(counts):
+    """{(year, month): days} as stored in quota_days: {"YYYY-MM": days}."""
+    return {f"{year:04d}-{month:02d}": days for (year, month), days in sorted(counts.items()) if days}
+
+
+def decode_counts(data):
+    return Counter({(int(key[:4]), int(key[5:7])): days for key, days in (data or {}).items()})
+
+
+def charge(obj, employee_pk, counts):
+    """
+    Replaces what a WFH request or recurring rule is charged with `counts`
+    (empty to release it): gives back its recorded quota_days, adds the new
+    counts and records them on the row.
+    """
+    delta = Counter(counts)
+    delta.subtract(decode_counts(obj.quota_days))
+    add_usage(employee_pk, {month: days for month, days in delta.items() if days})
+    obj.quota_days = encode_counts(counts)
+    # A queryset update, so re-recording does not fire post_save again
+    type(obj).objects.filter(pk=obj.pk).update(quota_days=obj.quota_days)
+
+
+def move_usage(wfh, employee_pk, new_range):
+    """Re-counts a WFH request whose active date range is now new_range (None when it is no longer active)."""
+    charge(wfh, employee_pk, range_days(*new_range) if new_range else Counter())
+
+
+def recharge_rules(employee_pk, employee_id, ranges):
+    """Re-counts the active recurring rules overlapping the (start, end) ranges, after a leave there was added or dropped."""
+    from .recurring_wfh import rules_in_window, ACTIVE_STATUSES
+    ranges = [r for r in ranges if r]
+    if not ranges:
+        return
+    start, end = min(r[0] for r in ranges), max(r[1] for r in ranges)
+    for rule in rules_in_window([employee_id], start, end, ACTIVE_STATUSES):
+        charge(rule, employee_pk, rule_days(rule))
+
+
+def quota_for(employee):
+    quotas = [
+        q for q in Teams.objects.filter(members=employee).values_list('wfh_monthly_quota', flat=True)
+        if q is not None
+    ]
+    if quotas:
+        return min(quotas)
+    return getattr(settings, 'WFH_MONTHLY_QUOTA', None)
+
+
+def usage_for(employee, year, month):
+    usage = WFHMonthlyUsage.objects.filter(employee=employee, year=year, month=month).first()
+    return usage.days if usage else 0
+
+
+def check_quota(employee, counts):
+    """
+    Returns (year, month, used, quota) for the first month the extra days would
+    exceed, or None. Call inside the transaction that creates the request: the
+    counter rows are locked so concurrent applies cannot both fit the last day.
+    """
+    quota = quota_for(employee)
+    if quota is None:
+        return None
+    for (year, month) in sorted(counts):
+        usage, _ = WFHMonthlyUsage.objects.get_or_create(employee=employee, year=year, month=month)
+        used = WFHMonthlyUsage.objects.select_for_update().values_list('days', flat=True).get(pk=usage.pk)
+        if used + counts[(year, month)] > quota:
+            return year, month, used, quota
+    return None
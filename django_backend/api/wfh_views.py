@@ -1,41 +1,48 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.http import HttpResponse
-from core.models import WorkFromHome, Employees, Holidays, Leaves
-from .serializers import WorkFromHomeSerializer
+from core.models import WorkFromHome, RecurringWFH, Employees, EmployeeUnavailability
+from .serializers import WorkFromHomeSerializer, RecurringWFHSerializer
 from django.db.models import Q
+from django.db import transaction, IntegrityError
 import datetime
-import threading
 from django.utils import timezone
 import os
-from .utils import send_email_via_api, is_employee_admin
+from .utils import is_employee_admin
+from .outbox import queue_email
+from .emails import render_email, action_page, action_done_page, already_processed_page
+from .session_tokens import resolve_employee
+from .unavailability import find_overlap, overlap_error
+from .working_days import WorkingDayCalendar, LEAVE_WEEKMASK
+from .recurring_wfh import parse_weekdays, find_conflicting_rule, find_rule_day, find_wfh_on_weekdays, expand, WEEKDAY_NAMES
+from .wfh_quota import check_quota, range_days, rule_days, charge, quota_for, usage_for
+
+def _wfh_notify_recipients(notify_to_str):
+    """Emails of the people named in the 'Notify To' field (the only WFH approvers notified)."""
+    recipient_emails = set()
+    if notify_to_str:
+        names = [n.strip() for n in notify_to_str.split(',') if n.strip()]
+        for name in names:
+            parts = name.split()
+            if len(parts) >= 2:
+                target = Employees.objects.filter(
+                    first_name__icontains=parts[0],
+                    last_name__icontains=parts[-1]
+                ).first()
+                if target and target.email:
+                    recipient_emails.add(target.email.strip())
+            elif len(parts) == 1:
+                target = Employees.objects.filter(
+                    Q(first_name__icontains=parts[0]) | Q(last_name__icontains=parts[0])
+                ).first()
+                if target and target.email:
+                    recipient_emails.add(target.email.strip())
+    return recipient_emails
+
 
 def send_wfh_notification_to_manager(employee, wfh_request, reason, notify_to_str=""):
     try:
-        from .utils import send_email_via_api
-        
-        # 1. Gather recipients based ONLY on manually selected 'Notify To' field
-        recipient_emails = set()
-
-        # 2. Parse notifyTo names (if any were manually added)
-        if notify_to_str:
-            names = [n.strip() for n in notify_to_str.split(',') if n.strip()]
-            for name in names:
-                parts = name.split()
-                if len(parts) >= 2:
-                    target = Employees.objects.filter(
-                        first_name__icontains=parts[0],
-                        last_name__icontains=parts[-1]
-                    ).first()
-                    if target and target.email:
-                        recipient_emails.add(target.email.strip())
-                elif len(parts) == 1:
-                    target = Employees.objects.filter(
-                        Q(first_name__icontains=parts[0]) | Q(last_name__icontains=parts[0])
-                    ).first()
-                    if target and target.email:
-                        recipient_emails.add(target.email.strip())
+        recipient_emails = _wfh_notify_recipients(notify_to_str)
 
         # Filter out employee's own email if present
         if employee.email:
@@ -58,64 +65,21 @@ def send_wfh_notification_to_manager(employee, wfh_request, reason, notify_to_st
         approve_url = f"{api_base}/wfh/email-action/{wfh_request.id}/approve/"
         reject_url = f"{api_base}/wfh/email-action/{wfh_request.id}/reject/"
 
-        body = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-</head>
-<body style="margin: 0; padding: 20px; font-family: Arial, sans-serif; background-color: #f5f5f5;">
-    <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden;">
-        <tr>
-            <td style="background-color: #48327d; padding: 30px; text-align: center;">
-                <h1 style="color: #ffffff; margin: 0; font-size: 24px;">WFH Application</h1>
-            </td>
-        </tr>
-        <tr>
-            <td style="padding: 30px;">
-                <p style="font-size: 16px; color: #333333; margin: 0 0 10px 0;">Hello,</p>
-                <p style="font-size: 15px; color: #333333; margin: 0 0 25px 0;">
-                    <strong>{employee.first_name} {employee.last_name} ({employee.employee_id})</strong> has requested to Work From Home.
-                </p>
-                
-                <table width="100%" cellpadding="10" cellspacing="0" style="background-color: #f8f9fa; border-radius: 8px; margin: 20px 0;">
-                    <tr>
-                        <td style="color: #666666; font-size: 13px; font-weight: bold;">PERIOD:</td>
-                        <td style="color: #333333; font-size: 14px; font-weight: bold; text-align: right;">
-                            {wfh_request.from_date} to {wfh_request.to_date}
-                        </td>
-                    </tr>
-                    <tr>
-                        <td style="color: #666666; font-size: 13px; font-weight: bold; vertical-align: top;">REASON:</td>
-                        <td style="color: #333333; font-size: 14px; font-weight: bold; text-align: right;">{reason}</td>
-                    </tr>
-                </table>
-                
-                <table width="100%" cellpadding="0" cellspacing="0" style="margin: 30px 0;">
-                    <tr>
-                        <td align="center">
-                            <a href="{approve_url}" style="display: inline-block; background-color: #10b981; color: #ffffff; padding: 15px 40px; text-decoration: none; border-radius: 6px; font-weight: bold; font-size: 16px; margin: 5px;">APPROVE</a>
-                            <a href="{reject_url}" style="display: inline-block; background-color: #ef4444; color: #ffffff; padding: 15px 40px; text-decoration: none; border-radius: 6px; font-weight: bold; font-size: 16px; margin: 5px;">REJECT</a>
-                        </td>
-                    </tr>
-                </table>
-                
-                <p style="font-size: 12px; color: #999999; text-align: center; margin: 20px 0 0 0; padding-top: 20px; border-top: 1px solid #eeeeee;">
-                    <strong>This email notification regarding the Work From Home request has been sent only to the designated approver.</strong><br>
-                    Only the assigned person is required to review and take action.<br><br>
-                    If you are not the intended recipient, please ignore this email.<br>
-                    Clicking Approve or Reject will immediately update the WFH status.
-                </p>
-            </td>
-        </tr>
-    </table>
-</body>
-</html>"""
+        body = render_email(
+            'emails/approval_request.html',
+            title='WFH Application',
+            employee=employee,
+            summary='has requested to Work From Home.',
+            rows=[('Period', f"{wfh_request.from_date} to {wfh_request.to_date}"), ('Reason', reason)],
+            approve_url=approve_url,
+            reject_url=reject_url,
+            request_name='Work From Home',
+            status_name='WFH',
+        )
         
         
-        # Send individual emails to each selected recipient (no CC)
-        for recipient_email in recipient_emails:
-            send_email_via_api(recipient_email, subject, body)
+        # Queued per recipient; the outbox sends it as one email addressed to all of them, so they see each other
+        queue_email(recipient_emails, subject, body)
 
 
     except Exception as e:
@@ -132,20 +96,26 @@ def send_wfh_status_notification_to_employee(wfh_request):
         
         subject = f"WFH Request Update - {status_text}"
         
-        body = f"""<!DOCTYPE html>
-<html>
-<body style="font-family: Arial, sans-serif;">
-    <h2>WFH Request {status_text}</h2>
-    <p>Your Work From Home request has been <strong style="color: {color};">{status_text.lower()}</strong>.</p>
-    <p><strong>Dates:</strong> {wfh_request.from_date} to {wfh_request.to_date}</p>
-</body>
-</html>"""
+        body = render_email(
+            'emails/status_update.html',
+            title=f"WFH Request {status_text}",
+            header_color=color,
+            employee=employee,
+            request_name='Work From Home',
+            rows=[('Dates', f"{wfh_request.from_date} to {wfh_request.to_date}")],
+            status=status_text,
+        )
 
-        send_email_via_api(employee.email, subject, body)
+        queue_email(employee.email, subject, body)
 
     except Exception as e:
         print(f"Error sending employee notification: {str(e)}")
 
+def quota_error(year, month, used, quota):
+    month_name = datetime.date(year, month, 1).strftime('%B %Y')
+    return f'WFH quota exceeded for {month_name}. You have used {used} of {quota} days.'
+
+
 @api_view(['POST'])
 def apply_wfh(request):
     try:
@@ -156,9 +126,7 @@ def apply_wfh(request):
         reason = data.get('reason', '')
         notify_to = data.get('notifyTo', '')
 
-        employee = Employees.objects.filter(employee_id=employee_id).first()
-        if not employee and str(employee_id).isdigit():
-            employee = Employees.objects.filter(pk=employee_id).first()
+        employee = resolve_employee(request, employee_id)
         
         if not employee:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -185,84 +153,62 @@ def apply_wfh(request):
                     'error': 'WFH requests for previous months are not allowed. Please select a date in the current month or future.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get all holidays for validation
-        all_holidays = Holidays.objects.all()
-        holiday_dict = {}
-        for holiday in all_holidays:
-            try:
-                holiday_date = datetime.datetime.strptime(holiday.date, '%Y-%m-%d').date()
-                holiday_dict[holiday_date] = holiday.name
-            except ValueError:
-                continue
-
-        # Validate each date in the range
-        current_date = start_date
-        while current_date <= end_date:
-            # Check if it's a Sunday (weekday() returns 6 for Sunday)
-            if current_date.weekday() == 6:
-                formatted_date = current_date.strftime('%B %d, %Y')
+        # Validate the range for Sundays or public holidays
+        calendar = WorkingDayCalendar.cached(LEAVE_WEEKMASK)
+        blocked_date = calendar.first_non_working_day(start_date, end_date)
+        if blocked_date:
+            formatted_date = blocked_date.strftime('%B %d, %Y')
+            if blocked_date.weekday() == 6:
                 return Response({
                     'error': f'WFH requests are not allowed on Sundays. {formatted_date} is a Sunday.'
                 }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Check if it's a public holiday
-            if current_date in holiday_dict:
-                formatted_date = current_date.strftime('%B %d, %Y')
-                holiday_name = holiday_dict[current_date]
+            return Response({
+                'error': f'WFH requests are not allowed on public holidays. {formatted_date} is {calendar.holiday_names[blocked_date]}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Check for duplicate/overlapping WFH or Leave requests (Mutual Exclusivity) with one range probe
+        existing_overlap = find_overlap(employee, start_date, end_date)
+        if existing_overlap:
+            if existing_overlap.kind == EmployeeUnavailability.WFH:
+                formatted_date = max(start_date, existing_overlap.start_date).strftime('%B %d, %Y')
                 return Response({
-                    'error': f'WFH requests are not allowed on public holidays. {formatted_date} is {holiday_name}.'
+                    'error': f'You already have a WFH request for {formatted_date}. Please check your WFH history.'
                 }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'You have already applied for Leave for this date range. Please cancel it first.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Check for duplicate/overlapping WFH requests
-            # Check if there's any existing WFH request that includes this date
-            existing_requests = WorkFromHome.objects.filter(
-                employee=employee
-            )
-            
-            for existing in existing_requests:
-                try:
-                    existing_start = datetime.datetime.strptime(existing.from_date, '%Y-%m-%d').date()
-                    existing_end = datetime.datetime.strptime(existing.to_date, '%Y-%m-%d').date()
-                    
-                    # Check if current_date falls within any existing request
-                    if existing_start <= current_date <= existing_end:
-                        formatted_date = current_date.strftime('%B %d, %Y')
-                        return Response({
-                            'error': f'You already have a WFH request for {formatted_date}. Please check your WFH history.'
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                except ValueError:
-                    continue
-
-            current_date += datetime.timedelta(days=1)
-
-        # Check for overlapping Leave requests (Mutual Exclusivity)
-        existing_leave_overlap = Leaves.objects.filter(
-            employee=employee,
-            status__in=['Pending', 'Approved'],
-            from_date__lte=to_date,
-            to_date__gte=from_date
-        ).exists()
-
-        if existing_leave_overlap:
-             return Response({'error': 'You have already applied for Leave for this date range. Please cancel it first.'}, status=status.HTTP_400_BAD_REQUEST)
-
+        # Recurring WFH days are not in the store, so they are checked against the expanded rules
+        rule_day = find_rule_day(employee, start_date, end_date, calendar)
+        if rule_day:
+            return Response({
+                'error': f"Your recurring WFH schedule already covers {rule_day[1].strftime('%B %d, %Y')}."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         # Auto-approve if the applicant is an Admin or admin-equivalent role
         is_admin = is_employee_admin(employee)
         initial_status = 'Approved' if is_admin else 'Pending'
 
-        # All validations passed, create the WFH request
-        new_request = WorkFromHome.objects.create(
-            employee=employee,
-            from_date=from_date,
-            to_date=to_date,
-            reason=reason,
-            status=initial_status
-        )
-
-        # Notify Manager/Admin (skip for admin auto-approvals)
-        if not is_admin:
-            threading.Thread(target=send_wfh_notification_to_manager, args=(employee, new_request, reason, notify_to)).start()
+        # All validations passed, create the WFH request. The unavailability store
+        # rejects a concurrent overlapping submission at insert time.
+        try:
+            with transaction.atomic():
+                # Monthly quota, checked against the locked per-month counters
+                exceeded = check_quota(employee, range_days(start_date, end_date, calendar))
+                if exceeded:
+                    return Response({'error': quota_error(*exceeded)}, status=status.HTTP_400_BAD_REQUEST)
+
+                new_request = WorkFromHome.objects.create(
+                    employee=employee,
+                    from_date=from_date,
+                    to_date=to_date,
+                    reason=reason,
+                    status=initial_status
+                )
+
+                # Notify Manager/Admin (skip for admin auto-approvals)
+                if not is_admin:
+                    send_wfh_notification_to_manager(employee, new_request, reason, notify_to)
+        except IntegrityError:
+            return Response({'error': 'You already have a WFH or Leave request for this date range. Please check your history.'}, status=status.HTTP_400_BAD_REQUEST)
 
         msg = 'WFH request auto-approved' if is_admin else 'WFH request submitted'
         return Response({'message': msg, 'id': new_request.id}, status=status.HTTP_201_CREATED)
@@ -272,11 +218,7 @@ def apply_wfh(request):
 
 @api_view(['GET'])
 def get_wfh_requests(request, employee_id):
-    employee = Employees.objects.filter(employee_id=employee_id).first()
-    if not employee:
-        # Try finding by PK if employee_id is not found directly
-        if str(employee_id).isdigit():
-             employee = Employees.objects.filter(pk=employee_id).first()
+    employee = resolve_employee(request, employee_id)
 
     if not employee:
         return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -287,7 +229,7 @@ def get_wfh_requests(request, employee_id):
 
 @api_view(['GET'])
 def get_pending_wfh(request):
-    requests = WorkFromHome.objects.filter(status='Pending').order_by('-created_at')
+    requests = WorkFromHome.objects.filter(status='Pending').select_related('employee').order_by('-created_at')
     serializer = WorkFromHomeSerializer(requests, many=True)
     return Response(serializer.data)
 
@@ -298,15 +240,32 @@ def wfh_action(request, request_id):
     except WorkFromHome.DoesNotExist:
         return Response({'error': 'WFH request not found'}, status=status.HTTP_404_NOT_FOUND)
         
-    action = request.data.get('action') # 'Approve' or 'Reject'
-    if action not in ['Approve', 'Reject']:
+    action = request.data.get('action') # 'Approve', 'Reject' or 'Cancel'
+    if action not in ['Approve', 'Reject', 'Cancel']:
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
-        
-    wfh_request.status = 'Approved' if action == 'Approve' else 'Rejected'
-    wfh_request.save()
 
-    # Notify Employee
-    threading.Thread(target=send_wfh_status_notification_to_employee, args=(wfh_request,)).start()
+    if action == 'Cancel':
+        if wfh_request.status not in ['Pending', 'Approved']:
+            return Response({'error': f'WFH request is already {wfh_request.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        # Frees the dates and returns the days to this month's WFH quota
+        wfh_request.status = 'Cancelled'
+        wfh_request.save()
+        return Response({'message': 'WFH request cancelled successfully'})
+
+    try:
+        with transaction.atomic():
+            # Only a Pending request is decided: a Rejected or Cancelled one no longer holds
+            # quota days, so re-approving it would skip the monthly cap
+            current = WorkFromHome.objects.select_for_update().filter(pk=wfh_request.pk).values_list('status', flat=True).first()
+            if current != 'Pending':
+                return Response({'error': f'WFH request is already {current}'}, status=status.HTTP_400_BAD_REQUEST)
+            wfh_request.status = 'Approved' if action == 'Approve' else 'Rejected'
+            wfh_request.save()
+
+            # Notify Employee
+            send_wfh_status_notification_to_employee(wfh_request)
+    except IntegrityError:
+        return Response({'error': overlap_error(wfh_request)}, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({'message': f'WFH request {action}d successfully'})
 
@@ -316,115 +275,224 @@ def email_wfh_action(request, request_id, action):
         wfh_request = WorkFromHome.objects.get(pk=request_id)
         
         if wfh_request.status != 'Pending':
-            return HttpResponse(f"""
-                <div style="font-family: sans-serif; text-align: center; padding-top: 100px;">
-                    <div style="font-size: 60px; margin-bottom: 20px;">ℹ️</div>
-                    <h2 style="color: #334155;">Request Already Processed</h2>
-                    <p style="color: #64748b;">This WFH request has already been marked as <strong>{wfh_request.status}</strong>.</p>
-                </div>
-            """, content_type="text/html")
+            return already_processed_page('WFH', wfh_request.status)
 
         if action == 'approve':
             wfh_request.status = 'Approved'
             status_text = "Approved"
-            color = "#10b981"
-            icon = "✓"
         elif action == 'reject':
             wfh_request.status = 'Rejected'
             status_text = "Rejected"
-            color = "#ef4444"
-            icon = "✕"
         else:
-            return HttpResponse("<h2>Invalid action.</h2>", content_type="text/html")
+            return action_page('Invalid action.', '')
             
-        wfh_request.save()
-        
-        # Notify Employee
-        threading.Thread(target=send_wfh_status_notification_to_employee, args=(wfh_request,)).start()
-
-        html_response = f"""
-        <!DOCTYPE html>
-        <html>
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>WFH {status_text}</title>
-                <style>
-                    body {{
-                        margin: 0;
-                        padding: 0;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        min-height: 100vh;
-                        background-color: #f8fafc;
-                        font-family: 'Inter', -apple-system, system-ui, sans-serif;
-                    }}
-                    .card {{
-                        background: white;
-                        padding: 40px;
-                        border-radius: 20px;
-                        box-shadow: 0 10px 25px -5px rgba(0, 0, 0, 0.1);
-                        text-align: center;
-                        max-width: 400px;
-                        width: 90%;
-                        animation: slideUp 0.5s ease-out;
-                    }}
-                    @keyframes slideUp {{
-                        from {{ transform: translateY(20px); opacity: 0; }}
-                        to {{ transform: translateY(0); opacity: 1; }}
-                    }}
-                    .icon-circle {{
-                        width: 80px;
-                        height: 80px;
-                        background-color: {color};
-                        color: white;
-                        border-radius: 50%;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        font-size: 40px;
-                        margin: 0 auto 24px;
-                    }}
-                    h1 {{
-                        color: #1e293b;
-                        margin: 0 0 8px;
-                        font-size: 24px;
-                        font-weight: 800;
-                    }}
-                    p {{
-                        color: #64748b;
-                        margin: 0;
-                        font-size: 16px;
-                    }}
-                    .footer {{
-                        margin-top: 32px;
-                        padding-top: 24px;
-                        border-top: 1px solid #f1f5f9;
-                        font-size: 12px;
-                        color: #94a3b8;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="card">
-                    <div class="icon-circle">{icon}</div>
-                    <h1>WFH {status_text}</h1>
-                    <p>The WFH request has been successfully updated.</p>
-                    <div class="footer">
-                        You can close this window now.
-                    </div>
-                </div>
-                <script>
-                    setTimeout(function() {{
-                        window.close();
-                    }}, 3000);
-                </script>
-            </body>
-        </html>
-        """
-        return HttpResponse(html_response, content_type="text/html")
+        try:
+            with transaction.atomic():
+                wfh_request.save()
+
+                # Notify Employee
+                send_wfh_status_notification_to_employee(wfh_request)
+        except IntegrityError:
+            return action_page('Request could not be approved.', overlap_error(wfh_request))
+
+        return action_done_page('WFH', status_text)
     except WorkFromHome.DoesNotExist:
-        return HttpResponse("<h2>Request not found.</h2>", content_type="text/html")
+        return action_page('Request not found.', '')
+    except Exception as e:
+        return action_page('Error', str(e))
+
+
+def send_recurring_wfh_notification(employee, rule, notify_to_str=""):
+    try:
+        recipient_emails = _wfh_notify_recipients(notify_to_str)
+        if employee.email:
+            recipient_emails.discard(employee.email.strip())
+        if not recipient_emails:
+            print(f"No recipients found for recurring WFH notification for {employee.first_name} {employee.last_name}")
+            return
+
+        days = ', '.join(WEEKDAY_NAMES[d] for d in rule.weekday_list)
+        subject = f"Recurring WFH Request - {employee.first_name} {employee.last_name} ({employee.employee_id})"
+        body = render_email(
+            'emails/approval_request.html',
+            title='Recurring Work From Home Request',
+            employee=employee,
+            summary=f"has requested to Work From Home every {days}.",
+            rows=[('Dates', f"{rule.start_date} to {rule.end_date}"), ('Reason', rule.reason or 'N/A')],
+            request_name='recurring Work From Home',
+        )
+        queue_email(recipient_emails, subject, body)
+    except Exception as e:
+        print(f"Error sending recurring WFH notification: {str(e)}")
+
+
+def send_recurring_wfh_status_notification(rule):
+    try:
+        employee = rule.employee
+        if not employee.email:
+            return
+        status_text = rule.status
+        color = "#10b981" if status_text == 'Approved' else "#ef4444"
+        days = ', '.join(WEEKDAY_NAMES[d] for d in rule.weekday_list)
+        body = render_email(
+            'emails/status_update.html',
+            title=f"Recurring WFH Request {status_text}",
+            header_color=color,
+            employee=employee,
+            request_name='recurring Work From Home',
+            rows=[('Every', days), ('Dates', f"{rule.start_date} to {rule.end_date}")],
+            status=status_text,
+        )
+        queue_email(employee.email, f"Recurring WFH Request Update - {status_text}", body)
     except Exception as e:
-        return HttpResponse(f"<h2>Error: {str(e)}</h2>", content_type="text/html")
+        print(f"Error sending recurring WFH status notification: {str(e)}")
+
+
+MAX_RECURRING_WFH_DAYS = 366
+
+
+@api_view(['POST'])
+def apply_recurring_wfh(request):
+    """
+    One request for a repeating WFH schedule instead of one request per day.
+    Body: {"employeeId", "weekdays": ["Tue", "Thu"], "fromDate", "toDate", "reason", "notifyTo"}
+    """
+    try:
+        data = request.data
+        employee_id = data.get('employeeId')
+        employee = resolve_employee(request, employee_id)
+        if not employee:
+            return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start_date = datetime.datetime.strptime(data.get('fromDate') or '', '%Y-%m-%d').date()
+            end_date = datetime.datetime.strptime(data.get('toDate') or '', '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Invalid date format. Please use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            weekdays = parse_weekdays(data.get('weekdays'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if end_date < start_date:
+            return Response({'error': 'End date cannot be before start date.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end_date - start_date).days >= MAX_RECURRING_WFH_DAYS:
+            return Response({'error': 'A recurring WFH schedule can cover at most one year.'}, status=status.HTTP_400_BAD_REQUEST)
+        if any(not LEAVE_WEEKMASK[d] for d in weekdays):
+            return Response({'error': 'WFH requests are not allowed on Sundays.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        is_admin = is_employee_admin(employee)
+        if not is_admin and start_date < datetime.date.today().replace(day=1):
+            return Response({
+                'error': 'WFH requests for previous months are not allowed. Please select a date in the current month or future.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        conflict = find_conflicting_rule(employee, weekdays, start_date, end_date)
+        if conflict:
+            return Response({
+                'error': f'You already have a recurring WFH schedule from {conflict.start_date} to {conflict.end_date} on the same days.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        wfh_day = find_wfh_on_weekdays(employee, weekdays, start_date, end_date)
+        if wfh_day:
+            return Response({
+                'error': f"You already have a WFH request for {wfh_day.strftime('%B %d, %Y')}. Please check your WFH history."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            rule = RecurringWFH(
+                employee=employee,
+                weekdays=','.join(str(d) for d in weekdays),
+                start_date=start_date,
+                end_date=end_date,
+                reason=data.get('reason', ''),
+                status='Approved' if is_admin else 'Pending'
+            )
+            counts = rule_days(rule)
+            exceeded = check_quota(employee, counts)
+            if exceeded:
+                return Response({'error': quota_error(*exceeded)}, status=status.HTTP_400_BAD_REQUEST)
+            rule.save()
+            charge(rule, employee.pk, counts)
+
+            if not is_admin:
+                send_recurring_wfh_notification(employee, rule, data.get('notifyTo', ''))
+
+        msg = 'Recurring WFH auto-approved' if is_admin else 'Recurring WFH request submitted'
+        return Response({'message': msg, 'id': rule.id}, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+def get_recurring_wfh(request, employee_id):
+    """
+    An employee's recurring WFH rules. With ?from=YYYY-MM-DD&to=YYYY-MM-DD the
+    rules are also expanded into the WFH dates they give in that window.
+    """
+    employee = resolve_employee(request, employee_id)
+    if not employee:
+        return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    rules = RecurringWFH.objects.filter(employee=employee).select_related('employee').order_by('-created_at')
+    payload = {'rules': RecurringWFHSerializer(rules, many=True).data}
+
+    window_from, window_to = request.query_params.get('from'), request.query_params.get('to')
+    if window_from and window_to:
+        try:
+            dates = expand([employee.employee_id], window_from, window_to, statuses=('Pending', 'Approved'))
+        except ValueError:
+            return Response({'error': 'Invalid date format. Please use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        payload['dates'] = [d.isoformat() for d in dates.get(employee.employee_id, [])]
+    return Response(payload)
+
+
+@api_view(['GET'])
+def get_pending_recurring_wfh(request):
+    rules = RecurringWFH.objects.filter(status='Pending').select_related('employee').order_by('-created_at')
+    return Response(RecurringWFHSerializer(rules, many=True).data)
+
+
+@api_view(['POST'])
+def recurring_wfh_action(request, rule_id):
+    """Approve, Reject or Cancel a recurring WFH rule."""
+    rule = RecurringWFH.objects.select_related('employee').filter(pk=rule_id).first()
+    if not rule:
+        return Response({'error': 'Recurring WFH request not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    action = request.data.get('action')
+    new_status = {'Approve': 'Approved', 'Reject': 'Rejected', 'Cancel': 'Cancelled'}.get(action)
+    if not new_status:
+        return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
+    if rule.status in ('Rejected', 'Cancelled'):
+        return Response({'error': f'Recurring WFH request is already {rule.status}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        rule.status = new_status
+        rule.save()
+        if new_status in ('Rejected', 'Cancelled'):
+            charge(rule, rule.employee.pk, {})
+        if action != 'Cancel':
+            send_recurring_wfh_status_notification(rule)
+    return Response({'message': f'Recurring WFH request {new_status.lower()} successfully'})
+
+
+@api_view(['GET'])
+def get_wfh_quota(request, employee_id):
+    """WFH quota and days used for a month: /wfh/quota/<employee_id>/?month=YYYY-MM (defaults to this month)."""
+    employee = resolve_employee(request, employee_id)
+    if not employee:
+        return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        month = datetime.datetime.strptime(request.query_params.get('month') or datetime.date.today().strftime('%Y-%m'), '%Y-%m')
+    except ValueError:
+        return Response({'error': 'Invalid month. Use YYYY-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    quota = quota_for(employee)
+    used = usage_for(employee, month.year, month.month)
+    return Response({
+        'month': month.strftime('%Y-%m'),
+        'quota': quota,
+        'used': used,
+        'remaining': None if quota is None else max(0, quota - used),
+    })
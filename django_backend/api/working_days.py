@@ -0,0 +1,179 @@
+"""
+Working-day calculator shared by leave/WFH validation, attendance history and
+the monthly report. Counting uses business-day arithmetic (whole weeks times
+working days per week, plus a bisect over the sorted holiday list) instead of
+walking day by day. numpy's busday_count is used for batched counts when numpy
+is installed. The holiday list is cached (and dropped whenever a holiday is
+saved or deleted), so hot request paths build a calendar without a query.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Weekly-off rules, Monday first. Leave and WFH may not fall on Sundays;
+# the monthly report counts Monday to Friday as working days.
+LEAVE_WEEKMASK = (1, 1, 1, 1, 1, 1, 0)
+REPORT_WEEKMASK = (1, 1, 1, 1, 1, 0, 0)
+
+HOLIDAY_CACHE_KEY = 'working_days:holidays'
+
+FULL_DAY = 'Full Day'
+SESSION_1 = 'Session 1'
+SESSION_2 = 'Session 2'
+
+# The web app sends 'Session 1'/'Session 2'; the mobile app sends 'First Half'/'Second Half'
+SESSION_ALIASES = {
+    'session 1': SESSION_1,
+    'first half': SESSION_1,
+    'session 2': SESSION_2,
+    'second half': SESSION_2,
+}
+
+
+def normalize_session(value):
+    """SESSION_1, SESSION_2 or FULL_DAY for any spelling of a leave session."""
+    return SESSION_ALIASES.get((value or '').strip().lower(), FULL_DAY)
+
+
+def parse_date(value):
+    if hasattr(value, 'toordinal'):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class WorkingDayCalendar:
+    """A weekly-off rule plus a holiday list, answering working-day questions for date ranges."""
+
+    def __init__(self, holidays=(), weekmask=LEAVE_WEEKMASK, holiday_names=None):
+        self.weekmask = tuple(bool(d) for d in weekmask)
+        self.holiday_names = holiday_names or {}
+        self.all_holidays = sorted(set(holidays))
+        # Only holidays on working weekdays change a count
+        self.holidays = [d for d in self.all_holidays if self.weekmask[d.weekday()]]
+        self._per_week = sum(self.weekmask)
+        self._prefix = [sum(self.weekmask[:i]) for i in range(8)]
+        self._busdaycal = None
+        if np is not None:
+            self._busdaycal = np.busdaycalendar(
+                weekmask=[int(d) for d in self.weekmask],
+                holidays=[d.isoformat() for d in self.holidays]
+            )
+
+    @classmethod
+    def from_holidays(cls, holidays, weekmask=LEAVE_WEEKMASK):
+        """Builds a calendar from Holidays rows, skipping malformed dates."""
+        names = {}
+        for holiday in holidays:
+            try:
+                names[parse_date(holiday.date)] = holiday.name
+            except (ValueError, TypeError):
+                continue
+        return cls(names.keys(), weekmask=weekmask, holiday_names=names)
+
+    @classmethod
+    def from_db(cls, weekmask=LEAVE_WEEKMASK):
+        """Builds a calendar from the whole Holidays table (one query)."""
+        from core.models import Holidays
+        return cls.from_holidays(Holidays.objects.only('date', 'name'), weekmask)
+
+    @classmethod
+    def cached(cls, weekmask=LEAVE_WEEKMASK):
+        """Like from_db, but reads the holiday list from the cache when it is there."""
+        from django.core.cache import cache
+        rows = cache.get(HOLIDAY_CACHE_KEY)
+        if rows is None:
+            from core.models import Holidays
+            rows = list(Holidays.objects.values_list('date', 'name'))
+            cache.set(HOLIDAY_CACHE_KEY, rows, None)
+        names = {}
+        for day, name in rows:
+            try:
+                names[parse_date(day)] = name
+            except (ValueError, TypeError):
+                continue
+        return cls(names.keys(), weekmask=weekmask, holiday_names=names)
+
+    def _weekdays_before(self, d):
+        # date(1, 1, 1) is a Monday, so ordinals line up with the weekmask
+        weeks, rem = divmod(d.toordinal() - 1, 7)
+        return weeks * self._per_week + self._prefix[rem]
+
+    def is_working_day(self, d):
+        d = parse_date(d)
+        if not self.weekmask[d.weekday()]:
+            return False
+        i = bisect_left(self.holidays, d)
+        return not (i < len(self.holidays) and self.holidays[i] == d)
+
+    def count(self, start, end):
+        """Working days in [start, end], both inclusive."""
+        start, end = parse_date(start), parse_date(end)
+        if end < start:
+            return 0
+        weekdays = self._weekdays_before(end + timedelta(days=1)) - self._weekdays_before(start)
+        return weekdays - (bisect_right(self.holidays, end) - bisect_left(self.holidays, start))
+
+    def count_many(self, ranges):
+        """Working days for many inclusive (start, end) ranges in one batched call."""
+        ranges = [(parse_date(s), parse_date(e)) for s, e in ranges]
+        if not ranges:
+            return []
+        if self._busdaycal is not None:
+            starts = np.array([s.isoformat() for s, _ in ranges], dtype='datetime64[D]')
+            ends = np.array([e.isoformat() for _, e in ranges], dtype='datetime64[D]') + np.timedelta64(1, 'D')
+            counts = np.busday_count(starts, np.maximum(starts, ends), busdaycal=self._busdaycal)
+            return [int(c) for c in counts]
+        return [self.count(s, e) for s, e in ranges]
+
+    def leave_days(self, start, end, from_session=FULL_DAY, to_session=FULL_DAY):
+        """
+        Working days in a leave range, with half-day sessions: starting in
+        Session 2 or ending in Session 1 takes half a day off that end. Sessions
+        may use either spelling (see normalize_session).
+        """
+        return self.leave_days_many([(start, end, from_session, to_session)])[0]
+
+    def leave_days_many(self, ranges):
+        """Batched leave_days for (start, end, from_session, to_session) tuples."""
+        ranges = [(parse_date(s), parse_date(e), fs, ts) for s, e, fs, ts in ranges]
+        counts = self.count_many([(s, e) for s, e, _, _ in ranges])
+        result = []
+        for (start, end, from_session, to_session), days in zip(ranges, counts):
+            if days and normalize_session(from_session) == SESSION_2 and self.is_working_day(start):
+                days -= 0.5
+            if days and normalize_session(to_session) == SESSION_1 and self.is_working_day(end):
+                days -= 0.5
+            result.append(max(0, days))
+        return result
+
+    def first_non_working_day(self, start, end):
+        """Earliest weekly-off day or holiday in [start, end], or None."""
+        start, end = parse_date(start), parse_date(end)
+        candidates = []
+        for offset in range(min(7, (end - start).days + 1)):
+            d = start + timedelta(days=offset)
+            if not self.weekmask[d.weekday()]:
+                candidates.append(d)
+                break
+        i = bisect_left(self.all_holidays, start)
+        if i < len(self.all_holidays) and self.all_holidays[i] <= end:
+            candidates.append(self.all_holidays[i])
+        return min(candidates) if candidates else None
+
+    def working_dates(self, start, end):
+        """Yields the working dates in [start, end]."""
+        start, end = parse_date(start), parse_date(end)
+        d = start
+        while d <= end:
+            if self.is_working_day(d):
+                yield d
+            d += timedelta(days=1)
+
+
+def invalidate_holiday_cache():
+    from django.core.cache import cache
+    cache.delete(HOLIDAY_CACHE_KEY)
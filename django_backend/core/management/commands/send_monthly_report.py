@@ -1,13 +1,17 @@
 import base64
 import os
 import io
-import requests
 import json
-from datetime import datetime, date, timedelta
+from collections import defaultdict
+from datetime import datetime, date
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db.models import Count
 from django.template.loader import render_to_string
-from core.models import Employees, Attendance, Leaves, Holidays
+from core.models import Employees, Attendance, Leaves
+from api.working_days import WorkingDayCalendar, REPORT_WEEKMASK, FULL_DAY
+from api import http_gateways
+from api.http_gateways import EMAIL
 from xhtml2pdf import pisa
 
 class Command(BaseCommand):
@@ -38,18 +42,9 @@ class Command(BaseCommand):
 
         # Fetch data
         employees = Employees.objects.all().order_by('employee_id')
-        holidays_list = Holidays.objects.all()
-        holiday_dates = set()
-        for h in holidays_list:
-            try:
-                holiday_dates.add(datetime.strptime(h.date, '%Y-%m-%d').date())
-            except:
-                pass
+        calendar = WorkingDayCalendar.from_db(REPORT_WEEKMASK)
 
-        report_data = []
-        for emp in employees:
-            stats = self.calculate_employee_stats(emp, start_date, end_date, holiday_dates)
-            report_data.append(stats)
+        report_data = self.calculate_employee_stats(employees, start_date, end_date, calendar)
 
         # Generate PDF
         html_content = render_to_string('reports/monthly_attendance.html', {
@@ -100,77 +95,71 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.ERROR("Failed to send report email"))
 
-    def calculate_employee_stats(self, emp, start_date, end_date, holiday_dates):
+    def calculate_employee_stats(self, employees, start_date, end_date, calendar):
+        """Stats for every employee from one attendance aggregate, one leave query and one batched day count."""
         # 1. Total Working Days in period (Exclude Sat/Sun and Holidays)
-        working_days = 0
-        curr = start_date
-        while curr <= end_date:
-            if curr.weekday() < 5 and curr not in holiday_dates:
-                working_days += 1
-            curr += timedelta(days=1)
-
-        # 2. Present Days
-        present_days = Attendance.objects.filter(
-            employee=emp,
-            date__range=[start_date.isoformat(), end_date.isoformat()],
-            status='Present'
-        ).count()
-
-        # 3. Leaves
-        # We need to find leaves that overlap with our range
-        overlapping_leaves = Leaves.objects.filter(
-            employee=emp,
-            status='Approved'
+        working_days = calendar.count(start_date, end_date)
+
+        # 2. Present Days per employee
+        present_by_employee = dict(
+            Attendance.objects.filter(
+                date__range=[start_date.isoformat(), end_date.isoformat()],
+                status='Present'
+            ).values('employee_id').annotate(n=Count('id')).values_list('employee_id', 'n')
         )
-        
-        paid_leave_days = 0
-        unpaid_leave_days = 0
-        is_intern = 'intern' in (emp.role or '').lower()
 
-        for leaf in overlapping_leaves:
+        # 3. Approved leaves overlapping the period, clipped to it
+        leaves = []
+        ranges = []
+        for leaf in Leaves.objects.filter(
+            status='Approved',
+            from_date__lte=end_date.isoformat(),
+            to_date__gte=start_date.isoformat()
+        ).only('employee_id', 'type', 'from_date', 'to_date', 'from_session', 'to_session'):
             try:
                 l_start = datetime.strptime(leaf.from_date, '%Y-%m-%d').date()
                 l_end = datetime.strptime(leaf.to_date, '%Y-%m-%d').date()
-                
-                # Calculate overlap with period
-                intersect_start = max(l_start, start_date)
-                intersect_end = min(l_end, end_date)
-                
-                if intersect_start <= intersect_end:
-                    # Number of days in overlap
-                    # Note: We should ideally exclude weekends/holidays from leave days too?
-                    # Usually if someone takes leave for a week, it's 5 days leave.
-                    # But the 'days' field in model might already be correct.
-                    # HOWEVER, we only want the overlap part.
-                    
-                    overlap_count = 0
-                    c = intersect_start
-                    while c <= intersect_end:
-                        # Only count as leave if it's a working day? 
-                        # This depends on company policy. Usually yes.
-                        if c.weekday() < 5 and c not in holiday_dates:
-                            overlap_count += 1
-                        c += timedelta(days=1)
-
-                    if is_intern:
-                        unpaid_leave_days += overlap_count
-                    else:
-                        if leaf.type.lower() == 'lwp':
-                            unpaid_leave_days += overlap_count
-                        else:
-                            paid_leave_days += overlap_count
-            except Exception as e:
-                self.stdout.write(f"Error processing leave for {emp.employee_id}: {e}")
-
-        return {
-            'id': emp.employee_id,
-            'name': f"{emp.first_name} {emp.last_name or ''}".strip(),
-            'role': emp.role or 'Employee',
-            'working_days': working_days,
-            'present_days': present_days,
-            'paid_leaves': paid_leave_days,
-            'unpaid_leaves': unpaid_leave_days
-        }
+            except (ValueError, TypeError) as e:
+                self.stdout.write(f"Error processing leave for {leaf.employee_id}: {e}")
+                continue
+            intersect_start = max(l_start, start_date)
+            intersect_end = min(l_end, end_date)
+            if intersect_start > intersect_end:
+                continue
+            # Half-day sessions only apply where the leave itself starts/ends inside the period
+            leaves.append(leaf)
+            ranges.append((
+                intersect_start, intersect_end,
+                leaf.from_session if intersect_start == l_start else FULL_DAY,
+                leaf.to_session if intersect_end == l_end else FULL_DAY,
+            ))
+
+        # Only working days inside the overlap count as leave
+        leave_days = calendar.leave_days_many(ranges)
+        paid_by_employee = defaultdict(float)
+        unpaid_by_employee = defaultdict(float)
+        for leaf, days in zip(leaves, leave_days):
+            if leaf.type.lower() == 'lwp':
+                unpaid_by_employee[leaf.employee_id] += days
+            else:
+                paid_by_employee[leaf.employee_id] += days
+
+        report = []
+        for emp in employees:
+            paid = paid_by_employee.get(emp.employee_id, 0)
+            unpaid = unpaid_by_employee.get(emp.employee_id, 0)
+            if 'intern' in (emp.role or '').lower():
+                paid, unpaid = 0, paid + unpaid
+            report.append({
+                'id': emp.employee_id,
+                'name': f"{emp.first_name} {emp.last_name or ''}".strip(),
+                'role': emp.role or 'Employee',
+                'working_days': working_days,
+                'present_days': present_by_employee.get(emp.employee_id, 0),
+                'paid_leaves': paid,
+                'unpaid_leaves': unpaid
+            })
+        return report
 
     def send_email_with_pdf(self, to_emails, pdf_content, start_date, end_date):
         url = settings.EMAIL_API_URL
@@ -193,7 +182,7 @@ class Command(BaseCommand):
         if app_password: payload['app_password'] = app_password
 
         try:
-            response = requests.post(url, json=payload, timeout=30)
+            response = http_gateways.post(EMAIL, url, json=payload, timeout=(http_gateways.CONNECT_TIMEOUT, 30))
             if response.status_code == 200:
                 return True
             self.stdout.write(self.style.ERROR(f"API Error: {response.text}"))
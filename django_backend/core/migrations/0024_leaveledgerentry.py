@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_alter_fk_on_update_cascade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('entry_type', models.CharField(choices=[('Allocation', 'Allocation'), ('CarryForward', 'Carry Forward'), ('Debit', 'Debit'), ('Credit', 'Credit'), ('Encashment', 'Encashment')], max_length=20)),
+                ('days', models.FloatField()),
+                ('note', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.employees')),
+                ('leave', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='core.leaves')),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.leavetype')),
+            ],
+            options={
+                'db_table': 'core_leaveledger',
+                'managed': True,
+                'indexes': [models.Index(fields=['employee', 'leave_type', 'year'], name='core_ledger_emp_type_year')],
+            },
+        ),
+    ]
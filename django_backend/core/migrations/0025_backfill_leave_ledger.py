@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def backfill_leave_ledger(apps, schema_editor):
+    """
+    Seed the ledger from the balances and leaves that existed before it:
+    one Allocation entry per balance row and one Debit per pending/approved leave.
+    """
+    EmployeeLeaveBalance = apps.get_model('core', 'EmployeeLeaveBalance')
+    LeaveLedgerEntry = apps.get_model('core', 'LeaveLedgerEntry')
+    LeaveType = apps.get_model('core', 'LeaveType')
+    Leaves = apps.get_model('core', 'Leaves')
+    Employees = apps.get_model('core', 'Employees')
+
+    types_by_code = {lt.code.upper(): lt.id for lt in LeaveType.objects.all()}
+    pk_by_employee_id = dict(Employees.objects.exclude(employee_id__isnull=True).values_list('employee_id', 'id'))
+
+    entries = []
+    consumed = defaultdict(float)
+    balances = {}
+    for bal in EmployeeLeaveBalance.objects.all():
+        balances[(bal.employee_id, bal.leave_type_id, bal.year)] = bal
+        if bal.allocated_days:
+            entries.append(LeaveLedgerEntry(
+                employee_id=bal.employee_id, leave_type_id=bal.leave_type_id, year=bal.year,
+                entry_type='Allocation', days=bal.allocated_days, note='Opening balance'
+            ))
+
+    for leave in Leaves.objects.filter(status__in=['Pending', 'Approved']):
+        type_id = types_by_code.get((leave.type or '').upper())
+        emp_pk = pk_by_employee_id.get(leave.employee_id)
+        try:
+            year = int(leave.from_date[:4])
+        except (TypeError, ValueError):
+            continue
+        key = (emp_pk, type_id, year)
+        # Only leaves that draw from an existing balance row are charged (LWP has none)
+        if key not in balances or not leave.days:
+            continue
+        entries.append(LeaveLedgerEntry(
+            employee_id=emp_pk, leave_type_id=type_id, year=year,
+            entry_type='Debit', days=leave.days, leave_id=leave.id, note='Opening balance'
+        ))
+        consumed[key] += leave.days
+
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+    for key, bal in balances.items():
+        bal.consumed_days = consumed.get(key, 0)
+    EmployeeLeaveBalance.objects.bulk_update(balances.values(), ['consumed_days'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_leaveledgerentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_leave_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_backfill_leave_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeUnavailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('Leave', 'Leave'), ('WFH', 'Work From Home')], max_length=10)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.employees')),
+                ('leave', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unavailability', to='core.leaves')),
+                ('wfh', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unavailability', to='core.workfromhome')),
+            ],
+            options={
+                'db_table': 'core_unavailability',
+                'managed': True,
+                'indexes': [models.Index(fields=['employee', 'start_date', 'end_date'], name='core_unavail_emp_range')],
+            },
+        ),
+    ]
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+from django.db import migrations
+
+ACTIVE_STATUSES = ['Pending', 'Approved']
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def backfill_unavailability(apps, schema_editor):
+    """
+    Copy every active leave and WFH request into the range store. Leaves are
+    loaded first; any request that overlaps one already kept is skipped (and
+    reported) so the constraint below can be created.
+    """
+    EmployeeUnavailability = apps.get_model('core', 'EmployeeUnavailability')
+    Leaves = apps.get_model('core', 'Leaves')
+    WorkFromHome = apps.get_model('core', 'WorkFromHome')
+    Employees = apps.get_model('core', 'Employees')
+
+    pk_by_employee_id = dict(Employees.objects.exclude(employee_id__isnull=True).values_list('employee_id', 'id'))
+
+    kept = {}
+    rows = []
+    sources = [
+        ('Leave', 'leave_id', Leaves.objects.filter(status__in=ACTIVE_STATUSES).order_by('id')),
+        ('WFH', 'wfh_id', WorkFromHome.objects.filter(status__in=ACTIVE_STATUSES).order_by('id')),
+    ]
+    for kind, fk, queryset in sources:
+        for obj in queryset:
+            emp_pk = pk_by_employee_id.get(obj.employee_id)
+            start, end = _parse(obj.from_date), _parse(obj.to_date)
+            if emp_pk is None or start is None or end is None or end < start:
+                continue
+            ranges = kept.setdefault(emp_pk, [])
+            if any(s <= end and e >= start for s, e in ranges):
+                print(f"Skipping overlapping {kind} request {obj.id} for employee {obj.employee_id}")
+                continue
+            ranges.append((start, end))
+            rows.append(EmployeeUnavailability(
+                employee_id=emp_pk, kind=kind, start_date=start, end_date=end, **{fk: obj.id}
+            ))
+
+    EmployeeUnavailability.objects.bulk_create(rows, batch_size=500)
+
+
+POSTGRES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist;',
+    "ALTER TABLE core_unavailability ADD CONSTRAINT core_unavailability_no_overlap "
+    "EXCLUDE USING gist (employee_id WITH =, daterange(start_date, end_date, '[]') WITH &&);",
+]
+POSTGRES_REVERSE_SQL = [
+    'ALTER TABLE core_unavailability DROP CONSTRAINT IF EXISTS core_unavailability_no_overlap;',
+]
+
+# SQLite has no exclusion constraints; triggers give the same guarantee and
+# RAISE(ABORT) surfaces as an IntegrityError just like the PostgreSQL constraint.
+SQLITE_SQL = [
+    "CREATE TRIGGER core_unavailability_no_overlap_insert BEFORE INSERT ON core_unavailability "
+    "WHEN EXISTS (SELECT 1 FROM core_unavailability WHERE employee_id = NEW.employee_id "
+    "AND start_date <= NEW.end_date AND end_date >= NEW.start_date) "
+    "BEGIN SELECT RAISE(ABORT, 'core_unavailability_no_overlap'); END;",
+    "CREATE TRIGGER core_unavailability_no_overlap_update BEFORE UPDATE ON core_unavailability "
+    "WHEN EXISTS (SELECT 1 FROM core_unavailability WHERE employee_id = NEW.employee_id AND id != NEW.id "
+    "AND start_date <= NEW.end_date AND end_date >= NEW.start_date) "
+    "BEGIN SELECT RAISE(ABORT, 'core_unavailability_no_overlap'); END;",
+]
+SQLITE_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS core_unavailability_no_overlap_insert;',
+    'DROP TRIGGER IF EXISTS core_unavailability_no_overlap_update;',
+]
+
+
+def _run(schema_editor, statements_by_vendor):
+    statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def add_no_overlap_constraint(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_SQL, 'sqlite': SQLITE_SQL})
+
+
+def remove_no_overlap_constraint(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE_SQL, 'sqlite': SQLITE_REVERSE_SQL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_employeeunavailability'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unavailability, migrations.RunPython.noop),
+        migrations.RunPython(add_no_overlap_constraint, remove_no_overlap_constraint),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_unavailability_no_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringWFH',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(default='Pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='core.employees', to_field='employee_id')),
+            ],
+            options={
+                'db_table': 'core_wfh_recurring',
+                'managed': True,
+                'indexes': [models.Index(fields=['employee', 'status', 'start_date', 'end_date'], name='core_wfh_rec_emp_range')],
+            },
+        ),
+    ]
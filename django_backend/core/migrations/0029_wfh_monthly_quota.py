@@ -0,0 +1,77 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:43
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_wfh_usage(apps, schema_editor):
+    """Counts the working days (Mon-Sat, not a holiday) of existing Pending/Approved WFH per employee and month."""
+    WorkFromHome = apps.get_model('core', 'WorkFromHome')
+    RecurringWFH = apps.get_model('core', 'RecurringWFH')
+    WFHMonthlyUsage = apps.get_model('core', 'WFHMonthlyUsage')
+    Employees = apps.get_model('core', 'Employees')
+    Holidays = apps.get_model('core', 'Holidays')
+
+    holidays = set(Holidays.objects.values_list('date', flat=True))
+    pk_by_employee_id = dict(Employees.objects.exclude(employee_id__isnull=True).values_list('employee_id', 'id'))
+    usage = Counter()
+
+    def count(emp_pk, start, end, weekdays=None):
+        d = start
+        while d <= end:
+            if d.weekday() != 6 and d.isoformat() not in holidays and (weekdays is None or d.weekday() in weekdays):
+                usage[(emp_pk, d.year, d.month)] += 1
+            d += timedelta(days=1)
+
+    for wfh in WorkFromHome.objects.filter(status__in=['Pending', 'Approved']):
+        try:
+            start = datetime.strptime(wfh.from_date, '%Y-%m-%d').date()
+            end = datetime.strptime(wfh.to_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            continue
+        if wfh.employee_id in pk_by_employee_id:
+            count(pk_by_employee_id[wfh.employee_id], start, end)
+
+    for rule in RecurringWFH.objects.filter(status__in=['Pending', 'Approved']):
+        weekdays = {int(d) for d in rule.weekdays.split(',') if d.strip()}
+        if rule.employee_id in pk_by_employee_id:
+            count(pk_by_employee_id[rule.employee_id], rule.start_date, rule.end_date, weekdays)
+
+    WFHMonthlyUsage.objects.bulk_create([
+        WFHMonthlyUsage(employee_id=emp_pk, year=year, month=month, days=days)
+        for (emp_pk, year, month), days in usage.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_recurringwfh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teams',
+            name='wfh_monthly_quota',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='WFHMonthlyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('days', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.employees')),
+            ],
+            options={
+                'db_table': 'core_wfh_usage',
+                'managed': True,
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_wfh_usage, migrations.RunPython.noop),
+    ]
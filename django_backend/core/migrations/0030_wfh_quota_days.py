@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-19 22:16
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+
+
+def backfill_quota_days(apps, schema_editor):
+    """Records on each Pending/Approved WFH request and rule the days it counts today (Mon-Sat, not a holiday)."""
+    WorkFromHome = apps.get_model('core', 'WorkFromHome')
+    RecurringWFH = apps.get_model('core', 'RecurringWFH')
+    Holidays = apps.get_model('core', 'Holidays')
+
+    holidays = set(Holidays.objects.values_list('date', flat=True))
+
+    def count(start, end, weekdays=None):
+        counts = Counter()
+        d = start
+        while d <= end:
+            if d.weekday() != 6 and d.isoformat() not in holidays and (weekdays is None or d.weekday() in weekdays):
+                counts[f"{d.year:04d}-{d.month:02d}"] += 1
+            d += timedelta(days=1)
+        return dict(counts)
+
+    for wfh in WorkFromHome.objects.filter(status__in=['Pending', 'Approved']):
+        try:
+            start = datetime.strptime(wfh.from_date, '%Y-%m-%d').date()
+            end = datetime.strptime(wfh.to_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            continue
+        WorkFromHome.objects.filter(pk=wfh.pk).update(quota_days=count(start, end))
+
+    for rule in RecurringWFH.objects.filter(status__in=['Pending', 'Approved']):
+        weekdays = {int(d) for d in rule.weekdays.split(',') if d.strip()}
+        RecurringWFH.objects.filter(pk=rule.pk).update(quota_days=count(rule.start_date, rule.end_date, weekdays))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_wfh_monthly_quota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringwfh',
+            name='quota_days',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='workfromhome',
+            name='quota_days',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_quota_days, migrations.RunPython.noop),
+    ]
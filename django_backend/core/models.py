@@ -95,6 +95,7 @@ class Teams(models.Model):
     shift_end = models.CharField(max_length=20, default='06:30 PM')
     whatsapp_chat_id = models.CharField(max_length=100, blank=True, null=True)
     whatsapp_group_url = models.CharField(max_length=255, blank=True, null=True)
+    wfh_monthly_quota = models.IntegerField(blank=True, null=True)  # WFH days per member per month, None = no cap
 
     class Meta:
         managed = True
@@ -144,14 +145,51 @@ class EmployeeLeaveBalance(models.Model):
     employee = models.ForeignKey(Employees, models.CASCADE)
     leave_type = models.ForeignKey(LeaveType, models.CASCADE)
     year = models.IntegerField()
+    # Running totals maintained by the leave ledger (see api/leave_ledger.py)
     allocated_days = models.FloatField(default=0)
-    consumed_days = models.FloatField(default=0) # Optional cache, but calculation on fly is safer for consistency
+    consumed_days = models.FloatField(default=0)
 
     class Meta:
         managed = True
         db_table = 'core_employeeleavebalance'
         unique_together = (('employee', 'leave_type', 'year'),)
 
+    @property
+    def available_days(self):
+        return (self.allocated_days or 0) - (self.consumed_days or 0)
+
+
+class LeaveLedgerEntry(models.Model):
+    """Append-only record of every change to an employee's leave balance."""
+    ALLOCATION = 'Allocation'
+    CARRY_FORWARD = 'CarryForward'
+    DEBIT = 'Debit'
+    CREDIT = 'Credit'
+    ENCASHMENT = 'Encashment'
+    ENTRY_TYPES = [
+        (ALLOCATION, 'Allocation'),
+        (CARRY_FORWARD, 'Carry Forward'),
+        (DEBIT, 'Debit'),
+        (CREDIT, 'Credit'),
+        (ENCASHMENT, 'Encashment'),
+    ]
+
+    employee = models.ForeignKey(Employees, models.CASCADE)
+    leave_type = models.ForeignKey(LeaveType, models.CASCADE)
+    year = models.IntegerField()
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    days = models.FloatField()
+    leave = models.ForeignKey(Leaves, models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    note = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'core_leaveledger'
+        indexes = [
+            models.Index(fields=['employee', 'leave_type', 'year'], name='core_ledger_emp_type_year'),
+        ]
+
 
 
 class WorkFromHome(models.Model):
@@ -161,12 +199,85 @@ class WorkFromHome(models.Model):
     reason = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, default='Pending')  # Pending, Approved, Rejected
     created_at = models.DateTimeField(auto_now_add=True)
+    quota_days = models.JSONField(default=dict, blank=True)  # {"YYYY-MM": days} charged to WFHMonthlyUsage
 
     class Meta:
         managed = True
         db_table = 'core_wfh'
 
 
+class RecurringWFH(models.Model):
+    """
+    A repeating WFH rule, e.g. every Tue/Thu from start_date until end_date.
+    Stored as one row and expanded for a date window when read (see
+    api/recurring_wfh.py); no per-day rows are created.
+    """
+    employee = models.ForeignKey(Employees, models.DO_NOTHING, to_field='employee_id')
+    weekdays = models.CharField(max_length=20)  # Comma separated, Monday=0, e.g. "1,3"
+    start_date = models.DateField()
+    end_date = models.DateField()
+    reason = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, default='Pending')  # Pending, Approved, Rejected, Cancelled
+    created_at = models.DateTimeField(auto_now_add=True)
+    quota_days = models.JSONField(default=dict, blank=True)  # {"YYYY-MM": days} charged to WFHMonthlyUsage
+
+    @property
+    def weekday_list(self):
+        return [int(d) for d in self.weekdays.split(',') if d.strip() != '']
+
+    class Meta:
+        managed = True
+        db_table = 'core_wfh_recurring'
+        indexes = [
+            models.Index(fields=['employee', 'status', 'start_date', 'end_date'], name='core_wfh_rec_emp_range'),
+        ]
+
+
+class WFHMonthlyUsage(models.Model):
+    """
+    Working days of Pending/Approved WFH per employee per month, kept up to date
+    as requests are created, approved, rejected or cancelled (see api/wfh_quota.py).
+    Each request records what it was charged in quota_days and gives back exactly that.
+    """
+    employee = models.ForeignKey(Employees, models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    days = models.IntegerField(default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'core_wfh_usage'
+        unique_together = (('employee', 'year', 'month'),)
+
+
+class EmployeeUnavailability(models.Model):
+    """
+    One row per active (Pending/Approved) leave or WFH request, as a real date
+    range. Overlaps per employee are rejected by the database: an exclusion
+    constraint on PostgreSQL, triggers on SQLite (see migration 0027).
+    """
+    LEAVE = 'Leave'
+    WFH = 'WFH'
+    KINDS = [
+        (LEAVE, 'Leave'),
+        (WFH, 'Work From Home'),
+    ]
+
+    employee = models.ForeignKey(Employees, models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    leave = models.OneToOneField(Leaves, models.CASCADE, null=True, blank=True, related_name='unavailability')
+    wfh = models.OneToOneField(WorkFromHome, models.CASCADE, null=True, blank=True, related_name='unavailability')
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        managed = True
+        db_table = 'core_unavailability'
+        indexes = [
+            models.Index(fields=['employee', 'start_date', 'end_date'], name='core_unavail_emp_range'),
+        ]
+
+
 class LeaveOverrideRequest(models.Model):
     id = models.AutoField(primary_key=True)
     leave = models.ForeignKey(Leaves, models.CASCADE, related_name='overrides')
@@ -192,9 +192,14 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.session_tokens.SessionTokenAuthentication',
+    ],
 }
 
+# Lifetime of the signed session tokens issued at sign-in (api/session_tokens.py)
+SESSION_TOKEN_MAX_AGE = int(os.getenv('SESSION_TOKEN_MAX_AGE', str(7 * 24 * 3600)))
+
 # Periskope API Configuration
 PERISKOPE_API_KEY = os.getenv('PERISKOPE_API_KEY', '')
 PERISKOPE_SENDER_PHONE = os.getenv('PERISKOPE_SENDER_PHONE', '')
@@ -207,6 +212,35 @@ EMAIL_API_URL = os.getenv('EMAIL_API_URL', 'https://mark-email-server-jn6cma3vvq
 # Admin Fallback Configuration
 ADMIN_WHATSAPP_NUMBER = os.getenv('ADMIN_WHATSAPP_NUMBER', '919247534762')
 
+# WFH days allowed per employee per month when none of their teams sets a quota (unset = no cap)
+WFH_MONTHLY_QUOTA = int(os.getenv('WFH_MONTHLY_QUOTA')) if os.getenv('WFH_MONTHLY_QUOTA') else None
+
+# Login OTPs expire this many seconds after they are sent
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', '300'))
+
+# Reverse proxies in front of Django that append to X-Forwarded-For (0 = use REMOTE_ADDR only)
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
+# OTP delivery queue (api/otp_delivery.py): 'live' sends through Periskope/email API, 'local' uses an offline stand-in
+OTP_GATEWAY = os.getenv('OTP_GATEWAY', 'live')
+OTP_DELIVERY_WORKERS = int(os.getenv('OTP_DELIVERY_WORKERS', '4'))
+OTP_DELIVERY_RETRY_DELAYS = (2, 10, 30)
+
+# Notification outbox (api/outbox.py): in-process worker threads (0 = only `manage.py run_outbox` sends),
+# attempts before an email is marked Dead, first retry delay (doubles per attempt) and Processing lease
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '2'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 300
+# Identical emails queued within this many seconds go out as one API call to up to OUTBOX_MAX_RECIPIENTS addresses
+OUTBOX_COALESCE_SECONDS = 2
+OUTBOX_MAX_RECIPIENTS = 50
+
+# Pooled HTTP clients for outside services (api/http_gateways.py). Per-gateway overrides, e.g.
+# {'email': {'timeout': 20, 'retries': 2, 'pool_size': 20}}
+HTTP_GATEWAYS = {}
+
 # Cache Configuration
 CACHES = {
     'default': {